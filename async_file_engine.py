@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+asyncio file download engine
+Runs direct file transfers as coroutines on a single event loop thread,
+so hundreds of small downloads need neither a thread each nor a blocked
+thread per paused item. Uses the same `.part` file and journal as
+file_engine, so a transfer can resume under either engine.
+Requires the optional aiohttp package.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from pathlib import Path
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from file_engine import (CHUNK_SIZE, DEFAULT_HEADERS, JOURNAL_FLUSH_INTERVAL, RangeJournal,
+                         RemoteFileInfo, part_path)
+
+MAX_CONNECTIONS = 500
+
+
+def is_available():
+    """True if aiohttp can be imported in this process"""
+    return aiohttp is not None
+
+
+class AsyncFileEngine:
+    """
+    Event loop thread that downloads FileDownloadItems concurrently.
+
+    submit() may be called from any thread and returns a
+    concurrent.futures.Future; cancel() stops the transfer, and the future
+    only resolves once the coroutine has returned and closed its files.
+    Pausing is driven by the item's pause_event: a paused transfer awaits
+    its wake-up event, and wake() must be called after item.resume().
+    """
+    def __init__(self, max_connections=MAX_CONNECTIONS, chunk_size=CHUNK_SIZE, headers=None, timeout=30,
+                 limiter=None):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is not installed; pip install aiohttp")
+        self.max_connections = max_connections
+        self.chunk_size = chunk_size
+        self.headers = dict(headers or DEFAULT_HEADERS)
+        self.timeout = timeout
+        self.limiter = limiter  # Optional bandwidth.BandwidthLimiter
+        self.session = None
+        self.wakeups = {}  # item -> asyncio.Event; touched on the loop thread only
+        self.tasks = {}  # item -> running asyncio.Task; touched on the loop thread only
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="async-files", daemon=True)
+        self.thread.start()
+
+    def submit(self, item, target, progress_callback=None):
+        """
+        Start downloading `item.url` into `target`; the future resolves to
+        True when complete and False once a cancelled transfer has stopped
+        """
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()  # Stopped through cancel(), never future.cancel()
+
+        def start():
+            task = self.loop.create_task(self.download(item, target, progress_callback))
+            self.tasks[item] = task
+            task.add_done_callback(lambda task: self._finished(item, task, future))
+        self.loop.call_soon_threadsafe(start)
+        return future
+
+    def _finished(self, item, task, future):
+        self.tasks.pop(item, None)
+        if task.cancelled():
+            future.set_result(False)
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    def cancel(self, item):
+        """Stop the transfer of `item`, if one is running"""
+        self.loop.call_soon_threadsafe(self._cancel, item)
+
+    def _cancel(self, item):
+        task = self.tasks.get(item)
+        if task is not None:
+            task.cancel()
+
+    def wake(self, item):
+        """Let a paused transfer continue (or notice a cancel)"""
+        self.loop.call_soon_threadsafe(self._wake, item)
+
+    def _wake(self, item):
+        event = self.wakeups.get(item)
+        if event is not None:
+            event.set()
+
+    def close(self, timeout=5):
+        async def shutdown():
+            if self.session is not None:
+                await self.session.close()
+        try:
+            asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result(timeout)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def _session(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=0)
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.timeout, sock_read=self.timeout)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers)
+        return self.session
+
+    async def _wait_if_paused(self, item):
+        """Await while the item is paused; returns False if it was cancelled"""
+        if item.cancel_event.is_set():
+            return False
+        if not item.pause_event.is_set():
+            event = self.wakeups.setdefault(item, asyncio.Event())
+            try:
+                while not item.pause_event.is_set():
+                    event.clear()
+                    await event.wait()
+            finally:
+                self.wakeups.pop(item, None)
+        return not item.cancel_event.is_set()
+
+    async def download(self, item, target, progress_callback=None):
+        """
+        Download `item.url` into `target`, resuming from the contiguous
+        start of `target.part` when the server still serves the same file.
+        Returns True when complete, False when cancelled through the item
+        (the partial data is kept).
+        """
+        target = Path(target)
+        part = part_path(target)
+        journal = RangeJournal.load(target)
+
+        # Only the prefix starting at byte 0 can be continued by one stream
+        offset = 0
+        headers = {}
+        if part.exists() and journal.url == item.url and journal.ranges and journal.ranges[0][0] == 0:
+            offset = journal.ranges[0][1] + 1
+            headers['Range'] = f'bytes={offset}-'
+            if journal.etag or journal.last_modified:
+                headers['If-Range'] = journal.etag or journal.last_modified
+
+        async with self._session().get(item.url, headers=headers) as r:
+            r.raise_for_status()
+            length = int(r.headers.get('Content-Length', 0) or 0)
+            if r.status == 206 and offset:
+                total = offset + length if length else journal.size
+                if journal.size and total != journal.size:
+                    raise IOError("Remote file changed size; retry to start over")
+            else:
+                offset = 0  # Server sent the whole file
+                total = length
+                journal.reset(RemoteFileInfo(
+                    item.url,
+                    size=total,
+                    accepts_ranges=r.headers.get('Accept-Ranges', '').lower() == 'bytes',
+                    etag=r.headers.get('ETag', ''),
+                    last_modified=r.headers.get('Last-Modified', '')
+                ))
+                journal.url = item.url
+            journal.ranges = [(0, offset - 1)] if offset else []
+
+            if progress_callback:
+                progress_callback(offset, total)
+            with open(part, 'r+b' if offset else 'wb') as f:
+                f.seek(offset)
+                journal.save()
+                finished = False
+                try:
+                    async for chunk in r.content.iter_chunked(self.chunk_size):
+                        if not await self._wait_if_paused(item):
+                            return False
+                        f.write(chunk)
+                        journal.add(offset, offset + len(chunk) - 1)
+                        offset += len(chunk)
+                        if progress_callback:
+                            progress_callback(offset, total)
+                        if self.limiter:
+                            wait = self.limiter.delay(len(chunk), item)
+                            if wait > 0:
+                                await asyncio.sleep(wait)
+                        if time.time() - journal.last_flush >= JOURNAL_FLUSH_INTERVAL:
+                            await asyncio.to_thread(journal.sync, f)
+                    finished = True
+                finally:
+                    if not finished:
+                        # Cancelled or failed: keep what we have resumable
+                        journal.sync(f)
+
+        if total and offset < total:
+            raise IOError(f"Incomplete download: {offset} of {total} bytes")
+        os.replace(part, target)
+        journal.remove()
+        return True
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Bandwidth limiting
+Token buckets shared by every transfer: one global bucket for the whole
+app and one per item with its own cap. Downloaders report each chunk
+after receiving it and wait out the delay the buckets ask for, so the
+limits can change at any time without restarting a transfer.
+"""
+
+import threading
+import time
+import weakref
+
+# How many seconds of traffic a bucket may save up and then spend at once
+BURST_SECONDS = 0.5
+
+
+class TokenBucket:
+    """Thread-safe token bucket; a rate of 0 means unlimited"""
+    def __init__(self, rate=0, burst_seconds=BURST_SECONDS, clock=time.monotonic):
+        self.lock = threading.Lock()
+        self.rate = 0
+        self.burst_seconds = burst_seconds
+        self.clock = clock
+        self.tokens = 0.0
+        self.updated = clock()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        """Change the rate in bytes per second; takes effect on the next chunk"""
+        rate = max(0, int(rate or 0))
+        with self.lock:
+            if rate == self.rate:
+                return
+            self._refill()
+            self.rate = rate
+            self.tokens = min(self.tokens, self.capacity())
+
+    def capacity(self):
+        return self.rate * self.burst_seconds
+
+    def _refill(self):
+        now = self.clock()
+        if self.rate:
+            self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.capacity())
+        self.updated = now
+
+    def reserve(self, amount):
+        """
+        Take `amount` bytes worth of tokens, going into debt if needed, and
+        return how many seconds the caller should wait before continuing.
+        """
+        with self.lock:
+            if not self.rate:
+                return 0.0
+            self._refill()
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class BandwidthLimiter:
+    """
+    Global and per-item rate limits for every downloader.
+
+    An item's cap is its `rate_limit` attribute in bytes per second when
+    set, otherwise the default item rate. throttle() blocks the calling
+    thread; delay() returns the wait for callers that sleep themselves
+    (e.g. an asyncio loop).
+    """
+    def __init__(self, global_rate=0, item_rate=0):
+        self.global_bucket = TokenBucket(global_rate)
+        self.item_rate = item_rate
+        self.item_buckets = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+
+    def configure(self, global_rate=None, item_rate=None):
+        """Apply new limits in bytes per second (0 = unlimited) to running transfers too"""
+        if global_rate is not None:
+            self.global_bucket.set_rate(global_rate)
+        if item_rate is not None:
+            self.item_rate = max(0, int(item_rate or 0))
+
+    def item_cap(self, item):
+        rate = getattr(item, 'rate_limit', None)
+        return self.item_rate if rate is None else rate
+
+    def effective_rate(self, item=None):
+        """The tightest limit that applies to `item`, or 0 if none does"""
+        rates = [rate for rate in (self.global_bucket.rate, self.item_cap(item) if item is not None else 0) if rate]
+        return min(rates) if rates else 0
+
+    def _item_bucket(self, item):
+        with self.lock:
+            bucket = self.item_buckets.get(item)
+            if bucket is None:
+                bucket = self.item_buckets[item] = TokenBucket()
+        bucket.set_rate(self.item_cap(item))
+        return bucket
+
+    def delay(self, amount, item=None):
+        """Account for `amount` received bytes; returns seconds to wait"""
+        wait = self.global_bucket.reserve(amount)
+        if item is not None:
+            wait = max(wait, self._item_bucket(item).reserve(amount))
+        return wait
+
+    def throttle(self, amount, item=None):
+        """Account for `amount` received bytes and sleep as long as the limits require"""
+        wait = self.delay(amount, item)
+        if wait <= 0:
+            return
+        cancel_event = getattr(item, 'cancel_event', None)
+        if cancel_event is not None:
+            cancel_event.wait(wait)  # A cancel ends the wait early
+        else:
+            time.sleep(wait)
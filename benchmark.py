@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Social Media Downloader engines
+Run with: python benchmark.py <name> [options]
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # Hundreds of clients may connect at once
+
+    def handle_error(self, request, client_address):
+        # Clients dropping connections mid-transfer is expected here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class RangeServer:
+    """
+    Local HTTP server serving an in-memory file with Range support and
+    per-connection throttling. `link_rate` caps all connections together
+    like a saturated uplink; beyond `max_connections` concurrent requests
+    it answers 429 like a site rate-limiting a client. A Range request
+    whose If-Range no longer matches `etag` gets the whole file.
+    """
+    def __init__(self, payload, rate_per_connection=0, accept_ranges=True,
+                 content_type="application/octet-stream", path="/file.bin", latency=0.0,
+                 link_rate=0, max_connections=0, etag='"bench"'):
+        from bandwidth import TokenBucket
+
+        self.payload = payload
+        self.rate = rate_per_connection
+        self.link = TokenBucket(link_rate, burst_seconds=0.1)
+        self.max_connections = max_connections
+        self.connections = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.accept_ranges = accept_ranges
+        self.content_type = content_type
+        self.etag = etag
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _headers(self, status, start, end):
+                if server.latency:
+                    time.sleep(server.latency)  # Simulated round trip to a remote site
+                self.send_response(status)
+                self.send_header("Content-Type", server.content_type)
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("ETag", server.etag)
+                if server.accept_ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+                if status == 206:
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(server.payload)}")
+                self.end_headers()
+
+            def _range(self):
+                total = len(server.payload)
+                header = self.headers.get("Range", "")
+                if_range = self.headers.get("If-Range")
+                if server.accept_ranges and header.startswith("bytes=") and if_range in (None, server.etag):
+                    first, _, last = header[6:].partition("-")
+                    start = int(first or 0)
+                    end = min(int(last) if last else total - 1, total - 1)
+                    return 206, start, end
+                return 200, 0, total - 1
+
+            def do_HEAD(self):
+                status, start, end = self._range()
+                self._headers(status, start, end)
+
+            def do_GET(self):
+                with server.lock:
+                    if server.max_connections and server.connections >= server.max_connections:
+                        server.rejected += 1
+                        refused = True
+                    else:
+                        server.connections += 1
+                        refused = False
+                if refused:
+                    self.send_response(429)
+                    self.send_header("Content-Length", "0")
+                    self.send_header("Retry-After", "1")
+                    self.end_headers()
+                    return
+                try:
+                    self._send_body()
+                finally:
+                    with server.lock:
+                        server.connections -= 1
+
+            def _send_body(self):
+                status, start, end = self._range()
+                self._headers(status, start, end)
+                chunk = 16 * 1024
+                position = start
+                began = time.time()
+                try:
+                    while position <= end:
+                        data = server.payload[position:min(position + chunk, end + 1)]
+                        self.wfile.write(data)
+                        position += len(data)
+                        time.sleep(server.link.reserve(len(data)))
+                        if server.rate:
+                            # Throttle each connection independently
+                            expected = (position - start) / server.rate
+                            delay = expected - (time.time() - began)
+                            if delay > 0:
+                                time.sleep(delay)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.httpd = QuietHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def bench_segmented(args):
+    """Single-stream vs segmented download against a throttled local range server"""
+    from file_engine import SegmentedDownloader
+
+    payload = os.urandom(args.size_mb * 1024 * 1024)
+    digest = hashlib.sha256(payload).hexdigest()
+    rate = args.rate_kb * 1024
+
+    print(f"Payload: {args.size_mb} MiB, server limit {args.rate_kb} KiB/s per connection")
+    print(f"{'segments':>8} {'seconds':>8} {'MiB/s':>8}  ok")
+    with RangeServer(payload, rate_per_connection=rate) as server, tempfile.TemporaryDirectory() as tmp:
+        for segments in [1] + [n for n in args.segments if n > 1]:
+            target = os.path.join(tmp, f"out_{segments}.bin")
+            engine = SegmentedDownloader(segments=segments, min_segment_size=64 * 1024)
+            start = time.perf_counter()
+            engine.download(server.url, target)
+            elapsed = time.perf_counter() - start
+            with open(target, "rb") as f:
+                ok = hashlib.sha256(f.read()).hexdigest() == digest
+            print(f"{segments:>8} {elapsed:>8.2f} {args.size_mb / elapsed:>8.2f}  {'yes' if ok else 'NO'}")
+
+
+def bench_ytdlp(args):
+    """Per-item latency of spawning yt-dlp vs the in-process YoutubeDL pool"""
+    import subprocess
+    from ytdl_engine import YoutubeDLPool
+
+    payload = os.urandom(256 * 1024)
+    with RangeServer(payload, content_type="video/mp4", path="/clip.mp4") as server:
+        urls = [f"{server.url}?n={n}" for n in range(args.items)]
+
+        start = time.perf_counter()
+        for url in urls:
+            subprocess.run([sys.executable, "-m", "yt_dlp", "--dump-json", "--no-playlist", url],
+                           capture_output=True, check=True)
+        spawned = (time.perf_counter() - start) / args.items
+
+        start = time.perf_counter()
+        pool = YoutubeDLPool(max_size=2)
+        for url in urls:
+            pool.extract_info(url)
+        pooled = (time.perf_counter() - start) / args.items
+        pool.close()
+
+    print(f"Items: {args.items} (generic extractor, local server)")
+    print(f"{'mode':>12} {'ms/item':>9}")
+    print(f"{'subprocess':>12} {spawned * 1000:>9.1f}")
+    print(f"{'in-process':>12} {pooled * 1000:>9.1f}")
+    print(f"Saved per item: {(spawned - pooled) * 1000:.1f} ms")
+
+
+def bench_bulk(args):
+    """Parse, dedupe and analyze a 1,000-URL import, sequentially vs in parallel batches"""
+    from bulk_import import BulkAnalyzer, dedupe_urls, parse_urls
+    from metadata_cache import MetadataCache
+
+    payload = os.urandom(64 * 1024)
+    with RangeServer(payload, content_type="video/mp4", path="/clip.mp4",
+                     latency=args.latency_ms / 1000) as server:
+        # Every tenth line repeats an earlier URL with tracking parameters added
+        lines = []
+        for n in range(args.urls):
+            if n % 10 == 9:
+                lines.append(f"{server.url}?n={n - 1}&utm_source=bench")
+            else:
+                lines.append(f"{server.url}?n={n}")
+        text = "\n".join(lines)
+
+        start = time.perf_counter()
+        urls = dedupe_urls(parse_urls(text))
+        parsed = time.perf_counter() - start
+        print(f"Input: {args.urls} lines -> {len(urls)} unique URLs in {parsed * 1000:.1f} ms")
+        print(f"Simulated server latency: {args.latency_ms} ms per request")
+
+        print(f"{'workers':>8} {'batch':>6} {'seconds':>8} {'URLs/s':>8} {'errors':>7}")
+        with tempfile.TemporaryDirectory() as tmp:
+            for workers in args.workers:
+                cache = MetadataCache(path=os.path.join(tmp, f"cache_{workers}.db"))
+                analyzer = BulkAnalyzer(cache, workers=workers, batch_size=args.batch_size)
+                start = time.perf_counter()
+                results = analyzer.analyze(urls)
+                elapsed = time.perf_counter() - start
+                errors = sum(1 for result in results if result.error)
+                print(f"{workers:>8} {args.batch_size:>6} {elapsed:>8.2f} {len(urls) / elapsed:>8.1f} {errors:>7}")
+
+
+def serve_range_payload(size, rate, ready, stop):
+    """Child-process RangeServer, so its threads don't count against the client's CPU"""
+    with RangeServer(os.urandom(size), rate_per_connection=rate) as server:
+        ready.put(server.url)
+        stop.wait()
+
+
+def bench_async_files(args):
+    """Hundreds of concurrent small file transfers: thread pool vs the asyncio engine"""
+    import multiprocessing
+    from concurrent.futures import ThreadPoolExecutor, wait
+
+    from async_file_engine import AsyncFileEngine
+    from downloader_core import FileDownloadItem
+    from file_engine import SegmentedDownloader
+
+    if args.one_core and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+
+    ready, stop = multiprocessing.Queue(), multiprocessing.Event()
+    server = multiprocessing.Process(target=serve_range_payload, daemon=True,
+                                     args=(args.size_kb * 1024, args.rate_kb * 1024, ready, stop))
+    server.start()
+    url = ready.get(timeout=30)
+
+    def run_threads(items, tmp):
+        engine = SegmentedDownloader(segments=1)
+        with ThreadPoolExecutor(max_workers=len(items)) as pool:
+            futures = [pool.submit(engine.download, item.url, os.path.join(tmp, item.filename), item)
+                       for item in items]
+            return futures
+
+    def run_async(items, tmp):
+        futures = [async_engine.submit(item, os.path.join(tmp, item.filename)) for item in items]
+        wait(futures)
+        return futures
+
+    async_engine = AsyncFileEngine(max_connections=args.files)
+    seconds_per_file = args.size_kb / args.rate_kb
+    print(f"Files: {args.files} x {args.size_kb} KiB, server limit {args.rate_kb} KiB/s per connection "
+          f"(>= {seconds_per_file:.2f} s each)")
+    if args.one_core:
+        print("Client pinned to one CPU core")
+    print(f"{'engine':>8} {'seconds':>8} {'cpu s':>7} {'threads':>8} {'failed':>7}")
+    try:
+        for name, run in (("threads", run_threads), ("asyncio", run_async)):
+            items = [FileDownloadItem(f"{url}?n={n}", filename=f"{name}_{n}.bin") for n in range(args.files)]
+            peak = [threading.active_count()]
+            done = threading.Event()
+
+            def sample():
+                while not done.wait(0.05):
+                    peak[0] = max(peak[0], threading.active_count())
+            sampler = threading.Thread(target=sample, daemon=True)
+            sampler.start()
+
+            with tempfile.TemporaryDirectory() as tmp:
+                cpu, start = time.process_time(), time.perf_counter()
+                futures = run(items, tmp)
+                elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+                done.set()
+                sampler.join()
+                failed = sum(1 for future in futures if future.exception() or not future.result())
+            print(f"{name:>8} {elapsed:>8.2f} {cpu:>7.2f} {peak[0]:>8} {failed:>7}")
+    finally:
+        async_engine.close()
+        stop.set()
+        server.join(5)
+
+
+def bench_adaptive(args):
+    """Static concurrency settings vs the adaptive controller against a throttled local server"""
+    from concurrent.futures import Future
+
+    from concurrency import AdaptiveConcurrency, is_throttle_error
+    from downloader_core import FileDownloadItem
+    from file_engine import SegmentedDownloader
+    from scheduler import DownloadScheduler
+
+    payload = os.urandom(args.size_kb * 1024)
+    conn_rate, link_rate = args.rate_kb * 1024, args.link_kb * 1024
+    print(f"Files: {args.files} x {args.size_kb} KiB; server: {args.rate_kb} KiB/s per connection, "
+          f"{args.link_kb} KiB/s in total, 429 above {args.max_connections} connections")
+    print(f"Best possible: {args.files * args.size_kb / args.link_kb:.1f} s "
+          f"with {-(-link_rate // conn_rate)} connections")
+    print(f"{'mode':>10} {'seconds':>8} {'MiB/s':>7} {'429s':>5} {'final':>7}")
+
+    def run(server, tmp, name, controller, adaptive):
+        items = [FileDownloadItem(f"{server.url}?n={n}", filename=f"{name}_{n}.bin") for n in range(args.files)]
+        received = [0]
+        received_lock = threading.Lock()
+        done = Future()
+        remaining = [len(items)]
+
+        def finish(item):
+            with received_lock:
+                remaining[0] -= 1
+                if not remaining[0]:
+                    done.set_result(True)
+
+        def download(item):
+            last = [0]
+
+            def progress(downloaded, total):
+                with received_lock:
+                    received[0] += downloaded - last[0]
+                last[0] = downloaded
+
+            engine = SegmentedDownloader(segments=controller.fragments, min_segment_size=64 * 1024)
+            try:
+                engine.download(item.url, os.path.join(tmp, item.filename), item, progress)
+            except Exception as e:
+                if not is_throttle_error(e):
+                    raise
+                with received_lock:
+                    received[0] -= last[0]  # The partial transfer is discarded
+                controller.report_throttled()
+                timer = threading.Timer(controller.backoff, scheduler.submit, args=(item,))
+                timer.daemon = True
+                timer.start()
+                return
+            finish(item)
+
+        scheduler = DownloadScheduler(download, lambda: controller.slots, name=name)
+
+        def sample():
+            previous, previous_time = 0, time.perf_counter()
+            while not done.done():
+                time.sleep(controller.interval)
+                now = time.perf_counter()
+                with received_lock:
+                    total = received[0]
+                throughput = (total - previous) / (now - previous_time)
+                previous, previous_time = total, now
+                before = controller.slots
+                controller.update(throughput, scheduler.active_count())
+                if controller.slots > before:
+                    scheduler.notify()
+
+        start = time.perf_counter()
+        if adaptive:
+            threading.Thread(target=sample, daemon=True).start()
+        scheduler.submit_many(items)
+        done.result()
+        return time.perf_counter() - start
+
+    modes = [(f"{slots}x{fragments}", AdaptiveConcurrency(slots, fragments, max_slots=slots, max_fragments=fragments,
+                                                          backoff=args.backoff), False)
+             for slots, fragments in ((1, 4), (3, 4), (8, 4))]
+    modes.append(("adaptive", AdaptiveConcurrency(1, 1, max_slots=16, interval=args.interval, backoff=args.backoff),
+                  True))
+    for name, controller, adaptive in modes:
+        with RangeServer(payload, rate_per_connection=conn_rate, link_rate=link_rate,
+                         max_connections=args.max_connections) as server, tempfile.TemporaryDirectory() as tmp:
+            elapsed = run(server, tmp, name, controller, adaptive)
+            final = f"{controller.slots}x{controller.fragments}"
+            mib = args.files * args.size_kb / 1024
+            print(f"{name:>10} {elapsed:>8.2f} {mib / elapsed:>7.2f} {server.rejected:>5} {final:>7}")
+
+
+def bench_postprocess(args):
+    """ffmpeg conversion inside the download slot vs in a separate CPU-sized pool"""
+    import subprocess
+
+    from downloader_core import FileDownloadItem
+    from file_engine import SegmentedDownloader
+    from postprocess import PostProcessPool, audio_command, ffmpeg_path
+    from scheduler import DownloadScheduler
+
+    if ffmpeg_path() is None:
+        print("ffmpeg not found on PATH")
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "source.wav")
+        subprocess.run([ffmpeg_path(), "-v", "error", "-y", "-f", "lavfi", "-i",
+                        f"sine=frequency=440:duration={args.seconds}", "-ac", "2", source], check=True)
+        with open(source, "rb") as f:
+            payload = f.read()
+
+    pool = PostProcessPool(args.workers)
+    size_mb = len(payload) / (1024 * 1024)
+    print(f"Items: {args.items} x {size_mb:.1f} MiB WAV -> MP3, {args.slots} download slots, "
+          f"server limit {args.rate_kb} KiB/s per connection")
+    print(f"CPU cores: {os.cpu_count()}, post-processing jobs: {pool.workers} x {pool.threads} ffmpeg threads")
+    print(f"{'mode':>9} {'seconds':>8} {'failed':>7}")
+
+    def run(server, tmp, staged):
+        items = [FileDownloadItem(f"{server.url}?n={n}", filename=f"{n}.wav") for n in range(args.items)]
+        futures, failed = [], []
+        engine = SegmentedDownloader(segments=1)
+
+        def download(item):
+            raw = os.path.join(tmp, item.filename)
+            target = os.path.join(tmp, f"{item.filename}.{'staged' if staged else 'inline'}.mp3")
+            engine.download(item.url, raw, item)
+            command = audio_command(raw, target + ".part.mp3", "mp3", "pcm", 192, pool.threads)
+            if staged:
+                futures.append(pool.submit(item, command, [(target + ".part.mp3", target)], [raw]))
+            else:
+                # The slot stays taken until ffmpeg is done, as when yt-dlp post-processes
+                if subprocess.run(command).returncode:
+                    failed.append(item)
+
+        scheduler = DownloadScheduler(download, args.slots)
+        start = time.perf_counter()
+        scheduler.submit_many(items)
+        scheduler.wait_idle()
+        for future in futures:
+            if future.exception():
+                failed.append(future)
+        return time.perf_counter() - start, len(failed)
+
+    try:
+        with RangeServer(payload, rate_per_connection=args.rate_kb * 1024) as server:
+            for name, staged in (("inline", False), ("pipeline", True)):
+                with tempfile.TemporaryDirectory() as tmp:
+                    elapsed, failed = run(server, tmp, staged)
+                print(f"{name:>9} {elapsed:>8.2f} {failed:>7}")
+    finally:
+        pool.close()
+
+
+BENCHMARKS = {
+    "segmented": bench_segmented,
+    "ytdlp": bench_ytdlp,
+    "bulk": bench_bulk,
+    "async-files": bench_async_files,
+    "adaptive": bench_adaptive,
+    "postprocess": bench_postprocess,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="name", required=True)
+
+    p = sub.add_parser("segmented", help=bench_segmented.__doc__)
+    p.add_argument("--size-mb", type=int, default=16)
+    p.add_argument("--rate-kb", type=int, default=2048, help="per-connection server limit")
+    p.add_argument("--segments", type=int, nargs="+", default=[2, 4, 8])
+
+    p = sub.add_parser("ytdlp", help=bench_ytdlp.__doc__)
+    p.add_argument("--items", type=int, default=10)
+
+    p = sub.add_parser("bulk", help=bench_bulk.__doc__)
+    p.add_argument("--urls", type=int, default=1000)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 8])
+    p.add_argument("--batch-size", type=int, default=50)
+    p.add_argument("--latency-ms", type=int, default=100)
+
+    p = sub.add_parser("async-files", help=bench_async_files.__doc__)
+    p.add_argument("--files", type=int, default=500)
+    p.add_argument("--size-kb", type=int, default=64)
+    p.add_argument("--rate-kb", type=int, default=128, help="per-connection server limit")
+    p.add_argument("--one-core", action="store_true", help="pin the client to a single CPU core")
+
+    p = sub.add_parser("adaptive", help=bench_adaptive.__doc__)
+    p.add_argument("--files", type=int, default=32)
+    p.add_argument("--size-kb", type=int, default=1024)
+    p.add_argument("--rate-kb", type=int, default=256, help="per-connection server limit")
+    p.add_argument("--link-kb", type=int, default=2048, help="server limit for all connections together")
+    p.add_argument("--max-connections", type=int, default=16, help="concurrent requests before 429")
+    p.add_argument("--interval", type=float, default=0.5, help="controller sampling interval in seconds")
+    p.add_argument("--backoff", type=float, default=0.5, help="first retry delay after a 429")
+
+    p = sub.add_parser("postprocess", help=bench_postprocess.__doc__)
+    p.add_argument("--items", type=int, default=12)
+    p.add_argument("--slots", type=int, default=3, help="concurrent downloads")
+    p.add_argument("--seconds", type=int, default=60, help="length of each audio file")
+    p.add_argument("--rate-kb", type=int, default=2048, help="per-connection server limit")
+    p.add_argument("--workers", type=int, default=0, help="post-processing jobs (0 = one per core)")
+
+    args = parser.parse_args(argv)
+    BENCHMARKS[args.name](args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
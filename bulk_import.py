@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Bulk URL import
+Pulls URLs out of text, CSV files or clipboard contents, removes duplicates
+by canonical URL, and analyzes them through yt-dlp in parallel batches.
+"""
+
+import csv
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from yt_dlp import YoutubeDL
+except ImportError:
+    YoutubeDL = None
+
+from metadata_cache import canonical_url
+from ytdl_engine import YoutubeDLPool
+
+ANALYZE_WORKERS = 8
+BATCH_SIZE = 50
+
+URL_PATTERN = re.compile(r'https?://[^\s"\'<>,;]+', re.IGNORECASE)
+
+
+def parse_urls(text):
+    """Every http(s) URL in `text`, whether it is one-per-line or CSV"""
+    urls = []
+    for row in csv.reader(io.StringIO(text)):
+        for cell in row:
+            urls.extend(match.rstrip(').]') for match in URL_PATTERN.findall(cell))
+    return urls
+
+
+def read_url_file(path):
+    """URLs from a .txt or .csv file"""
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+        return parse_urls(f.read())
+
+
+def dedupe_urls(urls, seen=None):
+    """
+    Drop URLs whose canonical form was already seen, keeping the first
+    spelling of each. `seen` is an optional set of canonical URLs already
+    queued; it is updated in place.
+    """
+    seen = set() if seen is None else seen
+    unique = []
+    for url in urls:
+        key = canonical_url(url)
+        if key not in seen:
+            seen.add(key)
+            unique.append(url)
+    return unique
+
+
+class AnalysisResult:
+    """Outcome of analyzing one URL; the full info dict lives in the metadata cache"""
+    __slots__ = ('url', 'title', 'platform', 'error')
+
+    def __init__(self, url, title="", platform="", error=""):
+        self.url = url
+        self.title = title
+        self.platform = platform
+        self.error = error
+
+
+class BulkAnalyzer:
+    """Runs yt-dlp extraction over many URLs on a bounded pool, batch by batch"""
+    def __init__(self, metadata_cache=None, workers=ANALYZE_WORKERS, batch_size=BATCH_SIZE, pool=None):
+        """`pool` is an optional ytdl_engine.YoutubeDLPool the workers check extractors out of"""
+        self.metadata_cache = metadata_cache
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.pool = pool or YoutubeDLPool(max_size=self.workers)
+
+    def analyze_one(self, url):
+        info = self.metadata_cache.get(url) if self.metadata_cache else None
+        try:
+            if info is None:
+                info = self.pool.extract_info(url)
+                if self.metadata_cache:
+                    self.metadata_cache.put(url, info)
+        except Exception as e:
+            return AnalysisResult(url, title=url, platform="Generic", error=str(e))
+        return AnalysisResult(url, title=(info.get('title') or 'Unknown')[:100],
+                              platform=info.get('extractor_key', 'Generic'))
+
+    def analyze(self, urls, on_batch=None, cancel_event=None):
+        """
+        Analyze `urls` and return their AnalysisResults in input order.
+        `on_batch(done, total)` is called after each batch; setting
+        `cancel_event` stops before the next batch.
+        """
+        if YoutubeDL is None:
+            raise Exception("yt-dlp not found. Please install yt-dlp.")
+        results = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analyze") as executor:
+            for start in range(0, len(urls), self.batch_size):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                batch = urls[start:start + self.batch_size]
+                results.extend(executor.map(self.analyze_one, batch))
+                if on_batch:
+                    on_batch(len(results), len(urls))
+        return results
+
+    def close(self):
+        self.pool.close()
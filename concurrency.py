@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Adaptive concurrency
+Finds how many downloads (and fragment connections per download) the link
+actually rewards. Every interval the aggregate throughput is sampled:
+slots are doubled and then raised one at a time while that keeps paying
+off (additive increase), the last step is undone once throughput stops
+improving, and both slots and fragments are halved when a site answers
+429/403 (multiplicative decrease).
+"""
+
+import math
+import threading
+import time
+
+SAMPLE_INTERVAL = 2.0
+
+# A step must raise throughput by this fraction to count as an improvement
+MIN_GAIN = 0.05
+
+# Intervals to hold after a decrease before probing upwards again
+HOLD_INTERVALS = 3
+
+# First wait before retrying a throttled download; doubles on every retry
+BACKOFF_SECONDS = 5.0
+MAX_RETRIES = 4
+
+THROTTLE_MARKERS = ('HTTP Error 429', 'HTTP Error 403', '429 Client Error', '403 Client Error',
+                    'Too Many Requests')
+
+
+def is_throttle_error(error):
+    """True if `error` looks like the site refusing us for sending too much"""
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) in (403, 429):
+        return True
+    if getattr(error, 'status', None) in (403, 429):
+        return True
+    return any(marker in str(error) for marker in THROTTLE_MARKERS)
+
+
+class AdaptiveConcurrency:
+    """AIMD controller for download slots and per-download fragment connections"""
+    def __init__(self, slots=3, fragments=4, min_slots=1, max_slots=8, min_fragments=1, max_fragments=8,
+                 interval=SAMPLE_INTERVAL, min_gain=MIN_GAIN, hold_intervals=HOLD_INTERVALS,
+                 backoff=BACKOFF_SECONDS, max_retries=MAX_RETRIES, clock=time.monotonic):
+        self.lock = threading.Lock()
+        self.clock = clock
+        self.interval = interval
+        self.min_slots, self.max_slots = min_slots, max_slots
+        self.min_fragments, self.max_fragments = min_fragments, max_fragments
+        self.slots = min(max(slots, min_slots), max_slots)
+        self.fragments = min(max(fragments, min_fragments), max_fragments)
+        self.min_gain = min_gain
+        self.hold_intervals = hold_intervals
+        self.backoff = backoff
+        self.max_retries = max_retries
+        self.hold = 0
+        self.slow_start = True
+        self.baseline = 0.0  # Throughput measured before the last increase
+        self.previous = None  # (slots, fragments) before the last increase, while it is on trial
+        self.ceiling = None  # Connections at which the site last answered 429/403
+        self.decreased_at = 0.0
+        self.throttled = 0
+
+    def configure(self, max_slots=None, max_fragments=None):
+        """Change the upper bounds; current values above them are lowered"""
+        with self.lock:
+            if max_slots is not None:
+                self.max_slots = max(self.min_slots, int(max_slots))
+                self.slots = min(self.slots, self.max_slots)
+            if max_fragments is not None:
+                self.max_fragments = max(self.min_fragments, int(max_fragments))
+                self.fragments = min(self.fragments, self.max_fragments)
+
+    def reset(self, slots, fragments):
+        """Start probing again from the given values"""
+        with self.lock:
+            self.slots = min(max(int(slots), self.min_slots), self.max_slots)
+            self.fragments = min(max(int(fragments), self.min_fragments), self.max_fragments)
+            self.previous = None
+            self.ceiling = None
+            self.slow_start = True
+            self.hold = 0
+            self.throttled = 0
+
+    def backoff_delay(self, retries):
+        """Seconds to wait before the next attempt of a download throttled `retries` times before"""
+        return self.backoff * (2 ** retries)
+
+    def report_throttled(self):
+        """Note a 429/403 answer; acted on at the next update"""
+        with self.lock:
+            self.throttled += 1
+
+    def connection_cap(self):
+        """Most connections to try: one fewer than where the site last refused us"""
+        return self.ceiling - 1 if self.ceiling else self.max_slots * self.max_fragments
+
+    def update(self, throughput, active):
+        """
+        Feed one sample: aggregate bytes/s and how many downloads were
+        running. Returns (slots, fragments) to use from now on.
+        """
+        with self.lock:
+            now = self.clock()
+            if self.throttled and now - self.decreased_at < self.interval:
+                # Refusals from before the last decrease took effect; halve only once for them
+                self.throttled = 0
+            if self.throttled:
+                self.throttled = 0
+                self.ceiling = self.slots * self.fragments
+                self.slots = max(self.min_slots, math.floor(self.slots / 2))
+                self.fragments = max(self.min_fragments, math.floor(self.fragments / 2))
+                self.previous = None
+                self.slow_start = False
+                self.hold = self.hold_intervals
+                self.decreased_at = now
+            elif self.hold:
+                self.hold -= 1
+            elif active < self.slots:
+                # Not enough queued work to fill the slots; the sample says nothing about the link
+                self.previous = None
+            elif self.previous and throughput < self.baseline * (1 + self.min_gain):
+                # The last step did not pay off: the link is saturated, go back
+                self.slots, self.fragments = self.previous
+                self.previous = None
+                self.slow_start = False
+                self.hold = self.hold_intervals
+            else:
+                self.baseline = throughput
+                self.previous = (self.slots, self.fragments)
+                cap = self.connection_cap()
+                # Double while every step pays off, then probe one connection at a time
+                if self.slots < self.max_slots:
+                    step = self.slots if self.slow_start else 1
+                    self.slots = max(self.slots, min(self.max_slots, self.slots + step, cap // self.fragments))
+                elif self.fragments < self.max_fragments:
+                    step = self.fragments if self.slow_start else 1
+                    self.fragments = max(self.fragments, min(self.max_fragments, self.fragments + step, cap // self.slots))
+                if (self.slots, self.fragments) <= self.previous:
+                    self.previous = None  # Nothing left to try
+            return self.slots, self.fragments
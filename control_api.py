@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Local control API
+An optional HTTP/JSON server on localhost for driving a DownloadCore from
+other tools: enqueue, list, pause, resume, cancel, retry and remove jobs,
+plus a Server-Sent Events stream of job status and progress.
+
+Every request needs the token, as "Authorization: Bearer <token>" or as
+"?token=<token>" (for EventSource clients, which cannot set headers).
+
+    GET    /api/jobs[?status=downloading]   list jobs
+    POST   /api/jobs                        {"url": ...} or {"urls": [...]}, optional "kind": "file"
+    GET    /api/jobs/<id>                   one job
+    POST   /api/jobs/<id>/<action>          pause, resume, cancel or retry
+    POST   /api/jobs/<id>/limit             {"kbps": N} caps one job (0 = no own cap, null = default)
+    DELETE /api/jobs/<id>                   remove a job
+    GET    /api/events                      text/event-stream of "job", "removed" and "status" events
+"""
+
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from progress_bus import ProgressBus
+
+DEFAULT_PORT = 8765
+
+# Each event stream sends at most one update per job per interval
+EVENT_INTERVAL = 0.25
+HEARTBEAT_INTERVAL = 15.0
+
+TOKEN_FILE = Path.home() / ".social_downloader" / "api_token"
+
+
+def load_token(path=TOKEN_FILE):
+    """The API token, created on first use and readable only by the owner"""
+    path = Path(path)
+    try:
+        token = path.read_text().strip()
+        if token:
+            return token
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    token = secrets.token_urlsafe(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        f.write(token)
+    return token
+
+
+def job_to_dict(item):
+    """JSON view of a DownloadItem or FileDownloadItem"""
+    is_file = hasattr(item, 'filename')
+    return {
+        'id': item.id,
+        'kind': 'file' if is_file else 'video',
+        'url': item.url,
+        'title': item.filename if is_file else item.title,
+        'status': item.status,
+        'progress': round(item.progress, 1),
+        'speed': item.speed,
+        'file_path': item.file_path,
+        'error': item.error_message,
+        'rate_limit': item.rate_limit,
+        'estimated_bytes': getattr(item, 'estimated_bytes', 0),
+        'outputs': getattr(item, 'outputs', []),
+        'output_paths': getattr(item, 'output_paths', []),
+    }
+
+
+class EventStream:
+    """One connected SSE client; coalesces updates so slow clients see latest state only"""
+    def __init__(self):
+        self.bus = ProgressBus()
+        self.buffer = []
+
+    def publish(self, key, event, payload):
+        self.bus.publish(key, self._render, event, payload)
+
+    def _render(self, event, payload):
+        data = job_to_dict(payload) if event == 'job' else payload
+        self.buffer.append(f"event: {event}\ndata: {json.dumps(data)}\n\n")
+
+    def take(self):
+        """Everything published since the last call, rendered as SSE text"""
+        self.bus.drain()
+        text, self.buffer = "".join(self.buffer), []
+        return text
+
+
+class ControlServer:
+    """Serves the control API for `core` on a background thread"""
+    def __init__(self, core, port=DEFAULT_PORT, token=None, host="127.0.0.1"):
+        self.core = core
+        self.token = token or load_token()
+        self.streams = set()
+        self.lock = threading.Lock()
+        self.running = threading.Event()
+        core.add_listener(self.on_core_event)
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.handle(self, "GET")
+
+            def do_POST(self):
+                server.handle(self, "POST")
+
+            def do_DELETE(self):
+                server.handle(self, "DELETE")
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.url = f"http://{host}:{self.port}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="control-api", daemon=True)
+
+    def start(self):
+        self.running.set()
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running.clear()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def on_core_event(self, event, payload):
+        """Fan core notifications out to every connected event stream"""
+        if event == 'items':
+            updates = [('job', item) for item in payload or []]
+        elif event in ('item', 'file') and payload is not None:
+            updates = [('job', payload)]
+        elif event == 'status':
+            updates = [('status', payload)]
+        else:
+            return
+        with self.lock:
+            streams = list(self.streams)
+        for stream in streams:
+            for name, value in updates:
+                key = value.id if name == 'job' else name
+                stream.publish(key, name, value)
+
+    # Request handling
+
+    def authorized(self, handler, query):
+        header = handler.headers.get("Authorization", "")
+        supplied = header[7:] if header.startswith("Bearer ") else query.get("token", [""])[0]
+        return hmac.compare_digest(supplied.encode(), self.token.encode())
+
+    def send_json(self, handler, status, body):
+        data = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def read_json(self, handler):
+        length = int(handler.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        body = json.loads(handler.rfile.read(length))
+        if not isinstance(body, dict):
+            raise ValueError("expected a JSON object")
+        return body
+
+    def handle(self, handler, method):
+        parts = urllib.parse.urlsplit(handler.path)
+        query = urllib.parse.parse_qs(parts.query)
+        path = [segment for segment in parts.path.split("/") if segment]
+
+        if not self.authorized(handler, query):
+            return self.send_json(handler, 401, {'error': 'missing or invalid token'})
+        if path[:1] != ["api"]:
+            return self.send_json(handler, 404, {'error': 'not found'})
+
+        try:
+            if path == ["api", "events"] and method == "GET":
+                return self.stream_events(handler)
+            if path == ["api", "jobs"] and method == "GET":
+                return self.list_jobs(handler, query)
+            if path == ["api", "jobs"] and method == "POST":
+                return self.enqueue(handler, self.read_json(handler))
+            if len(path) >= 3 and path[1] == "jobs":
+                item = self.core.find(path[2])
+                if item is None:
+                    return self.send_json(handler, 404, {'error': 'no such job'})
+                if len(path) == 3 and method == "GET":
+                    return self.send_json(handler, 200, job_to_dict(item))
+                if len(path) == 3 and method == "DELETE":
+                    return self.remove(handler, item)
+                if len(path) == 4 and method == "POST":
+                    return self.control(handler, item, path[3])
+            return self.send_json(handler, 404, {'error': 'not found'})
+        except ValueError as e:
+            return self.send_json(handler, 400, {'error': str(e)})
+
+    def list_jobs(self, handler, query):
+        statuses = set(query.get("status", []))
+        jobs = [job_to_dict(item) for item in self.core.download_items + self.core.file_items
+                if not statuses or item.status in statuses]
+        self.send_json(handler, 200, {'jobs': jobs})
+
+    def enqueue(self, handler, body):
+        urls = body.get("urls") or ([body["url"]] if body.get("url") else [])
+        if not isinstance(urls, list):
+            raise ValueError("'urls' must be a list")
+        urls = [url for url in urls if isinstance(url, str) and url.startswith(("http://", "https://"))]
+        if not urls:
+            raise ValueError("expected 'url' or 'urls' with http(s) URLs")
+
+        if body.get("kind") == "file":
+            jobs = [job_to_dict(self.core.add_file(url)) for url in urls]
+            return self.send_json(handler, 201, {'jobs': jobs})
+
+        # Video URLs may be playlists; their jobs appear on the event stream as they are listed
+        urls = self.core.new_urls(urls)
+        if len(urls) > 1:
+            self.core.start_bulk_import(urls)
+        elif urls:
+            self.core.add_url(urls[0])
+        self.send_json(handler, 202, {'accepted': urls})
+
+    def control(self, handler, item, action):
+        if action == 'limit':
+            kbps = self.read_json(handler).get('kbps')
+            if kbps is not None and (not isinstance(kbps, (int, float)) or kbps < 0):
+                raise ValueError("'kbps' must be a non-negative number or null")
+            self.core.set_rate_limit(item, kbps)
+            return self.send_json(handler, 200, job_to_dict(item))
+        is_file = hasattr(item, 'filename')
+        actions = {
+            'pause': self.core.pause_file if is_file else self.core.pause,
+            'resume': self.core.resume_file if is_file else self.core.resume,
+            'cancel': self.core.cancel_file if is_file else self.core.cancel,
+            'retry': self.core.retry_file if is_file else self.core.retry,
+        }
+        if action not in actions:
+            raise ValueError(f"unknown action '{action}'")
+        actions[action](item)
+        self.send_json(handler, 200, job_to_dict(item))
+
+    def remove(self, handler, item):
+        if hasattr(item, 'filename'):
+            self.core.remove_file(item)
+        else:
+            self.core.remove(item)
+        with self.lock:
+            streams = list(self.streams)
+        for stream in streams:
+            stream.publish(item.id, 'removed', {'id': item.id})
+        self.send_json(handler, 200, {'removed': item.id})
+
+    def stream_events(self, handler):
+        """Hold the connection open and push coalesced job updates"""
+        stream = EventStream()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+
+        # Start with a snapshot of every job, then only changes
+        for item in self.core.download_items + self.core.file_items:
+            stream.publish(item.id, 'job', item)
+        with self.lock:
+            self.streams.add(stream)
+        last_write = time.time()
+        try:
+            while self.running.is_set():
+                text = stream.take()
+                if not text and time.time() - last_write >= HEARTBEAT_INTERVAL:
+                    text = ": keep-alive\n\n"
+                if text:
+                    handler.wfile.write(text.encode())
+                    handler.wfile.flush()
+                    last_write = time.time()
+                time.sleep(EVENT_INTERVAL)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self.lock:
+                self.streams.discard(stream)
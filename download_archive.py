@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+yt-dlp compatible download archive
+One "<extractor> <id>" line per downloaded video, the same format as
+yt-dlp's --download-archive, so existing archive files can be imported
+and ours can be handed back to yt-dlp. The file is read once into a set;
+new entries are appended in batches from a background thread.
+"""
+
+import threading
+from pathlib import Path
+
+try:
+    from yt_dlp.extractor import gen_extractor_classes
+except ImportError:
+    gen_extractor_classes = None
+
+ARCHIVE_NAME = "download-archive.txt"
+FLUSH_INTERVAL = 1.0
+
+_extractors = None
+_extractors_lock = threading.Lock()
+
+
+def make_archive_id(extractor, video_id):
+    return f"{extractor.lower()} {video_id}"
+
+
+def archive_id(info):
+    """Archive line for a full or flat yt-dlp info dict, or None"""
+    if not info:
+        return None
+    extractor = info.get('extractor_key') or info.get('ie_key')
+    if not extractor or not info.get('id'):
+        return None
+    return make_archive_id(extractor, info['id'])
+
+
+def url_archive_id(url):
+    """
+    Archive line for `url` worked out from the URL alone, like yt-dlp does
+    before extracting; None for URLs whose id needs a network request.
+    """
+    global _extractors
+    if gen_extractor_classes is None:
+        return None
+    with _extractors_lock:
+        if _extractors is None:
+            _extractors = [ie for ie in gen_extractor_classes() if ie.ie_key() != 'Generic']
+    for ie in _extractors:
+        if ie.suitable(url):
+            video_id = ie.get_temp_id(url)
+            return make_archive_id(ie.ie_key(), video_id) if video_id else None
+    return None
+
+
+class DownloadArchive:
+    """
+    In-memory set of archive lines backed by an append-only file.
+
+    The object can be passed as yt-dlp's `download_archive` option: yt-dlp
+    then checks it with `in` and records finished downloads with add().
+    """
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self.entries = set()
+        self.pending = []
+        self.closed = threading.Event()
+        if self.path.exists():
+            self.entries = set(self.read_lines(self.path))
+        self.flush_interval = flush_interval
+        self.thread = threading.Thread(target=self._writer, name="download-archive", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def read_lines(path):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return [line.strip() for line in f if line.strip()]
+
+    def __contains__(self, entry):
+        return entry in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.entries))
+
+    def add(self, entry):
+        """Record one archive line; written to disk with the next batch"""
+        with self.lock:
+            if entry and entry not in self.entries:
+                self.entries.add(entry)
+                self.pending.append(entry)
+
+    def contains_info(self, info):
+        entry = archive_id(info)
+        return entry is not None and entry in self.entries
+
+    def contains_url(self, url):
+        """True if `url` is known to be archived without extracting it"""
+        if not self.entries:
+            return False
+        entry = url_archive_id(url)
+        return entry is not None and entry in self.entries
+
+    def add_info(self, info):
+        entry = archive_id(info)
+        if entry:
+            self.add(entry)
+
+    def flush(self):
+        with self.lock:
+            if not self.pending:
+                return 0
+            pending, self.pending = self.pending, []
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write("".join(entry + "\n" for entry in pending))
+        return len(pending)
+
+    def _writer(self):
+        while not self.closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Error writing download archive: {e}")
+
+    def import_file(self, path):
+        """Merge another archive file into this one; returns how many entries were new"""
+        before = len(self.entries)
+        for entry in self.read_lines(path):
+            self.add(entry)
+        self.flush()
+        return len(self.entries) - before
+
+    def export(self, path):
+        """Write every entry to `path` as a standalone archive file"""
+        with self.lock:
+            entries = sorted(self.entries)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("".join(entry + "\n" for entry in entries))
+        return len(entries)
+
+    def close(self):
+        self.closed.set()
+        self.thread.join(timeout=5)
+        self.flush()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Social Media Downloader command line
+Downloads without a window, either once or as a long-running daemon that
+takes URLs from a watch folder or from stdin. Never imports Tk.
+
+    python -m downloader_cli URL [URL ...]
+    python -m downloader_cli --import urls.txt
+    python -m downloader_cli --daemon --watch ~/Downloads/queue
+    some-producer | python -m downloader_cli --daemon --stdin
+    python -m downloader_cli --daemon --api
+    python -m downloader_cli --archive-import old-archive.txt --import channels.txt
+"""
+
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+from bulk_import import parse_urls, read_url_file
+from control_api import DEFAULT_PORT, TOKEN_FILE, ControlServer
+from downloader_core import DownloadCore, FINISHED_STATUSES
+from format_planner import FORMAT_CHOICES, is_audio_format, split_format_choice
+
+WATCH_INTERVAL = 2.0
+WATCH_PATTERNS = ("*.txt", "*.csv")
+
+
+class ConsoleReporter:
+    """Prints one line whenever an item changes status"""
+    def __init__(self, quiet=False):
+        self.quiet = quiet
+        self.lock = threading.Lock()
+        self.output_lock = threading.Lock()
+        self.seen = {}  # item -> last printed status
+
+    def __call__(self, event, payload):
+        if event == 'status':
+            if not self.quiet:
+                self.print(payload)
+            return
+        if event not in ('item', 'file') or payload is None:
+            return
+        with self.lock:
+            if self.seen.get(payload) == payload.status:
+                return
+            self.seen[payload] = payload.status
+            if payload.status in FINISHED_STATUSES:
+                # Finished items never report again; don't keep them around
+                del self.seen[payload]
+        name = getattr(payload, 'title', None) or getattr(payload, 'filename', payload.url)
+        if payload.status == 'completed':
+            self.print(f"[completed] {name} -> {payload.file_path}")
+            for path in getattr(payload, 'output_paths', []):
+                self.print(f"[completed] {name} -> {path}")
+        elif payload.status == 'error':
+            self.print(f"[error] {name}: {payload.error_message}")
+        elif not self.quiet:
+            self.print(f"[{payload.status}] {name}")
+
+    def print(self, message):
+        # Events arrive from many worker threads; keep lines whole
+        with self.output_lock:
+            sys.stdout.write(message + "\n")
+            sys.stdout.flush()
+
+
+def queue_urls(core, urls, files=False):
+    """Queue `urls` as video downloads (expanding playlists) or as direct file downloads"""
+    if files:
+        for url in urls:
+            core.add_file(url)
+        return len(urls)
+    urls = core.new_urls(urls)
+    if len(urls) > 1:
+        core.bulk_import(urls)
+    elif urls:
+        core.add_url(urls[0], wait=True)
+    return len(urls)
+
+
+def watch_folder(core, folder, files=False):
+    """Import every URL list dropped into `folder`, then move it to folder/processed"""
+    folder = Path(folder).expanduser()
+    processed = folder / "processed"
+    processed.mkdir(parents=True, exist_ok=True)
+    print(f"Watching {folder} for URL lists", flush=True)
+    while True:
+        for pattern in WATCH_PATTERNS:
+            for path in sorted(folder.glob(pattern)):
+                try:
+                    urls = read_url_file(path)
+                    path.replace(processed / path.name)
+                except OSError as e:
+                    print(f"Error reading {path}: {e}", flush=True)
+                    continue
+                print(f"{path.name}: {queue_urls(core, urls, files)} new URLs", flush=True)
+        core.prune_finished()
+        time.sleep(WATCH_INTERVAL)
+
+
+def read_stdin(core, files=False):
+    """Queue URLs line by line as they arrive on stdin"""
+    for line in sys.stdin:
+        urls = parse_urls(line)
+        if urls:
+            queue_urls(core, urls, files)
+        core.prune_finished()
+
+
+def serve_forever(core):
+    """Keep a daemon alive for the control API, forgetting finished jobs as it goes"""
+    while True:
+        core.prune_finished()
+        time.sleep(WATCH_INTERVAL)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download social media videos and files without a GUI")
+    parser.add_argument("urls", nargs="*", help="URLs to download")
+    parser.add_argument("--import", dest="import_file", metavar="FILE", help="text or CSV file of URLs")
+    parser.add_argument("--files", action="store_true", help="treat URLs as direct file downloads")
+    parser.add_argument("-o", "--output", help="download folder (default: from the app settings)")
+    parser.add_argument("-q", "--quality", help="video quality, e.g. 720p, or audio bitrate, e.g. 128kbps")
+    parser.add_argument("-f", "--format", choices=FORMAT_CHOICES,
+                        help="mp4 for video; mp3, m4a, opus or audio (original codec) for audio only; "
+                             "mp4+mp3 or mp4+m4a for both from one download")
+    parser.add_argument("--clip", action="append", default=[], metavar="START-END",
+                        help="also cut a clip from each download, e.g. 1:00-1:30 (repeatable)")
+    parser.add_argument("--limit-rate", type=int, metavar="KBPS", help="total download limit in KiB/s")
+    parser.add_argument("--adaptive", action="store_true", help="adapt concurrent downloads to measured throughput")
+    parser.add_argument("--redownload", action="store_true", help="download items even if already downloaded or archived")
+    parser.add_argument("--archive-import", metavar="FILE", help="merge a yt-dlp --download-archive file first")
+    parser.add_argument("--archive-export", metavar="FILE", help="write the download archive in yt-dlp's format")
+    parser.add_argument("--quiet", action="store_true", help="only report completed and failed items")
+    parser.add_argument("--daemon", action="store_true", help="keep running and take URLs from --watch or --stdin")
+    parser.add_argument("--watch", metavar="DIR", help="folder to watch for .txt/.csv URL lists")
+    parser.add_argument("--stdin", action="store_true", help="read URLs from standard input")
+    parser.add_argument("--api", nargs="?", type=int, const=DEFAULT_PORT, metavar="PORT",
+                        help=f"serve the local control API (default port {DEFAULT_PORT})")
+    args = parser.parse_args(argv)
+
+    if args.daemon and not (args.watch or args.stdin or args.api is not None):
+        parser.error("--daemon needs --watch DIR, --stdin or --api")
+    if not args.daemon and not (args.urls or args.import_file or args.archive_import or args.archive_export):
+        parser.error("give URLs, --import FILE or --daemon")
+
+    core = DownloadCore(owner="cli")
+    # Command-line overrides apply to this run only; they are not saved
+    if args.output:
+        core.config.config['download_path'] = str(Path(args.output).expanduser())
+    if args.format:
+        core.config.config['default_format'] = args.format
+    format_type, _ = split_format_choice(core.config.config['default_format'])
+    if args.quality:
+        key = 'default_audio_quality' if is_audio_format(format_type) else 'default_video_quality'
+        core.config.config[key] = args.quality
+    for clip in args.clip:
+        start, _, end = clip.partition('-')
+        core.extra_outputs.append({'format_type': format_type, 'quality': core.default_quality(format_type),
+                                   'start': start or None, 'end': end or None})
+    if args.limit_rate is not None:
+        core.config.config['max_download_rate_kbps'] = args.limit_rate
+        core.apply_bandwidth_settings()
+    if args.adaptive:
+        core.config.config['adaptive_concurrency'] = True
+    if args.redownload:
+        core.config.config['skip_duplicates'] = False
+        core.config.config['use_download_archive'] = False
+    reporter = ConsoleReporter(quiet=args.quiet)
+    core.add_listener(reporter)
+    if args.archive_import:
+        core.import_archive(args.archive_import)
+    if args.daemon:
+        # One-shot runs only do what they were given; a daemon picks up its unfinished queue
+        core.restore_queue()
+    if args.api is not None:  # Port 0 picks a free port
+        api = ControlServer(core, port=args.api).start()
+        print(f"Control API on {api.url} (token in {TOKEN_FILE})", flush=True)
+
+    try:
+        urls = list(args.urls)
+        if args.import_file:
+            urls.extend(read_url_file(args.import_file))
+        if urls:
+            queue_urls(core, urls, args.files)
+
+        if args.watch:
+            watch_folder(core, args.watch, args.files)
+        elif args.stdin:
+            read_stdin(core, args.files)
+        elif args.daemon:
+            serve_forever(core)
+        core.wait_idle()
+    except KeyboardInterrupt:
+        print("Interrupted; partial file downloads will resume next time", flush=True)
+        core.close()
+        return 130
+
+    if args.archive_export:
+        core.export_archive(args.archive_export)
+    failed = sum(1 for item in core.download_items + core.file_items if item.status == 'error')
+    core.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
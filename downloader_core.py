@@ -0,0 +1,1262 @@
+#!/usr/bin/env python3
+"""
+Headless download core
+Configuration, download items and every download worker, with no GUI
+dependency. The desktop app, the command line and the daemon are all
+clients of DownloadCore and observe it through listeners.
+"""
+
+import json
+import os
+import queue
+import re
+import threading
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait as wait_for_futures
+from pathlib import Path
+import time
+
+import requests
+from yt_dlp import YoutubeDL
+from yt_dlp.utils import DownloadCancelled, DownloadError
+
+import async_file_engine
+from async_file_engine import AsyncFileEngine
+from bandwidth import BandwidthLimiter
+from bulk_import import BulkAnalyzer, dedupe_urls
+from concurrency import AdaptiveConcurrency, is_throttle_error
+from download_archive import ARCHIVE_NAME, DownloadArchive
+from duplicate_index import DuplicateIndex, link_existing
+from file_engine import SegmentedDownloader, discard_partial, find_journals
+from format_planner import (VIDEO_FORMATS, is_audio_format, plan_download, result_audio_codec, split_format_choice,
+                            ydl_format_options)
+from job_store import JobStore
+from metadata_cache import MetadataCache, canonical_url
+from playlist_expander import PlaylistExpander
+from postprocess import AUDIO_CONTAINERS, PostProcessPool, multi_output_command
+from scheduler import DownloadScheduler
+from stream_merge import StreamMergeError, StreamMerger, can_stream
+
+# Statuses after which an item needs nothing more from the workers
+FINISHED_STATUSES = ('completed', 'error', 'cancelled')
+
+
+def safe_filename(title):
+    """`title` without characters that are invalid in file names"""
+    return re.sub(r'[<>:"/\\|?*]', '', title) or "download"
+
+
+class Config:
+    def __init__(self):
+        self.config_dir = Path.home() / ".social_downloader"
+        self.config_file = self.config_dir / "config.json"
+        self.config_dir.mkdir(exist_ok=True)
+
+        self.default_config = {
+            "theme": "system",
+            "download_path": str(Path.home() / "Downloads" / "SocialDownloader"),
+            "default_video_quality": "720p",
+            "default_audio_quality": "192kbps",
+            "default_format": "mp4",
+            "max_concurrent": 3,
+            "max_concurrent_files": 4,
+            "file_segments": 4,
+            "concurrent_fragments": 4,
+            "adaptive_concurrency": False,
+            "adaptive_max_concurrent": 8,
+            "separate_postprocessing": True,
+            "streaming_merge": False,
+            "postprocess_workers": 0,
+            "file_engine": "threads",
+            "async_max_transfers": 500,
+            "max_download_rate_kbps": 0,
+            "max_item_rate_kbps": 0,
+            "ui_refresh_hz": 15,
+            "metadata_cache_ttl": 3600,
+            "api_enabled": False,
+            "api_port": 8765,
+            "skip_duplicates": True,
+            "use_download_archive": True,
+            "duplicate_action": "skip",
+            "naming_pattern": "{title}",
+            "create_subfolders": True,
+            "instant_download": False,
+            "platforms": {
+                "youtube": True,
+                "instagram": True,
+                "tiktok": True,
+                "twitter": True,
+                "facebook": True
+            }
+        }
+
+        self.config = self.load_config()
+
+    def load_config(self):
+        try:
+            if self.config_file.exists():
+                with open(self.config_file, 'r') as f:
+                    config = json.load(f)
+                for key, value in self.default_config.items():
+                    if key not in config:
+                        config[key] = value
+                return config
+            else:
+                return self.default_config.copy()
+        except Exception:
+            return self.default_config.copy()
+
+    def save_config(self):
+        try:
+            with open(self.config_file, 'w') as f:
+                json.dump(self.config, f, indent=4)
+        except Exception as e:
+            print(f"Error saving config: {e}")
+
+
+class DownloadItem:
+    def __init__(self, url, title="", platform="", quality="720p", format_type="mp4"):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.title = title
+        self.platform = platform
+        self.quality = quality
+        self.format_type = format_type
+        self.status = "pending"
+        self.priority = 0
+        self.progress = 0
+        self.file_path = ""
+        self.rate_limit = None  # Bytes per second; None uses the default item limit
+        self.error_message = ""
+        self.speed = 0.0
+        self.pause_event = threading.Event()
+        self.pause_event.set()  # Start unpaused
+        self.cancel_event = threading.Event()
+        self.download_thread = None
+        self.ydl_instance = None
+        self.file_size = 0
+        self.downloaded_bytes = 0
+        self.estimated_bytes = 0  # Size of the planned streams, when the site reports one
+        self.throttle_retries = 0  # Requeues after the site answered 429/403
+        self.info = None  # Full metadata when a playlist listing already provided it
+        self.outputs = []  # Further results made from the same download: format_type, quality, start, end
+        self.output_paths = []  # Files written for `outputs`
+
+    def speed_mbps(self):
+        return self.speed / (1024 * 1024) if self.speed else 0.0
+
+    def pause(self):
+        self.pause_event.clear()
+        self.status = "paused"
+
+    def resume(self):
+        self.pause_event.set()
+        if self.status == "paused":
+            self.status = "downloading"
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.pause_event.set()  # Unblock if paused
+        self.status = "cancelled"
+
+    def add_output(self, format_type, quality, start=None, end=None):
+        """
+        Also make `format_type` (a clip if `start`/`end` are set) from this
+        download. False if it is made already or cannot be made from it.
+        """
+        output = {'format_type': format_type, 'quality': quality, 'start': start, 'end': end}
+        if output in self.outputs or (format_type == self.format_type and not start and not end):
+            return False
+        if not is_audio_format(format_type) and is_audio_format(self.format_type):
+            if start or end:
+                return False  # Only the audio stream is downloaded
+            # The video has to be downloaded anyway; the audio is extracted from it
+            self.outputs.append({'format_type': self.format_type, 'quality': self.quality,
+                                 'start': None, 'end': None})
+            self.format_type, self.quality = format_type, quality
+            return True
+        self.outputs.append(output)
+        return True
+
+
+class FileDownloadItem:
+    def __init__(self, url, filename=None):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.filename = filename or os.path.basename(urllib.parse.urlparse(url).path) or "download.bin"
+        self.status = "pending"
+        self.progress = 0
+        self.speed = 0.0
+        self.file_path = ""
+        self.rate_limit = None  # Bytes per second; None uses the default item limit
+        self.error_message = ""
+        self.pause_event = threading.Event()
+        self.pause_event.set()
+        self.cancel_event = threading.Event()
+
+    def speed_mbps(self):
+        return self.speed / (1024 * 1024) if self.speed else 0.0
+
+    def pause(self):
+        self.pause_event.clear()
+        self.status = "paused"
+
+    def resume(self):
+        self.pause_event.set()
+        if self.status == "paused":
+            self.status = "downloading"
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.pause_event.set()
+        self.status = "cancelled"
+
+
+class DownloadCore:
+    """
+    Owns the video and file download queues and their workers.
+
+    Listeners are called as `listener(event, payload)` from worker threads:
+    'item' (a DownloadItem changed), 'items' (the list of items added to
+    download_items, or None when items were removed), 'file' (a
+    FileDownloadItem changed, or None when file_items changed) and 'status'
+    (a human-readable message).
+
+    Every job is recorded in a JobStore as it changes, so restore_queue()
+    can pick up where the previous session stopped. Each front end passes
+    its own `owner` so it only restores its own jobs.
+    """
+    def __init__(self, config=None, owner="core"):
+        self.config = config or Config()
+        self.metadata_cache = MetadataCache(ttl=self.config.config['metadata_cache_ttl'])
+        self.job_store = JobStore(owner=owner)
+        self.duplicate_index = DuplicateIndex()
+        self.archives = {}  # download root -> DownloadArchive
+        self.archive_lock = threading.Lock()
+        self.bandwidth = BandwidthLimiter()
+        self.apply_bandwidth_settings()
+        self.concurrency = AdaptiveConcurrency(slots=self.config.config['max_concurrent'],
+                                               fragments=self.config.config['concurrent_fragments'],
+                                               max_slots=self.config.config['adaptive_max_concurrent'])
+        self.stopped = threading.Event()
+        self.postprocess = PostProcessPool(self.config.config['postprocess_workers'])
+        self.scheduler = DownloadScheduler(
+            self.download_item,
+            self.concurrency_limit,
+            skip=lambda item: item.status == 'completed' or item.cancel_event.is_set(),
+            hold=lambda item: not item.pause_event.is_set()
+        )
+        self.playlist_expander = PlaylistExpander(self.metadata_cache)
+        self.bulk_analyzer = BulkAnalyzer(self.metadata_cache)
+        self.file_download_queue = queue.Queue()
+        self.active_file_downloads = {}  # item -> Future, guarded by file_slots
+        self.file_slots = threading.Condition()
+        self.file_pool_size = self.config.config['max_concurrent_files']
+        self.file_executor = ThreadPoolExecutor(max_workers=self.file_pool_size,
+                                                thread_name_prefix="file-download")
+        self.http_session = self.create_http_session()
+        self.async_engine = None
+        self.download_items = []
+        self.file_items = []
+        self.sources = {}  # canonical URL -> queued item, so duplicates collapse into it
+        self.sources_lock = threading.Lock()
+        self.extra_outputs = []  # Added to every new item, e.g. clips asked for on the command line
+        self.listeners = []
+
+        self.file_worker_thread = threading.Thread(target=self.file_download_worker, daemon=True)
+        self.file_worker_thread.start()
+        self.concurrency_thread = threading.Thread(target=self.concurrency_worker, daemon=True)
+        self.concurrency_thread.start()
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def emit(self, event, payload=None):
+        # Once closing, the queue is kept as close() recorded it, not as the shutdown cancels leave it
+        if not self.stopped.is_set():
+            if event in ('item', 'file') and payload is not None:
+                self.job_store.save(payload)
+            elif event == 'items' and payload:
+                self.job_store.save_many(payload)
+        for listener in self.listeners:
+            try:
+                listener(event, payload)
+            except Exception as e:
+                print(f"Error in {event} listener: {e}")
+
+    # Video downloads
+
+    def add_url(self, url, wait=False):
+        """Queue `url`, expanding playlists and channels into one item per entry"""
+        if wait:
+            return self.expand_url(url)
+        threading.Thread(target=self.expand_url, args=(url,), daemon=True).start()
+
+    def expand_url(self, url):
+        """Queue every entry behind `url`; each starts downloading once its metadata is resolved"""
+        archive = self.download_archive()
+        if archive is not None and archive.contains_url(url):
+            self.emit('status', f"⏭️ Already in the download archive: {url}")
+            return 0
+        archived = []
+
+        def skip(entry):
+            if archive is not None and archive.contains_info(entry):
+                archived.append(entry)
+                return True
+            return False
+
+        def on_entry(entry_url, title, info):
+            item = self.new_item(entry_url, title or entry_url, "Generic")
+            item.info = info
+            if self.collapse_duplicate(item):
+                return None
+            self.download_items.append(item)
+            self.emit('items', [item])
+            return item
+
+        def on_resolved(item, info):
+            if item.cancel_event.is_set() or item not in self.download_items:
+                return
+            if info:
+                item.title = (info.get('title') or item.title)[:100]
+                item.platform = info.get('extractor_key', item.platform)
+                self.emit('item', item)
+            self.scheduler.submit(item)
+
+        try:
+            count = self.playlist_expander.expand(url, on_entry, on_resolved, skip=skip)
+        except Exception as e:
+            self.emit('status', f"❌ Could not read {url}: {e}")
+            return 0
+        if count == 0 and archived:
+            self.emit('status', f"⏭️ Already in the download archive: {len(archived)} items")
+            return 0
+        if count == 1:
+            message = "✅ Added to download queue"
+        else:
+            message = f"✅ Added {count} items to download queue"
+        if archived:
+            message += f" • {len(archived)} already in the archive"
+        self.emit('status', message)
+        return count
+
+    def new_urls(self, urls):
+        """`urls` minus duplicates of each other and of anything already queued"""
+        seen = {canonical_url(item.url) for item in self.download_items}
+        return dedupe_urls(urls, seen)
+
+    def bulk_import(self, urls):
+        """Analyze `urls` in parallel batches, then queue them all at once"""
+        def on_batch(done, total):
+            self.emit('status', f"🔍 Analyzed {done}/{total} URLs...")
+
+        # Archived URLs whose id is in the URL itself are dropped before any request
+        archive = self.download_archive()
+        if archive is not None:
+            known = len(urls)
+            urls = [url for url in urls if not archive.contains_url(url)]
+            if known > len(urls):
+                self.emit('status', f"⏭️ {known - len(urls)} URLs already in the download archive")
+
+        try:
+            results = self.bulk_analyzer.analyze(urls, on_batch=on_batch)
+        except Exception as e:
+            self.emit('status', f"❌ Import failed: {e}")
+            return []
+
+        items = []
+        for result in results:
+            item = self.new_item(result.url, result.title, result.platform)
+            if result.error:
+                item.status = "error"
+                item.error_message = result.error
+            items.append(item)
+        self.enqueue_items(items)
+        return items
+
+    def start_bulk_import(self, urls):
+        """Bulk import the new ones among `urls` in the background; returns how many are new"""
+        urls = self.new_urls(urls)
+        if urls:
+            threading.Thread(target=self.bulk_import, args=(urls,), daemon=True).start()
+        return len(urls)
+
+    def enqueue_items(self, items):
+        """Add many items to the queue with a single notification and scheduler pass"""
+        items = [item for item in items if item.status != "pending" or not self.collapse_duplicate(item)]
+        self.download_items.extend(items)
+        self.emit('items', items)
+        queued = self.scheduler.submit_many([item for item in items if item.status == "pending"])
+        failed = len(items) - queued
+        message = f"✅ Imported {queued} URLs"
+        if failed:
+            message += f" • {failed} could not be analyzed"
+        self.emit('status', message)
+
+    def pause(self, item):
+        item.pause()
+        self.emit('item', item)
+
+    def resume(self, item):
+        started = self.scheduler.is_active(item)
+        item.resume()
+        if not started and item.status != "completed":
+            if item.status == "downloading":
+                item.status = "pending"  # Paused before it started
+            if not self.scheduler.submit(item):
+                self.scheduler.notify()  # Still queued; it was held back while paused
+        self.emit('item', item)
+
+    def cancel(self, item):
+        item.cancel()
+        self.forget_source(item)
+        self.scheduler.discard(item)
+        self.postprocess.cancel(item)
+        self.emit('item', item)
+
+    def retry(self, item):
+        item.status = "pending"
+        item.progress = 0
+        item.error_message = ""
+        item.throttle_retries = 0
+        item.cancel_event.clear()
+        item.pause_event.set()
+        self.scheduler.submit(item)
+        self.emit('item', item)
+
+    def remove(self, item):
+        if item in self.download_items:
+            self.download_items.remove(item)
+        self.forget_source(item)
+        if self.scheduler.is_active(item) or item.status == 'processing':
+            item.cancel()
+            self.postprocess.cancel(item)
+        self.scheduler.discard(item)
+        if item.status not in FINISHED_STATUSES:
+            self.job_store.delete(item.id)  # Never started, so it has no place in the history
+        self.emit('items')
+
+    def prune_finished(self):
+        """Forget completed video downloads, e.g. in a long-running daemon; they stay in the job store"""
+        done = [item for item in self.download_items if item.status == "completed"]
+        for item in done:
+            self.download_items.remove(item)
+        if done:
+            self.emit('items')
+        return len(done)
+
+    def download_item(self, item: DownloadItem):
+        try:
+            if item.cancel_event.is_set():
+                return
+
+            item.status = 'downloading'
+            self.forget_source(item)  # Too late to fold more outputs in before the download is planned
+            self.emit('item', item)
+
+            download_path = Path(self.config.config['download_path'])
+            if self.config.config['create_subfolders']:
+                download_path = download_path / item.platform.lower()
+            download_path.mkdir(parents=True, exist_ok=True)
+
+            # Get video info first, reusing a cached extraction when possible
+            info = item.info or self.metadata_cache.get(item.url)
+            from_cache = info is not None
+            if self.skip_downloaded_video(item, info, download_path):
+                return
+            archive = self.download_archive()
+            if self.skip_archived_video(item, archive, info):
+                return
+            if info is None:
+                with YoutubeDL({'quiet': True, 'no_warnings': True, 'noplaylist': True}) as ydl:
+                    info = YoutubeDL.sanitize_info(ydl.extract_info(item.url, download=False))
+                self.metadata_cache.put(item.url, info)
+            if item.cancel_event.is_set():
+                return
+            item.title = (info.get('title') or 'Unknown')[:100]
+            item.platform = info.get('extractor_key', 'Generic')
+            self.emit('item', item)
+            # The extractor and id identify the video even under a different URL
+            if not from_cache and self.skip_downloaded_video(item, info, download_path):
+                return
+            if self.skip_archived_video(item, archive, info):
+                return
+
+            safe_title = safe_filename(item.title)
+
+            received = {}  # stream file -> bytes already charged to the bandwidth limiter
+            received_lock = threading.Lock()
+
+            def charge(d):
+                downloaded = d.get('downloaded_bytes') or 0
+                with received_lock:
+                    amount = downloaded - received.get(d.get('filename'), 0)
+                    received[d.get('filename')] = downloaded
+                if amount > 0:
+                    # Fragment threads report here too, so each one is held back in turn
+                    self.bandwidth.throttle(amount, item)
+                if item.ydl_instance is not None:
+                    item.ydl_instance.params['ratelimit'] = self.bandwidth.effective_rate(item) or None
+
+            def hook(d):
+                if item.cancel_event.is_set():
+                    raise DownloadCancelled()  # Abort yt-dlp so the slot frees up
+
+                if d['status'] == 'downloading':
+                    # Handle pause/resume
+                    if not item.pause_event.is_set():
+                        item.status = "paused"
+                        self.emit('item', item)
+                        item.pause_event.wait()  # Block until resumed
+                        if item.cancel_event.is_set():
+                            raise DownloadCancelled()
+                        item.status = "downloading"
+                        self.emit('item', item)
+
+                    pct = d.get('_percent_str', '0%').replace('%', '')
+                    try:
+                        item.progress = float(pct)
+                    except:
+                        item.progress = 0
+                    item.speed = d.get('speed', 0) or 0
+                    self.emit('item', item)
+                    charge(d)
+                elif d['status'] == 'finished':
+                    # One stream is done; merging may still follow, so the item is not completed yet
+                    item.progress = 100
+                    item.file_path = d.get('filename', '')
+                    self.emit('item', item)
+
+            ydl_opts = {
+                "outtmpl": str(download_path / f"{safe_title}.%(ext)s"),
+                "progress_hooks": [hook],
+                "quiet": True,
+                "no_warnings": True,
+                "noprogress": True,
+                "noplaylist": True,
+                "concurrent_fragment_downloads": self.fragment_limit(),
+            }
+            plan = self.apply_format_plan(item, info, ydl_opts)
+            staged = self.stage_postprocessing(item, plan, ydl_opts, download_path / safe_title)
+            if archive is not None and not staged:
+                ydl_opts["download_archive"] = archive  # yt-dlp records the video once it is done
+            if self.bandwidth.effective_rate(item):
+                # yt-dlp's own limiter keeps its reads small; the shared buckets enforce the totals
+                ydl_opts["ratelimit"] = self.bandwidth.effective_rate(item)
+
+            # Check for cancellation before starting download
+            if item.cancel_event.is_set():
+                return
+
+            if self.streaming_merge(item, info, plan, download_path / safe_title, archive):
+                item.info = None
+                return
+
+            with YoutubeDL(ydl_opts) as ydl:
+                item.ydl_instance = ydl
+                try:
+                    # Download straight from the extracted info instead of extracting again
+                    result = ydl.process_ie_result(dict(info), download=True)
+                except DownloadError:
+                    if not from_cache or item.cancel_event.is_set():
+                        raise
+                    # Cached stream URLs may have expired; extract afresh
+                    self.metadata_cache.invalidate(item.url)
+                    result = ydl.extract_info(item.url, download=True)
+
+            if staged and not item.cancel_event.is_set():
+                # The network slot is free from here on; ffmpeg finishes the item
+                files = {download.get('format_id'): download.get('filepath')
+                         for download in (result or {}).get('requested_downloads') or []}
+                self.start_postprocessing(item, info, plan, files, download_path / safe_title, archive)
+            elif not item.cancel_event.is_set():
+                for download in (result or {}).get('requested_downloads') or []:
+                    item.file_path = download.get('filepath') or item.file_path
+                self.duplicate_index.add_video(item.url, info, item.file_path, item.format_type)
+                codec = result_audio_codec(item.format_type, plan)
+                if item.outputs and self.derive_outputs(item, info, item.file_path, download_path / safe_title, codec):
+                    item.info = None
+                    return
+                item.status = 'completed'
+                item.progress = 100
+                self.emit('item', item)
+            item.info = None  # Stream URLs in it expire; a retry re-extracts
+
+        except Exception as e:
+            if item.cancel_event.is_set():
+                return
+            if self.uses_adaptive_concurrency() and is_throttle_error(e) and self.requeue_throttled(item):
+                return
+            item.status = 'error'
+            item.error_message = str(e)
+            self.emit('item', item)
+
+    def apply_format_plan(self, item, info, ydl_opts):
+        """Select the smallest streams meeting the item's quality and record their size"""
+        plan = plan_download(info, item.quality, item.format_type)
+        ydl_opts.update(ydl_format_options(plan, item.format_type, item.quality))
+        item.estimated_bytes = plan.estimated_bytes or 0
+        self.emit('item', item)
+        return plan
+
+    def stage_postprocessing(self, item, plan, ydl_opts, base):
+        """
+        Have yt-dlp only download the planned streams, each to its own
+        file, when merging or audio conversion can run in the
+        post-processing pool instead. Returns True if it will.
+        """
+        if not self.config.config.get('separate_postprocessing', True) or not self.postprocess.available():
+            return False
+        if len(plan.streams) != (1 if is_audio_format(item.format_type) else 2):
+            return False  # A single muxed file, or nothing concrete was planned
+        ydl_opts["format"] = ",".join(stream.format_id for stream in plan.streams)
+        ydl_opts.pop("postprocessors", None)
+        ydl_opts.pop("merge_output_format", None)
+        ydl_opts["outtmpl"] = f"{base}.f%(format_id)s.%(ext)s"
+        return True
+
+    def streaming_merge(self, item, info, plan, base, archive):
+        """
+        Download a video + audio pair straight into the ffmpeg muxer when
+        enabled. True if that finished the item (or it was cancelled);
+        False to download the usual way.
+        """
+        if (not self.config.config.get('streaming_merge') or is_audio_format(item.format_type)
+                or item.outputs or len(plan.streams) != 2 or not self.postprocess.available()):
+            return False
+        formats = {str(fmt.get('format_id')): fmt for fmt in info.get('formats') or []}
+        chosen = [formats.get(stream.format_id) for stream in plan.streams]
+        if None in chosen or not can_stream(chosen):
+            return False
+        start = time.time()
+
+        def progress(downloaded, total):
+            if total > 0:
+                item.progress = min(downloaded / total * 100, 100)
+            item.speed = downloaded / max(time.time() - start, 1e-3)
+            self.emit('item', item)
+
+        merger = StreamMerger(session=self.http_session, limiter=self.bandwidth)
+        try:
+            target = merger.merge(chosen[0], chosen[1], f"{base}.{item.format_type}", item,
+                                  self.postprocess.threads, progress)
+        except StreamMergeError as e:
+            # e.g. an input ffmpeg cannot read without seeking, or expired stream URLs
+            self.emit('status', f"Streaming merge failed ({e}); downloading {item.title} to disk instead")
+            item.progress = 0
+            return False
+        if target is None:
+            return True
+        item.file_path = target
+        self.duplicate_index.add_video(item.url, info, target, item.format_type)
+        if archive is not None:
+            archive.add_info(info)
+        item.status = 'completed'
+        item.progress = 100
+        self.emit('item', item)
+        return True
+
+    def start_postprocessing(self, item, info, plan, files, base, archive):
+        """Queue one ffmpeg step making every output of `item` from its raw `files` (format id -> path)"""
+        sources = [files.get(stream.format_id) for stream in plan.streams]
+        if None in sources:
+            raise RuntimeError("yt-dlp did not report every downloaded stream")
+        outputs = [{'format_type': item.format_type, 'quality': item.quality}] + item.outputs
+        args, written = multi_output_command(sources, outputs, base, plan.streams[-1].acodec,
+                                             not is_audio_format(item.format_type), self.postprocess.threads)
+        self.run_outputs(item, args, written, sources,
+                         lambda future: self.postprocessing_finished(item, info, archive, future))
+
+    def derive_outputs(self, item, info, source, base, source_codec=None, primary=False):
+        """
+        Make the extra outputs of `item`, and its own format too if
+        `primary`, from the local file `source`, which is kept. False if
+        nothing was started.
+        """
+        if not self.postprocess.available():
+            self.emit('status', f"⚠️ ffmpeg not found; only {Path(source).name} was saved for {item.title}")
+            return False
+        outputs = ([{'format_type': item.format_type, 'quality': item.quality}] if primary else []) + item.outputs
+        args, written = multi_output_command([source], outputs, base, source_codec,
+                                             not is_audio_format(item.format_type), self.postprocess.threads)
+        if not written:
+            return False
+        self.run_outputs(item, args, written, (),
+                         lambda future: self.postprocessing_finished(item, info, None, future, primary))
+        return True
+
+    def run_outputs(self, item, args, outputs, sources, done):
+        """Hand ffmpeg `args` to the post-processing pool; `done(future)` finishes the item"""
+        item.status = 'processing'
+        item.speed = 0.0
+        self.emit('item', item)
+        self.postprocess.submit(item, args, outputs, sources).add_done_callback(done)
+
+    def postprocessing_finished(self, item, info, archive, future, primary=True):
+        if item.cancel_event.is_set():
+            return
+        try:
+            targets = future.result()
+        except Exception as e:
+            item.status = 'error'
+            item.error_message = str(e)
+            self.emit('item', item)
+            return
+        if targets is None:
+            return
+        if primary:
+            item.file_path = targets.pop(0)
+        item.output_paths = targets
+        self.duplicate_index.add_video(item.url, info, item.file_path, item.format_type)
+        if archive is not None:
+            archive.add_info(info)
+        item.status = 'completed'
+        item.progress = 100
+        self.emit('item', item)
+
+    def new_item(self, url, title="", platform=""):
+        """A DownloadItem in the default format from the settings, with its extra outputs"""
+        format_type, extra = split_format_choice(self.config.config.get('default_format', 'mp4'))
+        item = DownloadItem(url=url, title=title, platform=platform,
+                            quality=self.default_quality(format_type), format_type=format_type)
+        for output_type in extra:
+            item.add_output(output_type, self.default_quality(output_type))
+        for output in self.extra_outputs:
+            item.add_output(**output)
+        return item
+
+    def default_quality(self, format_type):
+        key = 'default_audio_quality' if is_audio_format(format_type) else 'default_video_quality'
+        return self.config.config[key]
+
+    def add_output(self, item, format_type, quality=None, start=None, end=None):
+        """
+        Have `item` also produce `format_type` (a clip if `start`/`end` are
+        given) from the same download. False once it has started, or if it
+        makes that output already.
+        """
+        if item.status != 'pending' or self.scheduler.is_active(item):
+            return False
+        if not item.add_output(format_type, quality or self.default_quality(format_type), start, end):
+            return False
+        self.emit('item', item)
+        return True
+
+    def collapse_duplicate(self, item):
+        """
+        Fold `item` into a queued job for the same source that has not
+        started yet, as extra outputs of that job. True if it was;
+        otherwise `item` becomes the job later duplicates fold into.
+        """
+        key = canonical_url(item.url)
+        with self.sources_lock:
+            existing = self.sources.get(key)
+            if (existing is None or existing is item or existing.status != 'pending'
+                    or existing.cancel_event.is_set() or self.scheduler.is_active(existing)):
+                self.sources[key] = item
+                return False
+            existing.add_output(item.format_type, item.quality)
+            for output in item.outputs:
+                existing.add_output(**output)
+        self.emit('item', existing)
+        self.emit('status', f"🔗 Already queued; merged into {existing.title}")
+        return True
+
+    def track_source(self, item):
+        """Let later duplicates of `item` fold into it while it waits"""
+        with self.sources_lock:
+            self.sources.setdefault(canonical_url(item.url), item)
+
+    def forget_source(self, item):
+        """Stop collapsing duplicates into `item`"""
+        key = canonical_url(item.url)
+        with self.sources_lock:
+            if self.sources.get(key) is item:
+                del self.sources[key]
+
+    def requeue_throttled(self, item):
+        """
+        Back off from a site that answered 429/403: shrink the limits and
+        queue `item` again after a growing delay. False once it has used
+        up its retries.
+        """
+        self.concurrency.report_throttled()
+        if item.throttle_retries >= self.concurrency.max_retries:
+            return False
+        delay = self.concurrency.backoff_delay(item.throttle_retries)
+        item.throttle_retries += 1
+        item.status = 'pending'
+        item.progress = 0
+        item.speed = 0.0
+        item.info = None
+        self.emit('item', item)
+        self.emit('status', f"Throttled by the site, retrying {item.title or item.url} in {delay:g}s")
+        timer = threading.Timer(delay, self.resubmit, args=(item,))
+        timer.daemon = True
+        timer.start()
+        return True
+
+    def resubmit(self, item):
+        """Queue `item` again unless it was cancelled or removed meanwhile"""
+        if item.status == 'pending' and not item.cancel_event.is_set() and item in self.download_items:
+            self.scheduler.submit(item)
+
+    def skip_downloaded_video(self, item, info, download_path):
+        """Complete `item` from an earlier download of the same video; True if it was"""
+        if not self.config.config.get('skip_duplicates', True):
+            return False
+        existing = self.duplicate_index.find_video(item.url, info, item.format_type)
+        if existing is None and is_audio_format(item.format_type):
+            # The audio can be taken from an earlier download of the video
+            for format_type in VIDEO_FORMATS:
+                video = self.duplicate_index.find_video(item.url, info, format_type)
+                if video is not None:
+                    return self.derive_outputs(item, info, video, download_path / Path(video).stem, primary=True)
+        if existing is None or not self.has_format(item, existing):
+            return False
+        base = download_path / Path(existing).stem
+        self.complete_from_existing(item, existing, download_path / Path(existing).name)
+        if item.outputs:
+            self.derive_outputs(item, info, item.file_path, base)
+        return True
+
+    @staticmethod
+    def has_format(item, path):
+        """True if the file at `path` is already of the item's format type"""
+        ext = Path(path).suffix.lstrip('.').lower()
+        if item.format_type == 'audio':
+            return ext in AUDIO_CONTAINERS.values() or ext == 'mka'
+        return ext == item.format_type
+
+    def skip_archived_video(self, item, archive, info):
+        """Complete `item` without downloading if its id is in the download archive; True if it was"""
+        if archive is None:
+            return False
+        if not (archive.contains_info(info) if info else archive.contains_url(item.url)):
+            return False
+        item.status = 'completed'
+        item.progress = 100
+        self.emit('item', item)
+        self.emit('status', f"⏭️ Already in the download archive: {item.title}")
+        return True
+
+    def download_archive(self):
+        """The archive of the current download root, or None if archiving is off"""
+        if not self.config.config.get('use_download_archive', True):
+            return None
+        return self.root_archive()
+
+    def root_archive(self):
+        """The archive kept in the current download root, loaded on first use"""
+        root = Path(self.config.config['download_path']).expanduser().resolve()
+        with self.archive_lock:
+            archive = self.archives.get(root)
+            if archive is None:
+                archive = self.archives[root] = DownloadArchive(root / ARCHIVE_NAME)
+            return archive
+
+    def import_archive(self, path):
+        """Merge a yt-dlp archive file into the current root's archive; returns new entries"""
+        added = self.root_archive().import_file(path)
+        self.emit('status', f"📥 Imported {added} archive entries")
+        return added
+
+    def export_archive(self, path):
+        """Write the current root's archive to `path` in yt-dlp's format"""
+        count = self.root_archive().export(path)
+        self.emit('status', f"📤 Exported {count} archive entries")
+        return count
+
+    def complete_from_existing(self, item, existing, target):
+        """Mark `item` completed with a file already on disk, linking it to `target` if configured"""
+        if self.config.config.get('duplicate_action') == 'link':
+            existing = link_existing(existing, target)
+        item.file_path = existing
+        item.status = 'completed'
+        item.progress = 100
+        self.emit('file' if isinstance(item, FileDownloadItem) else 'item', item)
+        self.emit('status', f"⏭️ Already downloaded: {Path(existing).name}")
+
+    # Direct file downloads
+
+    def add_file(self, url, filename=None):
+        item = FileDownloadItem(url=url, filename=filename)
+        self.file_items.append(item)
+        existing = None
+        if self.config.config.get('skip_duplicates', True):
+            existing = self.duplicate_index.find_file(url)
+        if existing:
+            self.complete_from_existing(item, existing, self.file_download_path() / item.filename)
+            return item
+        self.emit('file', item)
+        self.file_download_queue.put(item)
+        return item
+
+    def pause_file(self, item):
+        item.pause()
+        self.emit('file', item)
+
+    def resume_file(self, item):
+        item.resume()
+        with self.file_slots:
+            submitted = item in self.active_file_downloads
+        if not submitted:
+            item.status = "pending"  # Paused before it started, e.g. restored paused
+            self.file_download_queue.put(item)
+        elif self.async_engine is not None:
+            self.async_engine.wake(item)
+        self.emit('file', item)
+
+    def cancel_file(self, item):
+        self.stop_file_transfer(item)
+        self.emit('file', item)
+
+    def stop_file_transfer(self, item):
+        """
+        Cancel the transfer of `item` and drop its partial data, right away
+        if nothing is running, else in file_finished() once the transfer
+        has stopped writing. Only pause keeps partial data.
+        """
+        item.cancel()
+        if self.async_engine is not None:
+            self.async_engine.cancel(item)
+        self.release_file_slot(item, cancel_future=True)
+        with self.file_slots:
+            running = item in self.active_file_downloads
+        if not running:
+            discard_partial(self.file_download_path() / item.filename)
+
+    def retry_file(self, item):
+        """Retry a failed file download, resuming from its journal if one exists"""
+        item.status = "pending"
+        item.error_message = ""
+        item.cancel_event.clear()
+        item.pause_event.set()
+        self.file_download_queue.put(item)
+        self.emit('file', item)
+
+    def remove_file(self, item):
+        if item in self.file_items:
+            self.file_items.remove(item)
+        unfinished = item.status not in FINISHED_STATUSES
+        if item.status != "completed":
+            self.stop_file_transfer(item)
+        self.emit('file', item)
+        if unfinished:
+            self.job_store.delete(item.id)
+
+    def file_download_path(self):
+        """Directory that direct file downloads are saved to"""
+        return Path(self.config.config['download_path']) / "Files"
+
+    def restore_queue(self):
+        """Requeue the jobs a previous session left unfinished; paused ones stay paused"""
+        videos, files = [], []
+        for job in self.job_store.unfinished():
+            if job['kind'] == 'file':
+                item = FileDownloadItem(url=job['url'], filename=job.get('filename'))
+                files.append(item)
+            else:
+                item = DownloadItem(
+                    url=job['url'],
+                    title=job['title'],
+                    platform=job.get('platform', ''),
+                    quality=job.get('quality', self.config.config['default_video_quality']),
+                    format_type=job.get('format_type', 'mp4')
+                )
+                item.priority = job.get('priority', 0)
+                item.estimated_bytes = job.get('estimated_bytes', 0)
+                item.outputs = job.get('outputs') or []
+                self.track_source(item)
+                videos.append(item)
+            item.id = job['id']
+            item.progress = job['progress']
+            if job['status'] == 'paused':
+                item.pause()
+
+        if videos:
+            self.download_items.extend(videos)
+            self.emit('items', videos)
+            self.scheduler.submit_many([item for item in videos if item.status == 'pending'])
+        if files:
+            self.file_items.extend(files)
+            for item in files:
+                if item.status == 'pending':
+                    self.file_download_queue.put(item)
+            self.emit('file')
+        if videos or files:
+            self.emit('status', f"🔄 Restored {len(videos) + len(files)} unfinished downloads")
+        return len(videos) + len(files) + self.resume_unfinished_file_downloads()
+
+    def resume_unfinished_file_downloads(self):
+        """Queue every partial file download left behind by a previous session"""
+        resumed = 0
+        known = {item.filename for item in self.file_items}
+        for journal in find_journals(self.file_download_path()):
+            if journal.filename in known:
+                continue  # Already restored from the job store
+            item = FileDownloadItem(url=journal.url, filename=journal.filename)
+            if journal.size:
+                item.progress = journal.completed_bytes() / journal.size * 100
+            self.file_items.append(item)
+            self.file_download_queue.put(item)
+            resumed += 1
+        if resumed:
+            self.emit('file')
+            self.emit('status', f"🔄 Resuming {resumed} unfinished file downloads")
+        return resumed
+
+    def create_http_session(self):
+        """Shared connection pool for all direct file downloads"""
+        session = requests.Session()
+        connections = self.config.config['max_concurrent_files'] * self.config.config['file_segments']
+        adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=max(connections, 10))
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def file_backlog_limit(self):
+        """How many file downloads may be handed to the pool before the feeder waits"""
+        if self.uses_async_engine():
+            return self.config.config['async_max_transfers']
+        return self.config.config['max_concurrent_files'] * 2
+
+    def uses_async_engine(self):
+        """True when file downloads should run on the asyncio engine"""
+        return self.config.config.get('file_engine') == 'asyncio' and async_file_engine.is_available()
+
+    def get_async_engine(self):
+        if self.async_engine is None:
+            self.async_engine = AsyncFileEngine(max_connections=self.config.config['async_max_transfers'],
+                                                limiter=self.bandwidth)
+        return self.async_engine
+
+    def uses_adaptive_concurrency(self):
+        return bool(self.config.config.get('adaptive_concurrency'))
+
+    def concurrency_limit(self):
+        """How many videos may download at once right now"""
+        if self.uses_adaptive_concurrency():
+            return self.concurrency.slots
+        return self.config.config['max_concurrent']
+
+    def fragment_limit(self):
+        """Fragment connections for the next video download"""
+        if self.uses_adaptive_concurrency():
+            return self.concurrency.fragments
+        return self.config.config['concurrent_fragments']
+
+    def concurrency_worker(self):
+        """Feed the adaptive controller one throughput sample per interval"""
+        while not self.stopped.wait(self.concurrency.interval):
+            if self.uses_adaptive_concurrency():
+                self.sample_concurrency()
+
+    def sample_concurrency(self):
+        active = self.scheduler.active_items()
+        throughput = sum(item.speed or 0 for item in active if item.status == 'downloading')
+        before = (self.concurrency.slots, self.concurrency.fragments)
+        slots, fragments = self.concurrency.update(throughput, len(active))
+        if (slots, fragments) != before:
+            self.scheduler.notify()  # Start queued items if a slot was added
+            self.emit('status', f"Concurrency: {slots} downloads x {fragments} connections "
+                                f"at {throughput / (1024 * 1024):.1f} MB/s")
+
+    def apply_settings(self):
+        """Pick up changed concurrency settings"""
+        self.concurrency.configure(max_slots=self.config.config['adaptive_max_concurrent'])
+        self.postprocess.resize(self.config.config['postprocess_workers'])
+        if not self.uses_adaptive_concurrency():
+            # Adaptive mode starts probing from the static settings
+            self.concurrency.reset(self.config.config['max_concurrent'], self.config.config['concurrent_fragments'])
+        # Start queued items right away if more slots are allowed now
+        self.scheduler.notify()
+        self.apply_file_pool_settings()
+        self.apply_bandwidth_settings()
+
+    def apply_bandwidth_settings(self):
+        """Apply the configured rate limits; running transfers adjust on their next chunk"""
+        self.bandwidth.configure(
+            global_rate=int(self.config.config.get('max_download_rate_kbps') or 0) * 1024,
+            item_rate=int(self.config.config.get('max_item_rate_kbps') or 0) * 1024
+        )
+
+    def set_rate_limit(self, item, kbps):
+        """Cap one item at `kbps` KiB/s (0 = no cap of its own, None = default item limit)"""
+        item.rate_limit = None if kbps is None else int(kbps) * 1024
+        self.emit('file' if isinstance(item, FileDownloadItem) else 'item', item)
+
+    def apply_file_pool_settings(self):
+        """Resize the file download pool after max_concurrent_files changed"""
+        size = self.config.config['max_concurrent_files']
+        if size != self.file_pool_size:
+            old_executor = self.file_executor
+            self.file_executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="file-download")
+            self.file_pool_size = size
+            old_executor.shutdown(wait=False)  # Running transfers finish on the old pool
+            self.http_session = self.create_http_session()
+        with self.file_slots:
+            self.file_slots.notify_all()
+
+    def release_file_slot(self, item, cancel_future=False):
+        """Forget a submitted file download and wake the feeder"""
+        with self.file_slots:
+            future = self.active_file_downloads.get(item)
+            if future is None:
+                return
+            if cancel_future and not future.cancel():
+                return  # Already running; it releases the slot itself when it stops
+            # A cancelled asyncio transfer may already have released itself from its done callback
+            self.active_file_downloads.pop(item, None)
+            self.file_slots.notify_all()
+
+    def file_download_worker(self):
+        """Feed queued file downloads into the bounded pool, waiting while its backlog is full"""
+        while True:
+            item = self.file_download_queue.get()
+            if item.status in ('downloading', 'completed') or item.cancel_event.is_set():
+                continue
+
+            with self.file_slots:
+                if item in self.active_file_downloads:
+                    continue
+                # Back-pressure: keep the rest in the queue instead of piling up futures
+                self.file_slots.wait_for(lambda: len(self.active_file_downloads) < self.file_backlog_limit())
+                if self.stopped.is_set():
+                    return
+                if self.uses_async_engine():
+                    self.active_file_downloads[item] = self.start_async_file_download(item)
+                else:
+                    self.active_file_downloads[item] = self.file_executor.submit(self.file_download_item, item)
+
+    def file_target(self, item):
+        """Mark `item` as downloading and return the path it is saved to"""
+        item.status = "downloading"
+        self.emit('file', item)
+        download_path = self.file_download_path()
+        download_path.mkdir(parents=True, exist_ok=True)
+        return download_path / item.filename
+
+    def file_progress(self, item):
+        """Progress callback for one transfer of `item`"""
+        start = time.time()
+        resumed = []
+
+        def progress(downloaded, total):
+            # The first report is the byte count already on disk
+            if not resumed:
+                resumed.append(downloaded)
+            if total > 0:
+                item.progress = (downloaded / total) * 100
+            elapsed = max(time.time() - start, 1e-3)
+            item.speed = (downloaded - resumed[0]) / elapsed
+            self.emit('file', item)
+        return progress
+
+    def file_finished(self, item, target, completed):
+        if item.cancel_event.is_set() and not self.stopped.is_set():
+            discard_partial(target)  # Cancelled by the user, so it must not resume on the next start
+            return
+        if not completed or item.cancel_event.is_set():
+            return  # Partial data and journal are kept for a later resume
+        item.status = "completed"
+        item.file_path = str(target)
+        item.progress = 100
+        self.duplicate_index.add_file(item.url, target)
+        self.emit('file', item)
+
+    def file_failed(self, item, error):
+        if item.cancel_event.is_set() and not self.stopped.is_set():
+            discard_partial(self.file_download_path() / item.filename)
+        elif not item.cancel_event.is_set():
+            item.status = "error"
+            item.error_message = str(error)
+            self.emit('file', item)
+
+    def file_download_item(self, item: FileDownloadItem):
+        """Download one file on a pool thread with the segmented engine"""
+        try:
+            if item.cancel_event.is_set():
+                return
+            target = self.file_target(item)
+            engine = SegmentedDownloader(session=self.http_session, limiter=self.bandwidth,
+                                         segments=int(self.config.config.get('file_segments', 4)))
+            completed = engine.download(item.url, target, item=item, progress_callback=self.file_progress(item))
+            self.file_finished(item, target, completed)
+        except Exception as e:
+            self.file_failed(item, e)
+        finally:
+            self.release_file_slot(item)
+
+    def start_async_file_download(self, item: FileDownloadItem):
+        """Start one file on the asyncio engine; returns its future"""
+        target = self.file_target(item)
+        future = self.get_async_engine().submit(item, target, self.file_progress(item))
+
+        def done(future):
+            try:
+                self.file_finished(item, target, not future.cancelled() and future.result())
+            except Exception as e:
+                self.file_failed(item, e)
+            finally:
+                self.release_file_slot(item)
+        future.add_done_callback(done)
+        return future
+
+    # Lifecycle
+
+    def find(self, item_id):
+        """The video or file item with id `item_id`, or None"""
+        for item in self.download_items + self.file_items:
+            if item.id == item_id:
+                return item
+        return None
+
+    def active_count(self):
+        active_files = sum(1 for item in self.file_items if item.status == "downloading")
+        return self.scheduler.active_count() + active_files
+
+    def is_idle(self):
+        """True when no queued item still has work left; paused items wait for the user, not the workers"""
+        return all(item.status in FINISHED_STATUSES or item.status == 'paused'
+                   for item in self.download_items + self.file_items)
+
+    def wait_idle(self, interval=0.5):
+        """Block until every queued item has finished, failed, been cancelled or is paused"""
+        while not self.is_idle():
+            time.sleep(interval)
+
+    def close(self, timeout=10):
+        """
+        Cancel running downloads, wait up to `timeout` seconds for the
+        workers to stop, then close the stores they write to
+        """
+        self.stopped.set()
+        # Record the queue as it is now; the cancels below only stop this session
+        self.job_store.save_many(self.download_items + self.file_items)
+        deadline = time.monotonic() + timeout
+        for item in self.scheduler.stop() + [item for item in self.download_items if item.status == 'processing']:
+            item.cancel()
+        with self.file_slots:
+            transfers = dict(self.active_file_downloads)
+        for item in transfers:
+            item.cancel()
+            if self.async_engine is not None:
+                self.async_engine.cancel(item)
+        self.postprocess.close()
+        self.playlist_expander.close()
+
+        self.scheduler.join(max(0, deadline - time.monotonic()))
+        wait_for_futures(transfers.values(), max(0, deadline - time.monotonic()))
+        self.file_executor.shutdown(wait=False, cancel_futures=True)
+        if self.async_engine is not None:
+            self.async_engine.close()
+        self.bulk_analyzer.close()
+
+        self.job_store.close()
+        self.duplicate_index.close()
+        with self.archive_lock:
+            for archive in self.archives.values():
+                archive.close()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Duplicate detection index
+Remembers where every finished download was saved, keyed by extractor +
+video id (plus the format, so a video's mp4 and mp3 are told apart) for
+videos and by canonical URL and content hash for direct files, so adding something that is already on disk is a single indexed
+lookup instead of a second download.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from metadata_cache import canonical_url
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def video_key(info):
+    """'video:<extractor>:<id>' for a yt-dlp info dict (full or flat), or None"""
+    if not info:
+        return None
+    extractor = info.get('extractor_key') or info.get('ie_key')
+    video_id = info.get('id')
+    if not extractor or not video_id:
+        return None
+    return f"video:{extractor.lower()}:{video_id}"
+
+
+def url_key(url):
+    return f"url:{canonical_url(url)}"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_existing(existing, target):
+    """
+    Make `target` refer to the file at `existing` without downloading it
+    again: a hard link, else a symlink. Returns the path that now holds
+    the content (`existing` itself if neither link could be made).
+    """
+    existing, target = Path(existing), Path(target)
+    if target.exists():
+        try:
+            if os.path.samefile(existing, target):
+                return str(target)
+        except OSError:
+            pass
+        return str(existing)  # Never overwrite an unrelated file
+    target.parent.mkdir(parents=True, exist_ok=True)
+    for make_link in (os.link, os.symlink):
+        try:
+            make_link(existing, target)
+            return str(target)
+        except OSError:
+            continue
+    return str(existing)
+
+
+class DuplicateIndex:
+    """SQLite index of finished downloads by content identity"""
+    def __init__(self, path=None):
+        self.path = Path(path) if path else Path.home() / ".social_downloader" / "downloads.db"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS downloads ("
+                " key TEXT PRIMARY KEY,"
+                " path TEXT NOT NULL,"
+                " added_at REAL NOT NULL)"
+            )
+        # Hashing reads whole files, so it never runs on a download or event loop thread
+        self.hasher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="content-hash")
+
+    def find(self, keys):
+        """Path of an existing file recorded under any of `keys`, or None"""
+        keys = [key for key in keys if key]
+        for key in keys:
+            with self.lock:
+                row = self.conn.execute("SELECT path FROM downloads WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                continue
+            if os.path.exists(row[0]):
+                return row[0]
+            # The file was moved or deleted since; forget it
+            with self.lock, self.conn:
+                self.conn.execute("DELETE FROM downloads WHERE key = ?", (key,))
+        return None
+
+    def add(self, keys, path):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO downloads (key, path, added_at) VALUES (?, ?, ?)",
+                [(key, str(path), now) for key in keys if key]
+            )
+
+    def video_keys(self, url, info=None, format_type=None):
+        keys = [video_key(info), url_key(url)]
+        for field in ('webpage_url', 'original_url'):
+            if info and info.get(field):
+                keys.append(url_key(info[field]))
+        if format_type:
+            keys = [f"{key}|{format_type}" for key in keys if key]
+        return keys
+
+    def find_video(self, url, info=None, format_type=None):
+        """Existing `format_type` download of the video at `url` (described by `info`, if known)"""
+        return self.find(self.video_keys(url, info, format_type))
+
+    def add_video(self, url, info, path, format_type=None):
+        if path and os.path.exists(path):
+            self.add(self.video_keys(url, info, format_type), path)
+
+    def find_file(self, url):
+        """Existing download of the direct file at `url`"""
+        return self.find([url_key(url)])
+
+    def add_file(self, url, path):
+        """
+        Record a finished direct download. Its content hash is computed in
+        the background; if the same bytes were already saved elsewhere, the
+        new copy is replaced with a hard link to the old one.
+        """
+        self.add([url_key(url)], path)
+        try:
+            self.hasher.submit(self._add_content_hash, str(path))
+        except RuntimeError:
+            pass  # Closing
+
+    def _add_content_hash(self, path):
+        try:
+            key = f"sha256:{file_sha256(path)}"
+        except OSError:
+            return
+        existing = self.find([key])
+        if existing and existing != path:
+            try:
+                if not os.path.samefile(existing, path):
+                    temp = path + ".link"
+                    os.link(existing, temp)
+                    os.replace(temp, path)
+            except OSError:
+                pass  # Different filesystems; keep both copies
+            return
+        self.add([key], path)
+
+    def close(self):
+        self.hasher.shutdown(wait=True, cancel_futures=True)
+        with self.lock:
+            self.conn.close()
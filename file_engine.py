@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Segmented file download engine
+Fetches direct file URLs over several parallel HTTP range requests.
+Partial downloads live in a `.part` file with a sidecar journal so they
+can be resumed after a cancel, crash or restart.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+CHUNK_SIZE = 1024 * 64
+MIN_SEGMENT_SIZE = 1024 * 1024
+SEGMENT_RETRIES = 3
+JOURNAL_FLUSH_INTERVAL = 1.0
+
+PART_SUFFIX = ".part"
+JOURNAL_SUFFIX = ".part.json"
+
+
+class RangeNotSupported(Exception):
+    """Raised when the server ignores a Range request"""
+
+
+class RemoteFileInfo:
+    """Result of probing a remote file"""
+    def __init__(self, url, size=0, accepts_ranges=False, etag="", last_modified=""):
+        self.url = url
+        self.size = size
+        self.accepts_ranges = accepts_ranges
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+def split_ranges(total, segments, min_segment_size=MIN_SEGMENT_SIZE):
+    """Split [0, total) into at most `segments` inclusive (start, end) byte ranges"""
+    if total <= 0:
+        return []
+    segments = max(1, min(segments, total // max(min_segment_size, 1) or 1))
+    size, remainder = divmod(total, segments)
+    ranges = []
+    start = 0
+    for index in range(segments):
+        end = start + size + (1 if index < remainder else 0) - 1
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+def split_missing(missing, segments, min_segment_size=MIN_SEGMENT_SIZE):
+    """Spread `segments` connections over the missing (start, end) ranges"""
+    total = sum(end - start + 1 for start, end in missing)
+    ranges = []
+    for start, end in missing:
+        length = end - start + 1
+        share = max(1, round(segments * length / total)) if total else 1
+        ranges.extend((start + s, start + e) for s, e in split_ranges(length, share, min_segment_size))
+    return ranges
+
+
+def part_path(target):
+    """Path of the in-progress data file for `target`"""
+    return Path(str(target) + PART_SUFFIX)
+
+
+def journal_path(target):
+    """Path of the range journal for `target`"""
+    return Path(str(target) + JOURNAL_SUFFIX)
+
+
+def target_from_journal(path):
+    """Inverse of journal_path()"""
+    return Path(str(path)[:-len(JOURNAL_SUFFIX)])
+
+
+def discard_partial(target):
+    """Remove the partial data and journal of `target`, if any"""
+    for path in (part_path(target), journal_path(target)):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class RangeJournal:
+    """
+    On-disk record of the byte ranges already written to a `.part` file,
+    together with the validators needed to resume it safely.
+    """
+    def __init__(self, target):
+        self.path = journal_path(target)
+        self.url = ""
+        self.filename = Path(target).name
+        self.size = 0
+        self.etag = ""
+        self.last_modified = ""
+        self.ranges = []
+        self.lock = threading.Lock()
+        self.last_flush = 0.0
+
+    @classmethod
+    def load(cls, target):
+        """Load the journal for `target`; returns an empty journal if none exists"""
+        journal = cls(target)
+        try:
+            with open(journal.path, 'r') as f:
+                data = json.load(f)
+            journal.url = data.get('url', '')
+            journal.filename = data.get('filename', journal.filename)
+            journal.size = int(data.get('size', 0))
+            journal.etag = data.get('etag', '')
+            journal.last_modified = data.get('last_modified', '')
+            journal.ranges = [tuple(r) for r in data.get('ranges', [])]
+        except (OSError, ValueError, TypeError):
+            journal.ranges = []
+        return journal
+
+    def matches(self, info):
+        """True if the partial data still belongs to the remote file described by `info`"""
+        if not self.ranges or self.size != info.size:
+            return False
+        if self.etag and info.etag:
+            return self.etag == info.etag
+        if self.last_modified and info.last_modified:
+            return self.last_modified == info.last_modified
+        return False
+
+    def reset(self, info):
+        """Start a fresh journal for the remote file described by `info`"""
+        self.url = info.url
+        self.size = info.size
+        self.etag = info.etag
+        self.last_modified = info.last_modified
+        self.ranges = []
+
+    def add(self, start, end):
+        """Record the inclusive byte range [start, end] as written"""
+        with self.lock:
+            merged = []
+            for s, e in sorted(self.ranges + [(start, end)]):
+                if merged and s <= merged[-1][1] + 1:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+                else:
+                    merged.append((s, e))
+            self.ranges = merged
+
+    def completed_bytes(self):
+        with self.lock:
+            return sum(e - s + 1 for s, e in self.ranges)
+
+    def missing(self):
+        """Byte ranges that still have to be fetched"""
+        with self.lock:
+            gaps = []
+            position = 0
+            for s, e in self.ranges:
+                if s > position:
+                    gaps.append((position, s - 1))
+                position = max(position, e + 1)
+            if position < self.size:
+                gaps.append((position, self.size - 1))
+            return gaps
+
+    def save(self):
+        """Atomically write the journal next to the part file"""
+        with self.lock:
+            data = {
+                'url': self.url,
+                'filename': self.filename,
+                'size': self.size,
+                'etag': self.etag,
+                'last_modified': self.last_modified,
+                'ranges': self.ranges,
+            }
+            temp = self.path.with_name(self.path.name + ".tmp")
+            with open(temp, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp, self.path)
+            self.last_flush = time.time()
+
+    def sync(self, part_file):
+        """Save the journal once the data it claims is on disk; `part_file` is the open part file or its fd"""
+        if hasattr(part_file, 'flush'):
+            part_file.flush()
+            part_file = part_file.fileno()
+        # Data must reach the disk before the journal claims it
+        os.fsync(part_file)
+        self.save()
+
+    def remove(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def find_journals(directory):
+    """Return the journals of all unfinished downloads in `directory`"""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    journals = []
+    for path in sorted(directory.glob("*" + JOURNAL_SUFFIX)):
+        journal = RangeJournal.load(target_from_journal(path))
+        if journal.url:
+            journals.append(journal)
+    return journals
+
+
+class SegmentedDownloader:
+    """Downloads a file over parallel byte-range connections into a preallocated target"""
+    def __init__(self, session=None, segments=4, chunk_size=CHUNK_SIZE,
+                 min_segment_size=MIN_SEGMENT_SIZE, headers=None, timeout=30, limiter=None):
+        """`limiter` is an optional bandwidth.BandwidthLimiter every received chunk is charged to"""
+        self.segments = max(1, int(segments))
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(self.segments, 10))
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.chunk_size = chunk_size
+        self.min_segment_size = min_segment_size
+        self.headers = dict(headers or DEFAULT_HEADERS)
+        self.timeout = timeout
+        self.limiter = limiter
+
+    def probe(self, url):
+        """Find the file size and whether the server honours byte ranges"""
+        try:
+            r = self.session.head(url, headers=self.headers, timeout=self.timeout, allow_redirects=True)
+            if r.ok:
+                info = RemoteFileInfo(
+                    r.url,
+                    size=int(r.headers.get('content-length', 0) or 0),
+                    accepts_ranges=r.headers.get('accept-ranges', '').lower() == 'bytes',
+                    etag=r.headers.get('etag', ''),
+                    last_modified=r.headers.get('last-modified', '')
+                )
+                if info.size and info.accepts_ranges:
+                    return info
+        except requests.RequestException:
+            pass
+
+        # Some servers answer HEAD badly; ask for the first byte instead
+        headers = dict(self.headers, Range='bytes=0-0')
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as r:
+            r.raise_for_status()
+            info = RemoteFileInfo(
+                r.url,
+                etag=r.headers.get('etag', ''),
+                last_modified=r.headers.get('last-modified', '')
+            )
+            content_range = r.headers.get('content-range', '')
+            if r.status_code == 206 and '/' in content_range:
+                total = content_range.rsplit('/', 1)[1]
+                if total.isdigit():
+                    info.size = int(total)
+                    info.accepts_ranges = True
+            else:
+                info.size = int(r.headers.get('content-length', 0) or 0)
+            return info
+
+    def download(self, url, target, item=None, progress_callback=None):
+        """
+        Download `url` into `target`, resuming from `target.part` when its
+        journal still matches the remote file.
+
+        `item` may be a DownloadItem/FileDownloadItem; its pause_event and
+        cancel_event are honoured. `progress_callback(downloaded, total)` is
+        called once with the already-present byte count before any transfer,
+        then from worker threads after every chunk.
+        Returns True when the file is complete, False when cancelled (the
+        partial data is kept for a later resume).
+        """
+        target = Path(target)
+        part = part_path(target)
+        info = self.probe(url)
+        journal = RangeJournal.load(target)
+        if not (info.accepts_ranges and part.exists() and journal.matches(info)):
+            journal.reset(info)
+            journal.url = url
+            if part.exists():
+                part.unlink()
+
+        completed = False
+        if info.accepts_ranges and info.size:
+            ranges = split_missing(journal.missing(), self.segments, self.min_segment_size)
+            try:
+                completed = self._download_ranges(info, part, ranges, journal, item, progress_callback)
+            except RangeNotSupported:
+                journal.reset(info)
+                journal.url = url
+                completed = self._download_single(info, part, journal, item, progress_callback)
+        else:
+            completed = self._download_single(info, part, journal, item, progress_callback)
+
+        if completed:
+            os.replace(part, target)
+            journal.remove()
+        return completed
+
+    def _wait_if_paused(self, item):
+        """Block while the item is paused; returns False if it was cancelled"""
+        if item is None:
+            return True
+        if item.cancel_event.is_set():
+            return False
+        if not item.pause_event.is_set():
+            item.pause_event.wait()
+        return not item.cancel_event.is_set()
+
+    def _download_single(self, info, part, journal, item, progress_callback):
+        """Plain single-stream download, used when ranges are unavailable"""
+        if progress_callback:
+            progress_callback(0, info.size)
+        with self.session.get(info.url, stream=True, timeout=self.timeout, headers=self.headers) as r:
+            r.raise_for_status()
+            total = int(r.headers.get('content-length', 0) or 0) or info.size
+            downloaded = 0
+            journal.save()
+            with open(part, "wb") as f:
+                for chunk in r.iter_content(chunk_size=self.chunk_size):
+                    if not self._wait_if_paused(item):
+                        return False
+                    if not chunk:
+                        continue
+                    f.write(chunk)
+                    downloaded += len(chunk)
+                    if progress_callback:
+                        progress_callback(downloaded, total)
+                    if self.limiter:
+                        self.limiter.throttle(len(chunk), item)
+        return True
+
+    def _download_ranges(self, info, part, ranges, journal, item, progress_callback):
+        """Fetch every range on its own connection and write it in place"""
+        # Preallocate so every segment can write at its own offset
+        if not part.exists():
+            with open(part, "wb") as f:
+                f.truncate(info.size)
+        journal.save()
+
+        fd = os.open(part, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+        write_lock = threading.Lock()
+        progress_lock = threading.Lock()
+        state = {'downloaded': journal.completed_bytes()}
+        errors = []
+        stop = threading.Event()
+
+        if progress_callback:
+            progress_callback(state['downloaded'], info.size)
+
+        def write_at(offset, data):
+            if hasattr(os, 'pwrite'):
+                os.pwrite(fd, data, offset)
+            else:
+                with write_lock:
+                    os.lseek(fd, offset, os.SEEK_SET)
+                    os.write(fd, data)
+
+        def flush_journal(force=False):
+            if force or time.time() - journal.last_flush >= JOURNAL_FLUSH_INTERVAL:
+                journal.sync(fd)
+
+        def fetch(start, end):
+            position = start
+            attempts = 0
+            while position <= end and not stop.is_set():
+                headers = dict(self.headers, Range=f'bytes={position}-{end}')
+                if info.etag:
+                    headers['If-Range'] = info.etag
+                before = position
+                try:
+                    with self.session.get(info.url, headers=headers, stream=True, timeout=self.timeout) as r:
+                        r.raise_for_status()
+                        if r.status_code != 206:
+                            raise RangeNotSupported(f"Server returned {r.status_code} for a range request")
+                        for chunk in r.iter_content(chunk_size=self.chunk_size):
+                            if stop.is_set() or not self._wait_if_paused(item):
+                                stop.set()
+                                return
+                            if not chunk:
+                                continue
+                            chunk = chunk[:end - position + 1]
+                            write_at(position, chunk)
+                            journal.add(position, position + len(chunk) - 1)
+                            position += len(chunk)
+                            with progress_lock:
+                                state['downloaded'] += len(chunk)
+                                downloaded = state['downloaded']
+                                flush_journal()
+                            if progress_callback:
+                                progress_callback(downloaded, info.size)
+                            if self.limiter:
+                                self.limiter.throttle(len(chunk), item)
+                            if position > end:
+                                break
+                    if position == before:
+                        raise IOError(f"No data received for bytes {position}-{end}")
+                except RangeNotSupported as e:
+                    errors.append(e)
+                    stop.set()
+                    return
+                except (requests.RequestException, OSError) as e:
+                    attempts += 1
+                    if attempts >= SEGMENT_RETRIES:
+                        errors.append(e)
+                        stop.set()
+                        return
+                    time.sleep(attempts)
+
+        threads = [threading.Thread(target=fetch, args=r, daemon=True) for r in ranges]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            flush_journal(force=True)
+        finally:
+            os.close(fd)
+
+        if errors:
+            raise errors[0]
+        if item is not None and item.cancel_event.is_set():
+            return False
+        if journal.missing():
+            raise IOError(f"Incomplete download: {state['downloaded']} of {info.size} bytes")
+        return True
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Format planner
+Indexes the formats of a yt-dlp info dict by height, fps and codec with a
+size estimate for each, and picks the smallest stream (or video + audio
+pair) that meets the requested quality, e.g. AV1 or VP9 + Opus instead of
+a much larger H.264 + AAC pair at the same height.
+"""
+
+# Lower is more efficient at the same quality; used to break size ties
+VIDEO_CODEC_RANK = {'av01': 0, 'vp09': 1, 'vp9': 1, 'hev1': 2, 'hvc1': 2, 'avc1': 3, 'h264': 3, 'vp8': 4}
+AUDIO_CODEC_RANK = {'opus': 0, 'mp4a': 1, 'aac': 1, 'vorbis': 2, 'mp3': 3}
+
+# Audio below this bitrate is only used when nothing better exists
+MIN_AUDIO_KBPS = 96
+
+# Audio-only download types: mp3 is always transcoded, m4a and opus are
+# stream-copied when the source already has that codec, and "audio" keeps
+# whatever codec the site serves
+AUDIO_FORMATS = ('mp3', 'm4a', 'opus', 'audio')
+VIDEO_FORMATS = ('mp4',)
+FORMAT_TYPES = VIDEO_FORMATS + AUDIO_FORMATS
+
+# Multi-output choices: the first type is downloaded, the others are made
+# from the same local streams instead of downloading the video again
+OUTPUT_COMBINATIONS = ('mp4+mp3', 'mp4+m4a')
+FORMAT_CHOICES = FORMAT_TYPES + OUTPUT_COMBINATIONS
+
+# Source codecs each audio type can take without re-encoding
+AUDIO_COPY_CODECS = {'m4a': ('mp4a', 'aac'), 'opus': ('opus',), 'mp3': ('mp3',)}
+
+
+def codec_family(codec):
+    """'av01' for 'av01.0.05M.08' etc.; None for absent codecs"""
+    if not codec or codec == 'none':
+        return None
+    return codec.split('.')[0].lower()
+
+
+def parse_height(quality):
+    """720 for '720p'; None for anything else"""
+    try:
+        return int(str(quality).lower().rstrip('p'))
+    except ValueError:
+        return None
+
+
+def parse_kbps(quality):
+    """192 for '192kbps'; None for anything else"""
+    try:
+        return int(str(quality).lower().replace('kbps', ''))
+    except ValueError:
+        return None
+
+
+def is_audio_format(format_type):
+    return format_type in AUDIO_FORMATS
+
+
+def split_format_choice(choice):
+    """('mp4', ['mp3']) for 'mp4+mp3'; ('mp3', []) for a single type"""
+    primary, *extra = str(choice).split('+')
+    return primary, extra
+
+
+def audio_postprocessor(format_type, quality):
+    """
+    yt-dlp FFmpegExtractAudio settings for an audio-only download. yt-dlp
+    copies the stream instead of re-encoding when the codec already
+    matches (or for 'best'), so only mp3 from a non-mp3 source, or a
+    codec switch, costs CPU.
+    """
+    if format_type == 'mp3':
+        return {'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3',
+                'preferredquality': str(parse_kbps(quality) or 192)}
+    return {'key': 'FFmpegExtractAudio', 'preferredcodec': 'best' if format_type == 'audio' else format_type}
+
+
+def ydl_format_options(plan, format_type, quality):
+    """yt-dlp options that fetch the streams of `plan` and turn them into a `format_type` file"""
+    if is_audio_format(format_type):
+        # Only the audio stream is fetched; it is remuxed unless a conversion was asked for
+        return {'format': plan.format_spec, 'postprocessors': [audio_postprocessor(format_type, quality)]}
+    return {'format': plan.format_spec, 'merge_output_format': format_type}
+
+
+def result_audio_codec(format_type, plan):
+    """
+    Audio codec in the file a download of `plan` ends up as: mp3, m4a and
+    opus are converted to their own codec unless the stream already had
+    it; video and 'audio' keep the planned stream's codec (None if nothing
+    concrete was planned)
+    """
+    if format_type in AUDIO_COPY_CODECS:
+        return AUDIO_COPY_CODECS[format_type][0]
+    if not plan.streams:
+        return None
+    return plan.streams[-1].acodec
+
+
+def format_size(num_bytes):
+    """'1.4 GB', '35.2 MB' etc.; '' for unknown sizes"""
+    if not num_bytes:
+        return ''
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num_bytes < 1024 or unit == 'GB':
+            return f"{num_bytes:.0f} {unit}" if unit == 'B' else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
+
+class StreamFormat:
+    """One yt-dlp format with the fields the planner compares"""
+    def __init__(self, fmt, duration=None):
+        self.format_id = str(fmt.get('format_id'))
+        self.height = fmt.get('height')
+        self.fps = fmt.get('fps') or 0
+        self.ext = fmt.get('ext')
+        self.vcodec = codec_family(fmt.get('vcodec'))
+        self.acodec = codec_family(fmt.get('acodec'))
+        # Formats that do not say which streams they carry are treated as muxed video
+        if fmt.get('vcodec') is None and fmt.get('acodec') is None and self.height:
+            self.vcodec = self.acodec = 'unknown'
+        self.abr = fmt.get('abr') or (fmt.get('tbr') if not self.vcodec else None) or 0
+        self.size = self.estimate_size(fmt, duration)
+
+    @staticmethod
+    def estimate_size(fmt, duration):
+        size = fmt.get('filesize') or fmt.get('filesize_approx')
+        if size:
+            return int(size)
+        if fmt.get('tbr') and duration:
+            return int(fmt['tbr'] * 1000 / 8 * duration)  # tbr is in kbit/s
+        return None
+
+    def sort_key(self):
+        # Unknown sizes last; then smallest, then fewest frames (a quality asks for a height,
+        # and 30fps meets it as well as 60fps), then most efficient codec
+        return (self.size is None, self.size or 0, self.fps, VIDEO_CODEC_RANK.get(self.vcodec, 5),
+                AUDIO_CODEC_RANK.get(self.acodec, 5))
+
+
+class FormatPlan:
+    """The chosen streams, the yt-dlp format spec that selects them and the estimated size"""
+    def __init__(self, format_spec, streams=(), estimated_bytes=None, height=None):
+        self.format_spec = format_spec
+        self.streams = list(streams)
+        self.estimated_bytes = estimated_bytes
+        self.height = height
+
+    def describe(self):
+        codecs = " + ".join(stream.vcodec or stream.acodec for stream in self.streams
+                            if (stream.vcodec or stream.acodec) != 'unknown')
+        parts = [f"{self.height}p" if self.height else "", codecs, format_size(self.estimated_bytes)]
+        return " • ".join(part for part in parts if part)
+
+
+class FormatIndex:
+    """Formats of one video grouped for quick lookups by height"""
+    def __init__(self, info):
+        info = info or {}
+        self.duration = info.get('duration')
+        self.video = {}  # height -> video-only streams
+        self.muxed = {}  # height -> streams with both video and audio
+        self.audio = []  # audio-only streams
+        for fmt in info.get('formats') or []:
+            if fmt.get('format_id') is None:
+                continue
+            stream = StreamFormat(fmt, self.duration)
+            if stream.vcodec and stream.height:
+                group = self.muxed if stream.acodec else self.video
+                group.setdefault(stream.height, []).append(stream)
+            elif stream.acodec and not stream.vcodec:
+                self.audio.append(stream)
+
+    def heights(self):
+        """Available heights, highest first"""
+        return sorted(set(self.video) | set(self.muxed), reverse=True)
+
+    def best_audio(self, min_kbps=MIN_AUDIO_KBPS):
+        """Smallest audio stream of at least `min_kbps`, else the best one there is"""
+        if not self.audio:
+            return None
+        good = [stream for stream in self.audio if stream.abr >= min_kbps]
+        if good:
+            return min(good, key=StreamFormat.sort_key)
+        return max(self.audio, key=lambda stream: stream.abr)
+
+    def pick_height(self, target):
+        """The highest available height not above `target`, else the lowest one"""
+        heights = self.heights()
+        if not heights:
+            return None
+        if target is None:
+            return heights[0]
+        fitting = [height for height in heights if height <= target]
+        return fitting[0] if fitting else heights[-1]
+
+    def candidates(self, height):
+        """(streams, estimated bytes) for every way of getting video at `height` with sound"""
+        audio = self.best_audio()
+        options = [([stream], stream.size) for stream in self.muxed.get(height, [])]
+        if audio is not None:
+            for stream in self.video.get(height, []):
+                size = stream.size + audio.size if stream.size and audio.size else None
+                options.append(([stream, audio], size))
+        return options
+
+    def plan(self, quality):
+        """Smallest streams meeting `quality` ('720p'), as a FormatPlan"""
+        target = parse_height(quality)
+        fallback = f"bv*[height<={target}]+ba/b[height<={target}]/b" if target else "bv*+ba/b"
+        height = self.pick_height(target)
+        options = self.candidates(height) if height else []
+        if not options:
+            return FormatPlan(fallback, height=height)
+
+        def key(option):
+            streams, size = option
+            return (size is None, size or 0) + streams[0].sort_key()[2:]
+        streams, size = min(options, key=key)
+        spec = "+".join(stream.format_id for stream in streams)
+        # The ids belong to this extraction; fall back to a generic selection if they are gone
+        return FormatPlan(f"{spec}/{fallback}", streams, size, height)
+
+    def pick_audio(self, kbps, codecs=()):
+        """
+        The best audio stream at or under `kbps` (the smallest one if none
+        is), preferring `codecs` so it can be stream-copied
+        """
+        streams = self.audio
+        preferred = [stream for stream in streams if stream.acodec in codecs]
+        if preferred:
+            streams = preferred
+        if not streams:
+            return None
+        if not kbps:
+            return max(streams, key=lambda stream: (stream.abr, -(stream.size or 0)))
+        fitting = [stream for stream in streams if 0 < stream.abr <= kbps]
+        if fitting:
+            return max(fitting, key=lambda stream: (stream.abr, -(stream.size or 0)))
+        return min(streams, key=lambda stream: (stream.abr or float('inf'), stream.size or 0))
+
+    def plan_audio(self, quality, format_type='mp3'):
+        """
+        Audio only, at most `quality` ('192kbps') where the site offers
+        that. The estimate is the converted size for mp3, else the size of
+        the stream itself.
+        """
+        kbps = parse_kbps(quality)
+        codecs = AUDIO_COPY_CODECS.get(format_type, ())
+        audio = self.pick_audio(kbps, codecs)
+        limited = f"ba[abr<={kbps}]/" if kbps else ""
+        # A muxed file is the last resort, for sites without separate audio
+        fallback = f"{limited}ba/b"
+        if audio is None:
+            return FormatPlan(fallback)
+        if format_type == 'mp3' and audio.acodec not in codecs:
+            size = int(kbps * 1000 / 8 * self.duration) if kbps and self.duration else None
+        else:
+            size = audio.size
+        return FormatPlan(f"{audio.format_id}/{fallback}", [audio], size)
+
+    def size_by_height(self):
+        """{'720p': estimated bytes or None} for the quality menu"""
+        return {f"{height}p": self.plan(f"{height}p").estimated_bytes for height in self.heights()}
+
+
+def plan_download(info, quality, format_type="mp4"):
+    """FormatPlan for downloading `info` as `format_type` (see FORMAT_TYPES) at `quality`"""
+    index = FormatIndex(info)
+    if is_audio_format(format_type):
+        return index.plan_audio(quality, format_type)
+    return index.plan(quality)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Download history widget
+Shows finished jobs from a JobStore one page at a time. A fixed set of row
+widgets is created once and rebound per page, so the history can grow
+without bound while the window holds a single page.
+"""
+
+from datetime import datetime
+from tkinter import messagebox
+
+import customtkinter as ctk
+
+PAGE_SIZE = 50
+
+
+class HistoryView(ctk.CTkFrame):
+    """Paged list of finished jobs read from a JobStore"""
+    STATUS_ICONS = {'completed': '✅', 'error': '❌', 'cancelled': '🚫'}
+
+    def __init__(self, master, job_store, open_path=None, page_size=PAGE_SIZE, **kwargs):
+        """`open_path(path)` optionally shows a downloaded file in the file manager"""
+        super().__init__(master, fg_color="transparent", **kwargs)
+        self.job_store = job_store
+        self.open_path = open_path
+        self.page_size = page_size
+        self.page = 0
+        self.total = 0
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        header = ctk.CTkFrame(self, fg_color="transparent")
+        header.grid(row=0, column=0, sticky="ew", padx=10, pady=(5, 0))
+        header.grid_columnconfigure(0, weight=1)
+
+        self.page_label = ctk.CTkLabel(header, text="", font=ctk.CTkFont(size=12),
+                                       text_color=("gray50", "gray50"), anchor="w")
+        self.page_label.grid(row=0, column=0, sticky="w")
+        self.newer_button = ctk.CTkButton(header, text="◀ Newer", width=90,
+                                          command=lambda: self.show_page(self.page - 1))
+        self.newer_button.grid(row=0, column=1, padx=(5, 0))
+        self.older_button = ctk.CTkButton(header, text="Older ▶", width=90,
+                                          command=lambda: self.show_page(self.page + 1))
+        self.older_button.grid(row=0, column=2, padx=(5, 0))
+        ctk.CTkButton(header, text="🔄", width=35, command=self.refresh).grid(row=0, column=3, padx=(5, 0))
+        ctk.CTkButton(header, text="🗑️ Clear", width=80, fg_color="transparent", border_width=1,
+                      command=self.clear).grid(row=0, column=4, padx=(5, 0))
+
+        self.body = ctk.CTkScrollableFrame(self)
+        self.body.grid(row=1, column=0, sticky="nsew", padx=10, pady=10)
+        self.body.grid_columnconfigure(0, weight=1)
+
+        self.empty_label = ctk.CTkLabel(self.body, text="📋 No download history",
+                                        font=ctk.CTkFont(size=14), text_color=("gray50", "gray50"))
+        self.rows = [self.create_row(index) for index in range(page_size)]
+        self.refresh()
+
+    def create_row(self, index):
+        frame = ctk.CTkFrame(self.body)
+        frame.grid_columnconfigure(1, weight=1)
+        icon = ctk.CTkLabel(frame, text="", font=ctk.CTkFont(size=16), width=30)
+        icon.grid(row=0, column=0, rowspan=2, padx=10, pady=5)
+        title = ctk.CTkLabel(frame, text="", font=ctk.CTkFont(size=12, weight="bold"), anchor="w")
+        title.grid(row=0, column=1, sticky="ew", pady=(5, 0))
+        details = ctk.CTkLabel(frame, text="", font=ctk.CTkFont(size=10),
+                               text_color=("gray60", "gray40"), anchor="w")
+        details.grid(row=1, column=1, sticky="ew", pady=(0, 5))
+        row = {'index': index, 'frame': frame, 'icon': icon, 'title': title, 'details': details, 'path': ""}
+        if self.open_path:
+            row['open'] = ctk.CTkButton(frame, text="📁", width=30, height=30,
+                                        command=lambda: self.open_path(row['path']))
+        return row
+
+    def bind_row(self, row, job):
+        title = job['title'] or job['url']
+        row['icon'].configure(text=self.STATUS_ICONS.get(job['status'], '•'))
+        row['title'].configure(text=title[:70] + "..." if len(title) > 70 else title)
+
+        details = [job['kind'].capitalize()]
+        if job.get('platform'):
+            details.append(job['platform'])
+        details.append(datetime.fromtimestamp(job['finished_at']).strftime("%Y-%m-%d %H:%M"))
+        if job['status'] == 'error' and job['error']:
+            details.append(f"Error: {job['error'][:60]}")
+        elif job['file_path']:
+            details.append(job['file_path'])
+        row['details'].configure(text=" • ".join(details))
+
+        row['path'] = job['file_path']
+        if 'open' in row:
+            if job['status'] == 'completed' and job['file_path']:
+                row['open'].grid(row=0, column=2, rowspan=2, padx=10)
+            else:
+                row['open'].grid_remove()
+        row['frame'].grid(row=row['index'], column=0, sticky="ew", padx=5, pady=3)
+
+    def show_page(self, page):
+        """Load page `page` (0 is the most recent) from the job store"""
+        self.total = self.job_store.history_count()
+        pages = max(1, -(-self.total // self.page_size))
+        self.page = min(max(page, 0), pages - 1)
+        jobs = self.job_store.history(self.page_size, self.page * self.page_size)
+
+        for row, job in zip(self.rows, jobs):
+            self.bind_row(row, job)
+        for row in self.rows[len(jobs):]:
+            row['frame'].grid_remove()
+        if jobs:
+            self.empty_label.grid_remove()
+        else:
+            self.empty_label.grid(row=0, column=0, pady=20)
+
+        self.page_label.configure(text=f"{self.total} finished jobs • page {self.page + 1} of {pages}")
+        self.newer_button.configure(state="normal" if self.page > 0 else "disabled")
+        self.older_button.configure(state="normal" if self.page < pages - 1 else "disabled")
+
+    def refresh(self):
+        """Reload the current page, e.g. after a job finished"""
+        self.show_page(self.page)
+
+    def clear(self):
+        if not self.total or not messagebox.askyesno(
+                "Clear History", f"Delete all {self.total} finished jobs from the history?"):
+            return
+        self.job_store.clear_history()
+        self.show_page(0)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Durable job store
+Keeps every queued, partial and finished download in SQLite (WAL mode) so
+the queue survives a restart and the History tab can page through old
+jobs without holding them in memory. Workers call save() as often as they
+like; the latest state of each job is written by a background thread in
+one transaction per flush.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+FLUSH_INTERVAL = 0.5
+
+# Statuses a job is restored in on the next start
+UNFINISHED_STATUSES = ('pending', 'downloading', 'processing', 'paused')
+
+# Item attributes kept in the JSON `data` column when present
+EXTRA_FIELDS = ('platform', 'quality', 'format_type', 'thumbnail_url', 'duration', 'filename', 'priority',
+                'estimated_bytes', 'outputs', 'output_paths')
+
+
+def job_record(item, owner):
+    """Snapshot of `item` as a row, taken on the caller's thread"""
+    status = item.status
+    return {
+        'id': item.id,
+        'owner': owner,
+        'kind': 'file' if hasattr(item, 'filename') else 'video',
+        'url': item.url,
+        'title': getattr(item, 'title', None) or getattr(item, 'filename', ''),
+        'status': status,
+        'progress': float(item.progress or 0),
+        'file_path': item.file_path or '',
+        'error': item.error_message or '',
+        'data': json.dumps({field: getattr(item, field) for field in EXTRA_FIELDS if hasattr(item, field)}),
+        'finished': status not in UNFINISHED_STATUSES,
+    }
+
+
+class JobStore:
+    """SQLite-backed record of download jobs with batched, coalesced writes"""
+    def __init__(self, path=None, owner="core", flush_interval=FLUSH_INTERVAL):
+        """
+        `owner` tags the jobs this process writes; unfinished() restores
+        only those, so two front ends sharing the file never take over each
+        other's queue. history() shows every owner's jobs.
+        """
+        self.path = Path(path) if path else Path.home() / ".social_downloader" / "jobs.db"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.owner = owner
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.pending = {}  # job id -> latest record, or None to delete
+        self.pending_lock = threading.Lock()
+        self.closed = threading.Event()
+
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY,"
+                " owner TEXT NOT NULL,"
+                " kind TEXT NOT NULL,"
+                " url TEXT NOT NULL,"
+                " title TEXT NOT NULL DEFAULT '',"
+                " status TEXT NOT NULL,"
+                " progress REAL NOT NULL DEFAULT 0,"
+                " file_path TEXT NOT NULL DEFAULT '',"
+                " error TEXT NOT NULL DEFAULT '',"
+                " data TEXT NOT NULL DEFAULT '{}',"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " finished_at REAL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, owner)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_url ON jobs (url)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at)")
+
+        self.thread = threading.Thread(target=self._writer, name="job-store", daemon=True)
+        self.thread.start()
+
+    def save(self, item):
+        """Queue the current state of `item` for the next flush"""
+        if self.closed.is_set():
+            return  # Changes after close (e.g. shutdown cancels) are not part of the saved state
+        record = job_record(item, self.owner)
+        with self.pending_lock:
+            self.pending[record['id']] = record
+
+    def save_many(self, items):
+        if self.closed.is_set():
+            return
+        records = [job_record(item, self.owner) for item in items]
+        with self.pending_lock:
+            for record in records:
+                self.pending[record['id']] = record
+
+    def delete(self, job_id):
+        """Forget a job, e.g. one removed from the queue before it finished"""
+        with self.pending_lock:
+            self.pending[job_id] = None
+
+    def flush(self):
+        """Write every queued change in a single transaction"""
+        # Holding the connection lock while swapping keeps concurrent flushes in order
+        with self.lock, self.conn:
+            with self.pending_lock:
+                if not self.pending:
+                    return 0
+                pending, self.pending = self.pending, {}
+            self._write(pending)
+        return len(pending)
+
+    def _write(self, pending):
+        now = time.time()
+        rows = []
+        deleted = []
+        for job_id, record in pending.items():
+            if record is None:
+                deleted.append((job_id,))
+                continue
+            rows.append((
+                record['id'], record['owner'], record['kind'], record['url'], record['title'],
+                record['status'], record['progress'], record['file_path'], record['error'],
+                record['data'], now, now, now if record['finished'] else None
+            ))
+        self.conn.executemany(
+            "INSERT INTO jobs (id, owner, kind, url, title, status, progress, file_path, error,"
+            " data, created_at, updated_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(id) DO UPDATE SET"
+            " title = excluded.title, status = excluded.status, progress = excluded.progress,"
+            " file_path = excluded.file_path, error = excluded.error, data = excluded.data,"
+            " updated_at = excluded.updated_at,"
+            # A job keeps the time it first finished until it is retried
+            " finished_at = CASE WHEN excluded.finished_at IS NULL THEN NULL"
+            "                    ELSE coalesce(jobs.finished_at, excluded.finished_at) END",
+            rows
+        )
+        self.conn.executemany("DELETE FROM jobs WHERE id = ?", deleted)
+
+    def _writer(self):
+        while not self.closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Error saving jobs: {e}")
+
+    def _rows(self, sql, params=()):
+        with self.lock:
+            cursor = self.conn.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+        jobs = []
+        for row in rows:
+            job = dict(zip(columns, row))
+            try:
+                job.update(json.loads(job.pop('data')))
+            except ValueError:
+                pass
+            jobs.append(job)
+        return jobs
+
+    def unfinished(self):
+        """This owner's jobs that still have work left, oldest first"""
+        self.flush()
+        placeholders = ", ".join("?" * len(UNFINISHED_STATUSES))
+        return self._rows(
+            f"SELECT * FROM jobs WHERE status IN ({placeholders}) AND owner = ? ORDER BY created_at",
+            UNFINISHED_STATUSES + (self.owner,)
+        )
+
+    def history(self, limit=50, offset=0):
+        """One page of finished jobs, most recently finished first"""
+        self.flush()
+        return self._rows(
+            "SELECT * FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT ? OFFSET ?",
+            (limit, offset)
+        )
+
+    def history_count(self):
+        self.flush()
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM jobs WHERE finished_at IS NOT NULL").fetchone()[0]
+
+    def clear_history(self):
+        """Delete every finished job"""
+        self.flush()
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL")
+
+    def close(self):
+        """Write outstanding changes and stop the writer"""
+        self.closed.set()
+        self.thread.join(timeout=5)
+        self.flush()
+        with self.lock:
+            self.conn.close()
@@ -15,12 +15,19 @@ import subprocess
 import urllib.parse
 import re
 from pathlib import Path
-import time
+import uuid
 from datetime import datetime
-import queue
-from PIL import Image, ImageTk
-import requests
-from io import BytesIO
+from download_archive import ARCHIVE_NAME, DownloadArchive
+from duplicate_index import DuplicateIndex
+from format_planner import FORMAT_TYPES, FormatIndex, format_size, is_audio_format, plan_download, ydl_format_options
+from history_view import HistoryView
+from job_store import JobStore
+from metadata_cache import MetadataCache
+from thumbnail_cache import ThumbnailCache
+import ytdl_engine
+from ytdl_engine import YoutubeDLPool
+from scheduler import DownloadScheduler
+from progress_bus import ProgressBus
 
 # Set appearance mode and color theme
 ctk.set_appearance_mode("system")
@@ -39,6 +46,8 @@ class Config:
             "default_video_quality": "720p",
             "default_audio_quality": "192kbps",
             "max_concurrent": 3,
+            "metadata_cache_ttl": 3600,
+            "ui_refresh_hz": 15,
             "naming_pattern": "{title}",
             "create_subfolders": True,
             "platforms": {
@@ -80,6 +89,7 @@ class Config:
 class DownloadItem:
     """Represents a download item"""
     def __init__(self, url, title="", platform="", thumbnail_url="", duration="", quality="720p", format_type="mp4"):
+        self.id = uuid.uuid4().hex
         self.url = url
         self.title = title
         self.platform = platform
@@ -88,42 +98,41 @@ class DownloadItem:
         self.quality = quality
         self.format_type = format_type
         self.status = "pending"  # pending, downloading, completed, error
+        self.priority = 0
         self.progress = 0
         self.file_path = ""
         self.error_message = ""
+        self.estimated_bytes = 0
+        self.cancel_event = threading.Event()
 
 class YouTubeDLWrapper:
-    """Wrapper for yt-dlp functionality"""
-    def __init__(self):
+    """Wrapper for yt-dlp functionality, run in-process on a pool of YoutubeDL instances"""
+    def __init__(self, metadata_cache=None, pool_size=4):
         self.is_available = self.check_ytdlp()
+        self.metadata_cache = metadata_cache or MetadataCache()
+        self.pool = YoutubeDLPool(max_size=pool_size)
     
     def check_ytdlp(self):
         """Check if yt-dlp is available"""
-        try:
-            result = subprocess.run(['yt-dlp', '--version'], capture_output=True, text=True)
-            return result.returncode == 0
-        except FileNotFoundError:
-            return False
+        return ytdl_engine.is_available()
     
-    def get_video_info(self, url):
-        """Extract video information"""
+    def extract_info(self, url):
+        """Return the full yt-dlp info dict for a URL, extracting only on a cache miss"""
+        info = self.metadata_cache.get(url)
+        if info is not None:
+            return info
+        
         if not self.is_available:
             raise Exception("yt-dlp not found. Please install yt-dlp.")
         
+        info = self.pool.extract_info(url)
+        self.metadata_cache.put(url, info)
+        return info
+    
+    def get_video_info(self, url):
+        """Extract video information"""
         try:
-            cmd = [
-                'yt-dlp',
-                '--dump-json',
-                '--no-download',
-                url
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            
-            if result.returncode != 0:
-                raise Exception(f"Failed to get video info: {result.stderr}")
-            
-            info = json.loads(result.stdout)
+            info = self.extract_info(url)
             
             # Extract relevant information
             return {
@@ -131,16 +140,52 @@ class YouTubeDLWrapper:
                 'platform': info.get('extractor_key', 'Unknown'),
                 'thumbnail': info.get('thumbnail', ''),
                 'duration': self.format_duration(info.get('duration', 0)),
-                'formats': self.extract_formats(info.get('formats', []))
+                'formats': self.extract_formats(info),
+                'format_index': FormatIndex(info)
             }
         
-        except subprocess.TimeoutExpired:
-            raise Exception("Request timed out")
-        except json.JSONDecodeError:
-            raise Exception("Invalid response from yt-dlp")
         except Exception as e:
             raise Exception(f"Error getting video info: {str(e)}")
     
+    def download_options(self, item, outtmpl, archive=None):
+        """Build yt-dlp options for a download item"""
+        options = {'outtmpl': outtmpl}
+        if archive is not None:
+            options['download_archive'] = archive
+        plan = plan_download(self.metadata_cache.get(item.url), item.quality, item.format_type)
+        options.update(ydl_format_options(plan, item.format_type, item.quality))
+        return options
+    
+    def download(self, item, outtmpl, progress_hook=None, archive=None):
+        """Download an item in-process; returns the path of the produced file"""
+        if not self.is_available:
+            raise Exception("yt-dlp not found. Please install yt-dlp.")
+        
+        options = self.download_options(item, outtmpl, archive)
+        final = {}
+        
+        def progress(d):
+            if item.cancel_event.is_set():
+                raise ytdl_engine.DownloadCancelled()  # Abort yt-dlp right away
+            if progress_hook:
+                progress_hook(d)
+        
+        def postprocessor_hook(d):
+            if d['status'] == 'finished' and d.get('info_dict', {}).get('filepath'):
+                final['filepath'] = d['info_dict']['filepath']
+        
+        info = self.metadata_cache.get(item.url)
+        try:
+            result = self.pool.download(item.url, options, info, progress, postprocessor_hook)
+        except ytdl_engine.RETRYABLE_ERRORS:
+            if info is None or item.cancel_event.is_set():
+                raise
+            # Cached stream URLs may have expired; extract afresh
+            self.metadata_cache.invalidate(item.url)
+            result = self.pool.download(item.url, options, None, progress, postprocessor_hook)
+        
+        return final.get('filepath') or ytdl_engine.downloaded_filepath(result)
+    
     def format_duration(self, duration):
         """Format duration in seconds to MM:SS or HH:MM:SS"""
         if not duration:
@@ -155,74 +200,56 @@ class YouTubeDLWrapper:
         else:
             return f"{minutes:02d}:{seconds:02d}"
     
-    def extract_formats(self, formats):
+    def extract_formats(self, info):
         """Extract available video formats"""
-        video_formats = []
-        audio_formats = []
-        
-        for fmt in formats:
-            if fmt.get('vcodec') != 'none' and fmt.get('height'):
-                quality = f"{fmt['height']}p"
-                if quality not in [f['quality'] for f in video_formats]:
-                    video_formats.append({
-                        'quality': quality,
-                        'format_id': fmt['format_id']
-                    })
-            
-            if fmt.get('acodec') != 'none' and not fmt.get('height'):
-                bitrate = fmt.get('abr', 'Unknown')
-                audio_formats.append({
-                    'quality': f"{bitrate}kbps" if bitrate != 'Unknown' else 'Unknown',
-                    'format_id': fmt['format_id']
-                })
-        
-        # Sort by quality
-        video_formats.sort(key=lambda x: int(x['quality'][:-1]), reverse=True)
+        index = FormatIndex(info)
+        video_formats = [{'quality': quality, 'estimated_bytes': size}
+                         for quality, size in index.size_by_height().items()]
+        audio_formats = [{
+            'quality': f"{stream.abr:.0f}kbps" if stream.abr else 'Unknown',
+            'format_id': stream.format_id
+        } for stream in index.audio]
         
         return {
             'video': video_formats,
             'audio': audio_formats
         }
 
-class ThumbnailCache:
-    """Cache for thumbnail images"""
-    def __init__(self):
-        self.cache = {}
-        self.cache_dir = Path.home() / ".social_downloader" / "thumbnails"
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
-    
-    def get_thumbnail(self, url, size=(120, 90)):
-        """Get thumbnail image, cached"""
-        if url in self.cache:
-            return self.cache[url]
-        
-        try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            image = Image.open(BytesIO(response.content))
-            image.thumbnail(size, Image.Resampling.LANCZOS)
-            
-            # Convert to PhotoImage for tkinter
-            photo = ImageTk.PhotoImage(image)
-            self.cache[url] = photo
-            
-            return photo
-        
-        except Exception as e:
-            print(f"Error loading thumbnail: {e}")
-            return None
-
 class SocialMediaDownloader:
     """Main application class"""
     
+    QUEUE_STATUS_COLORS = {
+        'pending': ("gray50", "gray50"),
+        'downloading': ("#007acc", "#4da6ff"),
+        'completed': ("#28a745", "#20c997"),
+        'error': ("#dc3545", "#e74c3c")
+    }
+    
+    QUEUE_STATUS_ICONS = {
+        'pending': '⏳',
+        'downloading': '⬇️',
+        'completed': '✅',
+        'error': '❌'
+    }
+    
     def __init__(self):
         self.config = Config()
-        self.ytdl = YouTubeDLWrapper()
+        self.metadata_cache = MetadataCache(ttl=self.config.config['metadata_cache_ttl'])
+        self.ytdl = YouTubeDLWrapper(self.metadata_cache, pool_size=self.config.config['max_concurrent'] + 1)
         self.thumbnail_cache = ThumbnailCache()
-        self.download_queue = queue.Queue()
-        self.active_downloads = {}
+        self.job_store = JobStore(owner="main")
+        self.duplicate_index = DuplicateIndex()
+        self.archives = {}  # download root -> DownloadArchive
+        self.archive_lock = threading.Lock()
+        self.scheduler = DownloadScheduler(
+            self.download_item,
+            lambda: self.config.config['max_concurrent'],
+            skip=lambda item: item.status != 'pending'
+        )
         self.download_items = []
+        self.progress_bus = ProgressBus()
+        self.queue_widgets = {}  # item -> widgets of its queue row
+        self.queue_row_counter = 0
         
         # Create main window
         self.root = ctk.CTk()
@@ -235,10 +262,10 @@ class SocialMediaDownloader:
         
         self.setup_ui()
         self.setup_styles()
+        self.restore_queue()
         
-        # Start download worker thread
-        self.worker_thread = threading.Thread(target=self.download_worker, daemon=True)
-        self.worker_thread.start()
+        # Apply batched progress updates from download threads
+        self.drain_progress_updates()
         
         # Bind paste event
         self.root.bind('<Control-v>', self.paste_url)
@@ -425,23 +452,12 @@ class SocialMediaDownloader:
         self.empty_queue_label.grid(row=0, column=0, pady=20)
     
     def create_history_section(self):
-        """Create download history section"""
+        """Create download history section, paged from the job store"""
         self.history_tab.grid_columnconfigure(0, weight=1)
         self.history_tab.grid_rowconfigure(0, weight=1)
         
-        # Scrollable frame for history items
-        self.history_scroll = ctk.CTkScrollableFrame(self.history_tab)
-        self.history_scroll.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
-        self.history_scroll.grid_columnconfigure(0, weight=1)
-        
-        # Empty history message
-        self.empty_history_label = ctk.CTkLabel(
-            self.history_scroll,
-            text="📋 No download history",
-            font=ctk.CTkFont(size=14),
-            text_color=("gray50", "gray50")
-        )
-        self.empty_history_label.grid(row=0, column=0, pady=20)
+        self.history_view = HistoryView(self.history_tab, self.job_store)
+        self.history_view.grid(row=0, column=0, sticky="nsew")
     
     def create_action_buttons(self):
         """Create action buttons"""
@@ -566,14 +582,17 @@ class SocialMediaDownloader:
         thumbnail_frame.grid(row=0, column=0, rowspan=4, padx=20, pady=20, sticky="nw")
         thumbnail_frame.grid_propagate(False)
         
-        # Try to load thumbnail
+        # Show a placeholder now and swap the thumbnail in once it has loaded
         if info.get('thumbnail'):
-            thumbnail = self.thumbnail_cache.get_thumbnail(info['thumbnail'])
+            thumbnail = self.thumbnail_cache.get_thumbnail(
+                info['thumbnail'],
+                lambda url, image: self.progress_bus.publish(
+                    ('thumbnail', url), self._show_thumbnail, thumbnail_frame, image)
+            )
             if thumbnail:
-                thumbnail_label = ctk.CTkLabel(thumbnail_frame, image=thumbnail, text="")
-                thumbnail_label.grid(row=0, column=0, padx=10, pady=10)
+                self._show_thumbnail(thumbnail_frame, thumbnail)
             else:
-                placeholder_label = ctk.CTkLabel(thumbnail_frame, text="🖼️\nThumbnail", font=ctk.CTkFont(size=12))
+                placeholder_label = ctk.CTkLabel(thumbnail_frame, text="🖼️\nLoading...", font=ctk.CTkFont(size=12))
                 placeholder_label.grid(row=0, column=0, padx=10, pady=10)
         else:
             placeholder_label = ctk.CTkLabel(thumbnail_frame, text="🖼️\nNo Preview", font=ctk.CTkFont(size=12))
@@ -598,6 +617,11 @@ class SocialMediaDownloader:
             ctk.CTkLabel(info_frame, text="Duration:", font=ctk.CTkFont(weight="bold")).grid(row=2, column=0, sticky="w", pady=2)
             ctk.CTkLabel(info_frame, text=info['duration']).grid(row=2, column=1, sticky="w", padx=(10, 0), pady=2)
         
+        # Size of the streams the planner picks for the selected quality
+        ctk.CTkLabel(info_frame, text="Download:", font=ctk.CTkFont(weight="bold")).grid(row=3, column=0, sticky="w", pady=2)
+        self.estimate_label = ctk.CTkLabel(info_frame, text="")
+        self.estimate_label.grid(row=3, column=1, sticky="w", padx=(10, 0), pady=2)
+        
         # Quality and format selection
         options_frame = ctk.CTkFrame(self.preview_frame, fg_color="transparent")
         options_frame.grid(row=1, column=1, sticky="ew", padx=20, pady=(0, 20))
@@ -609,7 +633,7 @@ class SocialMediaDownloader:
         format_menu = ctk.CTkOptionMenu(
             options_frame,
             variable=self.format_var,
-            values=["mp4", "mp3"],
+            values=list(FORMAT_TYPES),
             command=self.on_format_change
         )
         format_menu.grid(row=0, column=1, padx=10, pady=5, sticky="ew")
@@ -626,7 +650,8 @@ class SocialMediaDownloader:
         self.quality_menu = ctk.CTkOptionMenu(
             options_frame,
             variable=self.quality_var,
-            values=video_qualities
+            values=video_qualities,
+            command=self.on_quality_change
         )
         self.quality_menu.grid(row=0, column=3, padx=10, pady=5, sticky="ew")
         
@@ -637,8 +662,10 @@ class SocialMediaDownloader:
             'platform': info['platform'],
             'thumbnail': info.get('thumbnail', ''),
             'duration': info['duration'],
-            'formats': info['formats']
+            'formats': info['formats'],
+            'format_index': info['format_index']
         }
+        self.on_quality_change(self.quality_var.get())
         
         self.add_queue_button.configure(state="normal")
         self.set_status(f"Ready to download: {info['title']}")
@@ -648,7 +675,7 @@ class SocialMediaDownloader:
         if not hasattr(self, 'current_info'):
             return
         
-        if format_type == "mp3":
+        if is_audio_format(format_type):
             # Switch to audio qualities
             audio_qualities = ["320kbps", "256kbps", "192kbps", "128kbps"]
             self.quality_menu.configure(values=audio_qualities)
@@ -660,6 +687,34 @@ class SocialMediaDownloader:
                 video_qualities = ["720p", "480p", "360p"]
             self.quality_menu.configure(values=video_qualities)
             self.quality_var.set("720p")
+        self.on_quality_change(self.quality_var.get())
+    
+    def current_plan(self):
+        """FormatPlan for the format and quality selected in the preview"""
+        index = self.current_info['format_index']
+        if is_audio_format(self.format_var.get()):
+            return index.plan_audio(self.quality_var.get(), self.format_var.get())
+        return index.plan(self.quality_var.get())
+    
+    def on_quality_change(self, quality):
+        """Show what the selected quality will download"""
+        if not hasattr(self, 'current_info'):
+            return
+        self.estimate_label.configure(text=self.current_plan().describe() or "Size unknown")
+    
+    def _show_thumbnail(self, thumbnail_frame, image):
+        """Replace the preview placeholder with a loaded thumbnail"""
+        if not thumbnail_frame.winfo_exists():
+            return  # the preview was replaced while the thumbnail loaded
+        for widget in thumbnail_frame.winfo_children():
+            widget.destroy()
+        if image is None:
+            ctk.CTkLabel(thumbnail_frame, text="🖼️\nThumbnail", font=ctk.CTkFont(size=12)).grid(
+                row=0, column=0, padx=10, pady=10)
+            return
+        thumbnail = ctk.CTkImage(light_image=image, dark_image=image, size=image.size)
+        thumbnail_label = ctk.CTkLabel(thumbnail_frame, image=thumbnail, text="")
+        thumbnail_label.grid(row=0, column=0, padx=10, pady=10)
     
     def _show_error(self, error_msg):
         """Show error message"""
@@ -681,8 +736,10 @@ class SocialMediaDownloader:
             quality=self.quality_var.get(),
             format_type=self.format_var.get()
         )
+        item.estimated_bytes = self.current_plan().estimated_bytes or 0
         
         self.download_items.append(item)
+        self.job_store.save(item)
         self.update_queue_display()
         self.download_all_button.configure(state="normal")
         
@@ -695,51 +752,36 @@ class SocialMediaDownloader:
         self.set_status(f"Added to queue: {item.title}")
     
     def update_queue_display(self):
-        """Update the queue display"""
-        # Clear existing items
-        for widget in self.queue_scroll.winfo_children():
-            widget.destroy()
+        """Sync queue rows with download_items, touching only rows that changed"""
+        current = set(self.download_items)
+        
+        # Remove rows of items that left the queue
+        for item in [item for item in self.queue_widgets if item not in current]:
+            self.queue_widgets.pop(item)['frame'].destroy()
         
         if not self.download_items:
-            self.empty_queue_label = ctk.CTkLabel(
-                self.queue_scroll,
-                text="📥 No downloads in queue",
-                font=ctk.CTkFont(size=14),
-                text_color=("gray50", "gray50")
-            )
             self.empty_queue_label.grid(row=0, column=0, pady=20)
             return
+        self.empty_queue_label.grid_remove()
         
-        # Add queue items
-        for i, item in enumerate(self.download_items):
-            self.create_queue_item(i, item)
+        # Add rows for new items and refresh the rest
+        for item in self.download_items:
+            if item not in self.queue_widgets:
+                self.create_queue_item(item)
+            else:
+                self.update_queue_item(item)
     
-    def create_queue_item(self, index, item):
+    def create_queue_item(self, item):
         """Create a queue item widget"""
+        self.queue_row_counter += 1
         item_frame = ctk.CTkFrame(self.queue_scroll)
-        item_frame.grid(row=index, column=0, sticky="ew", padx=10, pady=5)
+        item_frame.grid(row=self.queue_row_counter, column=0, sticky="ew", padx=10, pady=5)
         item_frame.grid_columnconfigure(1, weight=1)
         
-        # Status indicator
-        status_colors = {
-            'pending': ("gray50", "gray50"),
-            'downloading': ("#007acc", "#4da6ff"),
-            'completed': ("#28a745", "#20c997"),
-            'error': ("#dc3545", "#e74c3c")
-        }
-        
-        status_icons = {
-            'pending': '⏳',
-            'downloading': '⬇️',
-            'completed': '✅',
-            'error': '❌'
-        }
-        
         status_label = ctk.CTkLabel(
             item_frame,
-            text=status_icons.get(item.status, '?'),
-            font=ctk.CTkFont(size=16),
-            text_color=status_colors.get(item.status, ("gray50", "gray50"))
+            text="",
+            font=ctk.CTkFont(size=16)
         )
         status_label.grid(row=0, column=0, padx=10, pady=10)
         
@@ -762,6 +804,8 @@ class SocialMediaDownloader:
         format_info = f"{item.format_type.upper()} • {item.quality}"
         if item.duration and item.duration != "N/A":
             format_info += f" • {item.duration}"
+        if item.estimated_bytes:
+            format_info += f" • ~{format_size(item.estimated_bytes)}"
         
         format_label = ctk.CTkLabel(
             info_frame,
@@ -772,22 +816,15 @@ class SocialMediaDownloader:
         )
         format_label.grid(row=1, column=0, sticky="ew")
         
-        # Progress bar (if downloading)
-        if item.status == 'downloading':
-            progress_bar = ctk.CTkProgressBar(info_frame, height=8)
-            progress_bar.grid(row=2, column=0, sticky="ew", pady=(5, 0))
-            progress_bar.set(item.progress / 100.0)
-        
-        # Error message (if error)
-        if item.status == 'error' and item.error_message:
-            error_label = ctk.CTkLabel(
-                info_frame,
-                text=f"Error: {item.error_message[:30]}...",
-                font=ctk.CTkFont(size=10),
-                text_color=status_colors['error'],
-                anchor="w"
-            )
-            error_label.grid(row=2, column=0, sticky="ew")
+        # Progress bar and error message share row 2; only one is shown at a time
+        progress_bar = ctk.CTkProgressBar(info_frame, height=8)
+        error_label = ctk.CTkLabel(
+            info_frame,
+            text="",
+            font=ctk.CTkFont(size=10),
+            text_color=self.QUEUE_STATUS_COLORS['error'],
+            anchor="w"
+        )
         
         # Remove button
         remove_button = ctk.CTkButton(
@@ -796,24 +833,64 @@ class SocialMediaDownloader:
             width=30,
             height=30,
             font=ctk.CTkFont(size=12),
-            command=lambda: self.remove_from_queue(index)
+            command=lambda: self.remove_from_queue(item)
         )
         remove_button.grid(row=0, column=2, padx=10, pady=10)
+        
+        self.queue_widgets[item] = {
+            'frame': item_frame,
+            'status_label': status_label,
+            'progress_bar': progress_bar,
+            'error_label': error_label,
+            'status': None,
+            'progress': None
+        }
+        self.update_queue_item(item)
     
-    def remove_from_queue(self, index):
-        """Remove item from queue"""
-        if 0 <= index < len(self.download_items):
-            item = self.download_items[index]
-            if item.status != 'downloading':
-                self.download_items.pop(index)
-                self.update_queue_display()
-                
-                if not self.download_items:
-                    self.download_all_button.configure(state="disabled")
-                
-                self.set_status(f"Removed from queue: {item.title}")
+    def update_queue_item(self, item):
+        """Refresh one queue row, reconfiguring only the widgets whose state changed"""
+        widgets = self.queue_widgets.get(item)
+        if widgets is None:
+            return
+        
+        if widgets['status'] != item.status:
+            widgets['status'] = item.status
+            widgets['status_label'].configure(
+                text=self.QUEUE_STATUS_ICONS.get(item.status, '?'),
+                text_color=self.QUEUE_STATUS_COLORS.get(item.status, ("gray50", "gray50"))
+            )
+            
+            # Progress bar (if downloading)
+            if item.status == 'downloading':
+                widgets['progress_bar'].grid(row=2, column=0, sticky="ew", pady=(5, 0))
             else:
-                messagebox.showwarning("Cannot Remove", "Cannot remove item while downloading")
+                widgets['progress_bar'].grid_remove()
+            
+            # Error message (if error)
+            if item.status == 'error' and item.error_message:
+                widgets['error_label'].configure(text=f"Error: {item.error_message[:30]}...")
+                widgets['error_label'].grid(row=2, column=0, sticky="ew")
+            else:
+                widgets['error_label'].grid_remove()
+        
+        if item.status == 'downloading' and widgets['progress'] != round(item.progress, 1):
+            widgets['progress'] = round(item.progress, 1)
+            widgets['progress_bar'].set(item.progress / 100.0)
+    
+    def remove_from_queue(self, item):
+        """Remove item from queue, stopping its download if it is running"""
+        if item in self.download_items:
+            item.cancel_event.set()
+            self.download_items.remove(item)
+            self.scheduler.discard(item)
+            if item.status in ('pending', 'downloading'):
+                self.job_store.delete(item.id)
+            self.update_queue_display()
+            
+            if not self.download_items:
+                self.download_all_button.configure(state="disabled")
+            
+            self.set_status(f"Removed from queue: {item.title}")
     
     def start_downloads(self):
         """Start downloading all queued items"""
@@ -823,45 +900,19 @@ class SocialMediaDownloader:
             messagebox.showinfo("No Downloads", "No pending downloads in queue")
             return
         
-        # Add items to download queue
+        # Add items to the scheduler; they start as soon as slots are free
         for item in pending_items:
-            self.download_queue.put(item)
+            self.scheduler.submit(item)
         
         self.set_status(f"Starting download of {len(pending_items)} items...")
     
-    def download_worker(self):
-        """Background worker for downloads"""
-        while True:
-            try:
-                # Get item from queue
-                item = self.download_queue.get(timeout=1)
-                
-                if len(self.active_downloads) >= self.config.config['max_concurrent']:
-                    # Put back and wait
-                    self.download_queue.put(item)
-                    time.sleep(1)
-                    continue
-                
-                # Start download in separate thread
-                download_thread = threading.Thread(
-                    target=self.download_item,
-                    args=(item,)
-                )
-                download_thread.daemon = True
-                self.active_downloads[item] = download_thread
-                download_thread.start()
-                
-            except queue.Empty:
-                continue
-            except Exception as e:
-                print(f"Error in download worker: {e}")
-    
     def download_item(self, item):
         """Download a single item"""
         try:
             # Update status
             item.status = 'downloading'
-            self.root.after(0, self.update_queue_display)
+            self.job_store.save(item)
+            self.progress_bus.publish(item, self.update_queue_item, item)
             
             # Prepare download path
             download_path = Path(self.config.config['download_path'])
@@ -872,89 +923,95 @@ class SocialMediaDownloader:
                 platform_path.mkdir(exist_ok=True)
                 download_path = platform_path
             
-            # Prepare yt-dlp command
-            safe_title = re.sub(r'[<>:"/\\|?*]', '', item.title)
-            filename = f"{safe_title}.%(ext)s"
-            
-            cmd = [
-                'yt-dlp',
-                '--no-playlist',
-                '-o', str(download_path / filename),
-                '--progress-template', '%(progress._percent_str)s',
-                item.url
-            ]
+            # Skip videos that were already downloaded, under this URL or another
+            existing = None
+            if self.config.config.get('skip_duplicates', True):
+                existing = self.duplicate_index.find_video(item.url, self.metadata_cache.get(item.url),
+                                                           item.format_type)
+            if existing:
+                item.file_path = existing
+                item.status = 'completed'
+                item.progress = 100
+                self.root.after(0, lambda: self.set_status(f"Already downloaded: {item.title}"))
+                return
             
-            # Add format selection
-            if item.format_type == 'mp3':
-                cmd.extend([
-                    '-x',
-                    '--audio-format', 'mp3',
-                    '--audio-quality', item.quality.replace('kbps', '')
-                ])
-            else:
-                # Video format
-                quality_num = item.quality.replace('p', '')
-                cmd.extend([
-                    '-f', f'best[height<={quality_num}]/best'
-                ])
+            archive = self.download_archive()
+            if archive is not None and (archive.contains_url(item.url) or
+                                        archive.contains_info(self.metadata_cache.get(item.url))):
+                item.status = 'completed'
+                item.progress = 100
+                self.root.after(0, lambda: self.set_status(f"Already in the download archive: {item.title}"))
+                return
             
-            # Start download process
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                universal_newlines=True
-            )
+            # Prepare output template
+            safe_title = re.sub(r'[<>:"/\\|?*]', '', item.title)
+            filename = f"{safe_title}.%(ext)s"
             
-            # Monitor progress
-            while True:
-                line = process.stdout.readline()
-                if not line:
-                    break
-                
-                # Parse progress
-                if '%' in line:
-                    try:
-                        progress_str = line.strip().replace('%', '')
-                        if progress_str.replace('.', '').isdigit():
-                            progress = float(progress_str)
-                            item.progress = min(progress, 100)
-                            self.root.after(0, self.update_queue_display)
-                    except:
-                        pass
+            def progress_hook(d):
+                if d['status'] == 'downloading':
+                    total = d.get('total_bytes') or d.get('total_bytes_estimate')
+                    if total:
+                        item.progress = min(d.get('downloaded_bytes', 0) / total * 100, 100)
+                        self.progress_bus.publish(item, self.update_queue_item, item)
             
-            # Wait for process to complete
-            return_code = process.wait()
+            item.file_path = self.ytdl.download(item, str(download_path / filename), progress_hook, archive)
+            self.duplicate_index.add_video(item.url, self.metadata_cache.get(item.url), item.file_path,
+                                          item.format_type)
+            item.status = 'completed'
+            item.progress = 100
             
-            if return_code == 0:
-                item.status = 'completed'
-                item.progress = 100
-                
-                # Find downloaded file
-                for file_path in download_path.glob(f"{safe_title}.*"):
-                    item.file_path = str(file_path)
-                    break
-                
-                self.root.after(0, lambda: self.set_status(f"Download completed: {item.title}"))
-            else:
-                stderr = process.stderr.read()
-                item.status = 'error'
-                item.error_message = stderr[:100] if stderr else "Download failed"
-                self.root.after(0, lambda: self.set_status(f"Download failed: {item.title}"))
+            self.root.after(0, lambda: self.set_status(f"Download completed: {item.title}"))
         
         except Exception as e:
-            item.status = 'error'
-            item.error_message = str(e)
-            self.root.after(0, lambda: self.set_status(f"Error downloading {item.title}: {str(e)}"))
+            if item.cancel_event.is_set():
+                item.status = 'cancelled'
+            else:
+                item.status = 'error'
+                item.error_message = str(e)
+                self.root.after(0, lambda: self.set_status(f"Error downloading {item.title}: {str(e)}"))
         
         finally:
-            # Remove from active downloads
-            if item in self.active_downloads:
-                del self.active_downloads[item]
-            
             # Update UI
-            self.root.after(0, self.update_queue_display)
+            if not item.cancel_event.is_set():  # A removed item is forgotten, not saved
+                self.job_store.save(item)
+            self.progress_bus.publish(item, self.update_queue_item, item)
+            self.progress_bus.publish('history', self.history_view.refresh)
+    
+    def download_archive(self):
+        """yt-dlp archive of the current download root, or None if archiving is off"""
+        if not self.config.config.get('use_download_archive', True):
+            return None
+        root = Path(self.config.config['download_path']).expanduser().resolve()
+        with self.archive_lock:
+            if root not in self.archives:
+                self.archives[root] = DownloadArchive(root / ARCHIVE_NAME)
+            return self.archives[root]
+    
+    def restore_queue(self):
+        """Put back the items a previous session queued but did not finish"""
+        for job in self.job_store.unfinished():
+            item = DownloadItem(
+                url=job['url'],
+                title=job['title'],
+                platform=job.get('platform', ''),
+                thumbnail_url=job.get('thumbnail_url', ''),
+                duration=job.get('duration', ''),
+                quality=job.get('quality', self.config.config['default_video_quality']),
+                format_type=job.get('format_type', 'mp4')
+            )
+            item.id = job['id']
+            item.estimated_bytes = job.get('estimated_bytes', 0)
+            self.download_items.append(item)
+        if self.download_items:
+            self.update_queue_display()
+            self.download_all_button.configure(state="normal")
+            self.set_status(f"Restored {len(self.download_items)} queued items")
+    
+    def drain_progress_updates(self):
+        """Redraw queue rows that changed since the last tick, at most once each"""
+        self.progress_bus.drain()
+        interval = int(1000 / max(1, self.config.config['ui_refresh_hz']))
+        self.root.after(interval, self.drain_progress_updates)
     
     def open_download_folder(self):
         """Open the download folder"""
@@ -995,6 +1052,11 @@ class SocialMediaDownloader:
     def run(self):
         """Start the application"""
         self.root.mainloop()
+        self.thumbnail_cache.close()
+        self.job_store.close()
+        self.duplicate_index.close()
+        for archive in list(self.archives.values()):
+            archive.close()
 
 class SettingsWindow:
     """Settings window"""
@@ -1190,6 +1252,7 @@ class SettingsWindow:
         self.config.config['default_video_quality'] = self.video_quality_var.get()
         self.config.config['default_audio_quality'] = self.audio_quality_var.get()
         self.config.config['max_concurrent'] = int(self.concurrent_var.get())
+        self.parent.scheduler.notify()
         self.config.config['create_subfolders'] = self.subfolder_var.get()
         
         # Update platform settings
@@ -1230,11 +1293,7 @@ def check_dependencies():
         missing.append("Pillow")
     
     # Check yt-dlp
-    try:
-        result = subprocess.run(['yt-dlp', '--version'], capture_output=True)
-        if result.returncode != 0:
-            missing.append("yt-dlp")
-    except FileNotFoundError:
+    if not ytdl_engine.is_available():
         missing.append("yt-dlp")
     
     if missing:
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Persistent yt-dlp metadata cache
+Stores full extraction results in SQLite, keyed by canonical URL, so the
+analyze, queue and download steps share a single extraction.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import urllib.parse
+from pathlib import Path
+
+DEFAULT_TTL = 3600
+
+# Query parameters that never change what a URL points to
+TRACKING_PARAMS = {
+    'si', 'feature', 'fbclid', 'gclid', 'igshid', 'igsh', 'ref', 'ref_src', 's', 't', 'pp',
+}
+
+
+def canonical_url(url):
+    """Normalize a URL so trivially different spellings share one cache entry"""
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = (parts.scheme or 'https').lower()
+    if scheme == 'http':
+        scheme = 'https'
+    host = parts.netloc.lower()
+    for prefix in ('www.', 'm.', 'mobile.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    path = parts.path.rstrip('/') or '/'
+
+    query = [
+        (key, value) for key, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if key not in TRACKING_PARAMS and not key.startswith('utm_')
+    ]
+
+    # Short YouTube links point at the same watch page
+    if host == 'youtu.be' and path != '/':
+        query = [('v', path.lstrip('/'))] + query
+        host, path = 'youtube.com', '/watch'
+    elif host == 'youtube.com' and path.startswith('/shorts/'):
+        query = [('v', path.split('/')[2])] + query
+        path = '/watch'
+
+    return urllib.parse.urlunsplit((scheme, host, path, urllib.parse.urlencode(sorted(query)), ''))
+
+
+class MetadataCache:
+    """TTL-bounded SQLite cache of yt-dlp info dicts"""
+    def __init__(self, path=None, ttl=DEFAULT_TTL):
+        self.path = Path(path) if path else Path.home() / ".social_downloader" / "metadata.db"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                " url TEXT PRIMARY KEY,"
+                " info TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL)"
+            )
+        self.purge_expired()
+
+    def get(self, url):
+        """Return the cached info dict for `url`, or None if missing or expired"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT info, fetched_at FROM metadata WHERE url = ?", (canonical_url(url),)
+            ).fetchone()
+        if not row or time.time() - row[1] > self.ttl:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    def put(self, url, info):
+        """Store a (JSON-serializable) info dict under `url` and its webpage_url"""
+        keys = {canonical_url(url)}
+        for field in ('webpage_url', 'original_url'):
+            if info.get(field):
+                keys.add(canonical_url(info[field]))
+        data = json.dumps(info)
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO metadata (url, info, fetched_at) VALUES (?, ?, ?)",
+                [(key, data, now) for key in keys]
+            )
+
+    def invalidate(self, url):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM metadata WHERE url = ?", (canonical_url(url),))
+
+    def purge_expired(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM metadata WHERE fetched_at < ?", (time.time() - self.ttl,))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Playlist and channel expansion
+Enumerates playlist entries with flat extraction as a stream and resolves
+each entry's full metadata on a bounded worker pool, so the first entries
+can start downloading while the rest of a large channel is still listed.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from yt_dlp import YoutubeDL
+except ImportError:
+    YoutubeDL = None
+
+from ytdl_engine import YoutubeDLPool
+
+FLAT_OPTIONS = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': 'in_playlist',
+    'noplaylist': False,
+}
+
+RESOLVE_WORKERS = 4
+
+# Nested playlists (e.g. channel tabs) are followed this deep
+MAX_DEPTH = 2
+
+
+class PlaylistExpander:
+    """Turns one URL into a stream of entries with metadata resolved in parallel"""
+    def __init__(self, metadata_cache=None, workers=RESOLVE_WORKERS, pool=None):
+        """`pool` is an optional ytdl_engine.YoutubeDLPool the resolvers check extractors out of"""
+        self.metadata_cache = metadata_cache
+        self.workers = max(1, workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="resolve")
+        self.pool = pool or YoutubeDLPool(max_size=self.workers)
+
+    def expand(self, url, on_entry, on_resolved, cancel_event=None, skip=None):
+        """
+        Enumerate `url` on the calling thread. For every entry,
+        `on_entry(entry_url, title, info)` is called as soon as it is listed
+        and returns an item (or None to skip it); `info` is set when the
+        listing already carries full metadata. `on_resolved(item, info)` is
+        then called from a worker once full metadata is known (`info` is
+        None if resolution failed). A URL that is not a playlist yields a
+        single entry. `skip(entry)` may drop a listed entry (a flat info dict
+        with 'id' and 'ie_key' when the site provides them) before anything
+        else is fetched for it. Returns the number of entries queued.
+        """
+        if YoutubeDL is None:
+            raise Exception("yt-dlp not found. Please install yt-dlp.")
+
+        # Back-pressure: stop paging through the listing while resolvers are busy
+        slots = threading.BoundedSemaphore(self.workers * 2)
+        count = 0
+
+        with YoutubeDL(FLAT_OPTIONS) as ydl:
+            result = ydl.extract_info(url, download=False, process=False)
+            if result.get('_type') == 'url':
+                result = ydl.extract_info(result['url'], ie_key=result.get('ie_key'),
+                                          download=False, process=False)
+
+            if result.get('_type') not in ('playlist', 'multi_video'):
+                return self._expand_single(ydl, url, result, on_entry, on_resolved, skip)
+
+            for entry in self._iter_entries(result, 0):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                entry_url = entry.get('webpage_url') or entry.get('url')
+                # Embedded entries without a URL of their own are already full info dicts
+                embedded = entry if not entry.get('url') and entry.get('formats') else None
+                if not entry_url and embedded is None:
+                    continue
+                if skip is not None and skip(entry):
+                    continue
+
+                item = on_entry(entry_url or url, entry.get('title'), embedded)
+                count += 1
+                if item is None:
+                    continue
+                if embedded is not None:
+                    on_resolved(item, embedded)
+                    continue
+
+                slots.acquire()
+                try:
+                    future = self.executor.submit(self._resolve, entry_url, item, on_resolved)
+                except RuntimeError:
+                    slots.release()
+                    break  # Shut down
+                future.add_done_callback(lambda f: slots.release())
+        return count
+
+    def _expand_single(self, ydl, url, result, on_entry, on_resolved, skip):
+        """
+        Queue a URL that is a single video by finishing the extraction
+        already made for it, so it is not extracted a second time
+        """
+        entry = {'url': url, 'title': result.get('title'), 'id': result.get('id'),
+                 'ie_key': result.get('extractor_key') or result.get('ie_key')}
+        if skip is not None and skip(entry):
+            return 0
+        try:
+            info = YoutubeDL.sanitize_info(ydl.process_ie_result(result, download=False))
+        except Exception as e:
+            print(f"Error resolving {url}: {e}")
+            info = None  # The download extracts it again
+        if info is not None and self.metadata_cache:
+            self.metadata_cache.put(url, info)
+        item = on_entry(url, result.get('title'), info)
+        if item is not None:
+            on_resolved(item, info)
+        return 1
+
+    def _iter_entries(self, playlist, depth):
+        """Yield leaf entries, paging through lazy listings as they are consumed"""
+        for entry in playlist.get('entries') or []:
+            if not entry:
+                continue
+            if entry.get('_type') == 'playlist' and depth < MAX_DEPTH:
+                yield from self._iter_entries(entry, depth + 1)
+            else:
+                yield entry
+
+    def _resolve(self, url, item, on_resolved):
+        info = self.metadata_cache.get(url) if self.metadata_cache else None
+        if info is None:
+            try:
+                info = self.pool.extract_info(url)
+                if self.metadata_cache:
+                    self.metadata_cache.put(url, info)
+            except Exception as e:
+                print(f"Error resolving {url}: {e}")
+                info = None
+        on_resolved(item, info)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.pool.close()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Post-processing stage
+Merging and audio conversion run here instead of inside the download
+slot, so a CPU-heavy ffmpeg step never keeps a network slot idle. The
+pool is sized to the CPU cores and each ffmpeg gets a share of them via
+-threads, so concurrent jobs don't oversubscribe the machine. One ffmpeg
+run can write several outputs (container, audio extract, clips) from the
+same downloaded streams.
+"""
+
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from format_planner import is_audio_format, parse_kbps
+
+# Container for each source audio codec when the original is kept
+AUDIO_CONTAINERS = {'mp4a': 'm4a', 'aac': 'm4a', 'opus': 'opus', 'mp3': 'mp3', 'vorbis': 'ogg', 'flac': 'flac'}
+
+# ffmpeg encoder for each audio type that may need converting
+AUDIO_ENCODERS = {'mp3': 'libmp3lame', 'm4a': 'aac', 'opus': 'libopus'}
+
+# Video clips are re-encoded so they start exactly where asked
+CLIP_ENCODER = 'libx264'
+
+
+class PostProcessError(Exception):
+    pass
+
+
+def ffmpeg_path():
+    return shutil.which('ffmpeg')
+
+
+def audio_extension(format_type, source_codec):
+    """File extension of the result of an audio-only download"""
+    if format_type == 'audio':
+        return AUDIO_CONTAINERS.get(source_codec, 'mka')
+    return format_type
+
+
+def part_path(target):
+    """Temporary name ffmpeg writes to; keeps the real extension so the muxer is picked from it"""
+    root, ext = os.path.splitext(target)
+    return f"{root}.part{ext}"
+
+
+def output_target(base, format_type, source_codec=None, start=None, end=None):
+    """File an output of `format_type` is written to; clips get their range in the name"""
+    ext = audio_extension(format_type, source_codec) if is_audio_format(format_type) else format_type
+    if start or end:
+        label = f"{start or 0}-{end or 'end'}".replace(':', '.')
+        return f"{base} [{label}].{ext}"
+    return f"{base}.{ext}"
+
+
+def ffmpeg_inputs(sources, threads=1):
+    """Start of an ffmpeg command reading `sources` as inputs 0, 1, ..."""
+    args = [ffmpeg_path() or 'ffmpeg', '-y', '-v', 'error', '-threads', str(threads)]
+    for source in sources:
+        args += ['-i', source]
+    return args
+
+
+def clip_args(start=None, end=None):
+    """Output options limiting an output to `start`-`end` (ffmpeg time syntax)"""
+    args = []
+    if start:
+        args += ['-ss', str(start)]
+    if end:
+        args += ['-to', str(end)]
+    return args
+
+
+def video_output_args(output, video=0, audio=1, start=None, end=None):
+    """Output options that copy the video of input `video` and the audio of input `audio` into `output`"""
+    # A single muxed source may have no sound at all
+    audio_map = f'{audio}:a:0?' if audio == video else f'{audio}:a:0'
+    args = clip_args(start, end) + ['-map', f'{video}:v:0', '-map', audio_map]
+    if start or end:
+        # A copied clip would lose its video up to the next keyframe; clips are short, so encode them
+        args += ['-c:v', CLIP_ENCODER, '-preset', 'veryfast', '-c:a', 'copy']
+    else:
+        args += ['-c', 'copy']
+    if output.endswith(('.mp4', '.m4a', '.mov')):
+        args += ['-movflags', '+faststart']
+    return args + [output]
+
+
+def audio_output_args(output, format_type, source_codec=None, kbps=None, audio=0, start=None, end=None):
+    """
+    Output options for an audio-only result from input `audio`: a stream
+    copy when the source codec already fits `format_type`, otherwise an
+    encode at `kbps`
+    """
+    args = clip_args(start, end) + ['-map', f'{audio}:a:0', '-vn']
+    copy = format_type == 'audio' or AUDIO_CONTAINERS.get(source_codec) == format_type
+    if copy:
+        args += ['-c:a', 'copy']
+    else:
+        args += ['-c:a', AUDIO_ENCODERS.get(format_type, format_type)]
+        if kbps:
+            args += ['-b:a', f"{kbps}k"]
+    return args + [output]
+
+
+def merge_command(video, audio, output, threads=1):
+    """ffmpeg arguments that put a video and an audio stream into one file without re-encoding"""
+    return ffmpeg_inputs([video, audio], threads) + video_output_args(output)
+
+
+def audio_command(source, output, format_type, source_codec=None, kbps=None, threads=1):
+    """ffmpeg arguments for an audio-only result of `source` (see audio_output_args)"""
+    return ffmpeg_inputs([source], threads) + audio_output_args(output, format_type, source_codec, kbps)
+
+
+def multi_output_command(sources, outputs, base, source_codec=None, has_video=True, threads=1):
+    """
+    One ffmpeg command that writes every output in `outputs` (dicts with
+    format_type, quality and optionally start/end) next to `base`, from a
+    video and an audio stream or from one file with both. Returns (args,
+    [(part, target), ...]); outputs needing video the sources lack, or
+    whose file is already taken, are left out.
+    """
+    video, audio = 0, len(sources) - 1
+    args = ffmpeg_inputs(sources, threads)
+    taken = {os.path.abspath(source) for source in sources}
+    written = []
+    for output in outputs:
+        format_type, start, end = output['format_type'], output.get('start'), output.get('end')
+        target = output_target(base, format_type, source_codec, start, end)
+        if os.path.abspath(target) in taken:
+            continue
+        if is_audio_format(format_type):
+            args += audio_output_args(part_path(target), format_type, source_codec,
+                                      parse_kbps(output.get('quality')), audio, start, end)
+        elif has_video:
+            args += video_output_args(part_path(target), video, audio, start, end)
+        else:
+            continue
+        taken.add(os.path.abspath(target))
+        written.append((part_path(target), target))
+    return args, written
+
+
+class PostProcessPool:
+    """
+    Runs ffmpeg jobs for download items on a pool sized to the CPU.
+
+    ffmpeg does the work in its own process, so one thread per job is
+    enough to wait on it; `threads` is the ffmpeg thread budget per job.
+    """
+    def __init__(self, workers=0):
+        self.lock = threading.Lock()
+        self.processes = {}  # item -> running ffmpeg
+        self.workers = 0
+        self.executor = None
+        self.resize(workers)
+
+    def resize(self, workers=0):
+        """Use `workers` concurrent jobs (0 = one per core); running jobs finish on the old pool"""
+        cores = os.cpu_count() or 1
+        workers = max(1, int(workers or cores))
+        if workers == self.workers:
+            return
+        old_executor = self.executor
+        self.workers = workers
+        self.threads = max(1, cores // workers)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="postprocess")
+        if old_executor is not None:
+            old_executor.shutdown(wait=False)
+
+    def available(self):
+        return ffmpeg_path() is not None
+
+    def submit(self, item, args, outputs, sources=()):
+        """
+        Run ffmpeg `args`, which write the part file of every (part,
+        target) pair in `outputs`, then move each part to its target and
+        delete `sources`. Returns a Future of the list of targets.
+        """
+        return self.executor.submit(self._run, item, args, list(outputs), sources)
+
+    def _run(self, item, args, outputs, sources):
+        if item.cancel_event.is_set():
+            return None
+        process = subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.PIPE)
+        with self.lock:
+            self.processes[item] = process
+        try:
+            _, stderr = process.communicate()
+        finally:
+            with self.lock:
+                self.processes.pop(item, None)
+        if item.cancel_event.is_set() or process.returncode:
+            for part, _ in outputs:
+                self.remove(part)
+        if item.cancel_event.is_set():
+            return None
+        if process.returncode:
+            message = stderr.decode('utf-8', 'replace').strip().splitlines()
+            raise PostProcessError(message[-1] if message else f"ffmpeg exited with {process.returncode}")
+        targets = []
+        for part, target in outputs:
+            os.replace(part, target)
+            targets.append(os.path.abspath(target))
+        for source in sources:
+            if os.path.abspath(source) not in targets:
+                self.remove(source)
+        return [target for _, target in outputs]
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def cancel(self, item):
+        """Stop the ffmpeg of `item`, if one is running"""
+        with self.lock:
+            process = self.processes.get(item)
+        if process is not None:
+            process.kill()
+
+    def close(self):
+        with self.lock:
+            processes = list(self.processes.values())
+        for process in processes:
+            process.kill()
+        self.executor.shutdown(wait=False, cancel_futures=True)
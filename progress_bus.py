@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Progress event bus
+Worker threads publish "this item changed" notices; the Tk thread drains
+them on a timer so each item is redrawn at most once per tick no matter
+how many progress events arrived in between.
+"""
+
+import threading
+
+
+class ProgressBus:
+    """Thread-safe, latest-state-wins buffer of pending UI updates"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+
+    def publish(self, key, callback, *args):
+        """Schedule `callback(*args)` for the next drain, replacing any earlier update for `key`"""
+        with self.lock:
+            self.pending[key] = (callback, args)
+
+    def drain(self):
+        """Run every pending update; must be called on the UI thread"""
+        with self.lock:
+            if not self.pending:
+                return 0
+            pending, self.pending = self.pending, {}
+        for callback, args in pending.values():
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error applying UI update: {e}")
+        return len(pending)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Download scheduler
+Starts queued items the moment a concurrency slot frees up, in priority
+then FIFO order, and owns the thread-safe set of active downloads.
+"""
+
+import heapq
+import itertools
+import threading
+
+
+class DownloadScheduler:
+    """Event-driven dispatcher of download items onto worker threads"""
+    def __init__(self, run, max_concurrent, skip=None, hold=None, name="download"):
+        """
+        `run(item)` performs one download on a worker thread.
+        `max_concurrent` is an int or a callable returning the current limit.
+        `skip(item)` returns True for queued items that should be dropped
+        instead of started (e.g. cancelled ones).
+        `hold(item)` returns True for queued items that must stay queued
+        without taking a slot (e.g. paused ones); call notify() once they
+        may start.
+        """
+        self.run = run
+        self.max_concurrent = max_concurrent
+        self.skip = skip
+        self.hold = hold
+        self.name = name
+        self.condition = threading.Condition()
+        self.heap = []
+        self.queued = set()
+        self.active = {}
+        self.sequence = itertools.count()
+        self.stopped = False
+
+    def limit(self):
+        value = self.max_concurrent() if callable(self.max_concurrent) else self.max_concurrent
+        return max(1, int(value))
+
+    def submit(self, item, priority=None):
+        """Queue an item; higher priority starts first, equal priorities keep FIFO order"""
+        if priority is None:
+            priority = getattr(item, 'priority', 0)
+        with self.condition:
+            if item in self.queued or item in self.active:
+                return False
+            heapq.heappush(self.heap, (-priority, next(self.sequence), item))
+            self.queued.add(item)
+            self._dispatch()
+        return True
+
+    def submit_many(self, items):
+        """Queue several items under one lock acquisition; returns how many were new"""
+        added = 0
+        with self.condition:
+            for item in items:
+                if item in self.queued or item in self.active:
+                    continue
+                heapq.heappush(self.heap, (-getattr(item, 'priority', 0), next(self.sequence), item))
+                self.queued.add(item)
+                added += 1
+            self._dispatch()
+        return added
+
+    def reprioritize(self, item, priority):
+        """Change the priority of an item that is still waiting"""
+        with self.condition:
+            if item not in self.queued:
+                return False
+            self.heap = [entry for entry in self.heap if entry[2] is not item]
+            heapq.heapify(self.heap)
+            heapq.heappush(self.heap, (-priority, next(self.sequence), item))
+            self._dispatch()
+        return True
+
+    def discard(self, item):
+        """Drop an item from the waiting queue"""
+        with self.condition:
+            if item in self.queued:
+                self.queued.discard(item)
+                self.heap = [entry for entry in self.heap if entry[2] is not item]
+                heapq.heapify(self.heap)
+
+    def notify(self):
+        """Re-check slots, e.g. after max_concurrent was raised"""
+        with self.condition:
+            self._dispatch()
+
+    def _dispatch(self):
+        """Start waiting items while slots are free; caller holds the lock"""
+        held = []
+        while not self.stopped and self.heap and len(self.active) < self.limit():
+            entry = heapq.heappop(self.heap)
+            item = entry[2]
+            if self.skip and self.skip(item):
+                self.queued.discard(item)
+                continue
+            if self.hold and self.hold(item):
+                held.append(entry)  # Keeps its place in the queue
+                continue
+            self.queued.discard(item)
+            thread = threading.Thread(target=self._run_item, args=(item,),
+                                      name=f"{self.name}-worker", daemon=True)
+            self.active[item] = thread
+            thread.start()
+        for entry in held:
+            heapq.heappush(self.heap, entry)
+
+    def _run_item(self, item):
+        try:
+            self.run(item)
+        finally:
+            with self.condition:
+                self.active.pop(item, None)
+                self._dispatch()
+                self.condition.notify_all()
+
+    def is_active(self, item):
+        with self.condition:
+            return item in self.active
+
+    def is_queued(self, item):
+        with self.condition:
+            return item in self.queued
+
+    def active_count(self):
+        with self.condition:
+            return len(self.active)
+
+    def active_items(self):
+        with self.condition:
+            return list(self.active)
+
+    def pending_count(self):
+        with self.condition:
+            return len(self.queued)
+
+    def stop(self):
+        """Start nothing more; returns the items still running"""
+        with self.condition:
+            self.stopped = True
+            return list(self.active)
+
+    def join(self, timeout=None):
+        """Block until every running item has returned; False on timeout"""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.active, timeout)
+
+    def wait_idle(self, timeout=None):
+        """Block until nothing is queued or running"""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.active and not self.queued, timeout)
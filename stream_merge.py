@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Streaming merge
+Downloads the video and audio streams of a split format straight into an
+ffmpeg mux process over two pipes, so only the final container is ever
+written and the file is done as soon as the last byte arrives. Inputs
+ffmpeg cannot demux without seeking (e.g. an MP4 with its index at the
+end) make it fail; callers then fall back to downloading to disk. The
+pipes are passed to ffmpeg as inherited file descriptors, which only
+works on POSIX systems.
+"""
+
+import os
+import subprocess
+import threading
+
+import requests
+
+from postprocess import ffmpeg_path, part_path
+
+CHUNK_SIZE = 1024 * 64
+
+# Only plain HTTP downloads can be piped; fragmented protocols go through yt-dlp
+STREAMABLE_PROTOCOLS = ('http', 'https')
+
+# Windows cannot hand extra pipe descriptors to a child process (pass_fds)
+STREAMING_SUPPORTED = os.name == 'posix'
+
+
+class StreamMergeError(Exception):
+    pass
+
+
+def can_stream(formats):
+    """True if every yt-dlp format dict in `formats` is a single HTTP download that can be piped here"""
+    return STREAMING_SUPPORTED and bool(formats) and all(fmt.get('url') and (fmt.get('protocol') or 'https') in STREAMABLE_PROTOCOLS
+                                 for fmt in formats)
+
+
+class StreamMerger:
+    """Pipes HTTP streams into one ffmpeg mux without intermediate files"""
+    def __init__(self, session=None, chunk_size=CHUNK_SIZE, timeout=30, limiter=None):
+        self.session = session or requests.Session()
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.limiter = limiter
+
+    def merge(self, video, audio, target, item, threads=1, progress_callback=None):
+        """
+        Download the `video` and `audio` format dicts into `target`.
+        Returns `target`, or None if `item` was cancelled.
+        `progress_callback(downloaded, total)` covers both streams together.
+        """
+        if not STREAMING_SUPPORTED:
+            raise StreamMergeError("Streaming merge needs a POSIX system")
+        part = part_path(target)
+        video_read, video_write = os.pipe()
+        audio_read, audio_write = os.pipe()
+        # -xerror: an input that cannot be demuxed from a pipe must fail the merge, not drop the stream
+        args = [ffmpeg_path() or 'ffmpeg', '-y', '-v', 'error', '-xerror', '-threads', str(threads),
+                '-i', f'pipe:{video_read}', '-i', f'pipe:{audio_read}',
+                '-map', '0:v:0', '-map', '1:a:0', '-c', 'copy', part]
+        try:
+            process = subprocess.Popen(args, pass_fds=(video_read, audio_read), stdin=subprocess.DEVNULL,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except Exception as e:  # OSError, or ValueError where pass_fds is unsupported
+            for fd in (video_read, video_write, audio_read, audio_write):
+                os.close(fd)
+            raise StreamMergeError(f"Could not start ffmpeg: {e}")
+        os.close(video_read)
+        os.close(audio_read)
+
+        state = {'downloaded': 0, 'total': sum(fmt.get('filesize') or fmt.get('filesize_approx') or 0
+                                                for fmt in (video, audio))}
+        errors = []
+        lock = threading.Lock()
+
+        def report(amount):
+            with lock:
+                state['downloaded'] += amount
+                downloaded, total = state['downloaded'], state['total']
+            if progress_callback:
+                progress_callback(downloaded, total)
+
+        feeders = [threading.Thread(target=self._feed, args=(fmt, fd, item, process, report, errors),
+                                    name="stream-merge", daemon=True)
+                   for fmt, fd in ((video, video_write), (audio, audio_write))]
+        for feeder in feeders:
+            feeder.start()
+        _, stderr = process.communicate()
+        for feeder in feeders:
+            feeder.join()
+
+        if item.cancel_event.is_set() or process.returncode or errors:
+            try:
+                os.remove(part)
+            except OSError:
+                pass
+        if item.cancel_event.is_set():
+            return None
+        if errors:
+            raise StreamMergeError(f"Streaming download failed: {errors[0]}")
+        if process.returncode:
+            message = stderr.decode('utf-8', 'replace').strip().splitlines()
+            raise StreamMergeError(message[-1] if message else f"ffmpeg exited with {process.returncode}")
+        os.replace(part, target)
+        return target
+
+    def _feed(self, fmt, fd, item, process, report, errors):
+        """Copy one HTTP stream into ffmpeg's pipe `fd`; closing it tells ffmpeg the input ended"""
+        try:
+            with open(fd, 'wb') as pipe, self.session.get(fmt['url'], headers=fmt.get('http_headers'),
+                                                          stream=True, timeout=self.timeout) as r:
+                r.raise_for_status()
+                for chunk in r.iter_content(chunk_size=self.chunk_size):
+                    item.pause_event.wait()
+                    if item.cancel_event.is_set():
+                        process.kill()
+                        return
+                    pipe.write(chunk)
+                    report(len(chunk))
+                    if self.limiter is not None:
+                        self.limiter.throttle(len(chunk), item)
+        except BrokenPipeError:
+            pass  # ffmpeg gave up on this input; its exit status says why
+        except Exception as e:
+            errors.append(e)
+            process.kill()
@@ -6,144 +6,41 @@ Enhanced Social Media Downloader Desktop Application
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import customtkinter as ctk
-import threading
-import json
 import os
 import urllib.parse
-import re
 from pathlib import Path
 import time
-import queue
-import requests
-from yt_dlp import YoutubeDL
+from bulk_import import parse_urls, read_url_file
+from control_api import ControlServer
+from downloader_core import DownloadCore, DownloadItem, FINISHED_STATUSES
+from format_planner import FORMAT_CHOICES, format_size
+from stream_merge import STREAMING_SUPPORTED
+from history_view import HistoryView
+from progress_bus import ProgressBus
+from virtual_list import VirtualListView
 
 # Set appearance mode and color theme
 ctk.set_appearance_mode("system")
 ctk.set_default_color_theme("blue")
 
-class Config:
-    def __init__(self):
-        self.config_dir = Path.home() / ".social_downloader"
-        self.config_file = self.config_dir / "config.json"
-        self.config_dir.mkdir(exist_ok=True)
-        
-        self.default_config = {
-            "theme": "system",
-            "download_path": str(Path.home() / "Downloads" / "SocialDownloader"),
-            "default_video_quality": "720p",
-            "default_audio_quality": "192kbps",
-            "max_concurrent": 3,
-            "naming_pattern": "{title}",
-            "create_subfolders": True,
-            "instant_download": False,
-            "platforms": {
-                "youtube": True,
-                "instagram": True,
-                "tiktok": True,
-                "twitter": True,
-                "facebook": True
-            }
-        }
-        
-        self.config = self.load_config()
-    
-    def load_config(self):
-        try:
-            if self.config_file.exists():
-                with open(self.config_file, 'r') as f:
-                    config = json.load(f)
-                for key, value in self.default_config.items():
-                    if key not in config:
-                        config[key] = value
-                return config
-            else:
-                return self.default_config.copy()
-        except Exception:
-            return self.default_config.copy()
-    
-    def save_config(self):
-        try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.config, f, indent=4)
-        except Exception as e:
-            print(f"Error saving config: {e}")
-
-class DownloadItem:
-    def __init__(self, url, title="", platform="", quality="720p", format_type="mp4"):
-        self.url = url
-        self.title = title
-        self.platform = platform
-        self.quality = quality
-        self.format_type = format_type
-        self.status = "pending"
-        self.progress = 0
-        self.file_path = ""
-        self.error_message = ""
-        self.speed = 0.0
-        self.pause_event = threading.Event()
-        self.pause_event.set()  # Start unpaused
-        self.cancel_event = threading.Event()
-        self.download_thread = None
-        self.ydl_instance = None
-        self.file_size = 0
-        self.downloaded_bytes = 0
-        
-    def speed_mbps(self):
-        return self.speed / (1024 * 1024) if self.speed else 0.0
-    
-    def pause(self):
-        self.pause_event.clear()
-        self.status = "paused"
-    
-    def resume(self):
-        self.pause_event.set()
-        if self.status == "paused":
-            self.status = "downloading"
-    
-    def cancel(self):
-        self.cancel_event.set()
-        self.pause_event.set()  # Unblock if paused
-        self.status = "cancelled"
-
-class FileDownloadItem:
-    def __init__(self, url, filename=None):
-        self.url = url
-        self.filename = filename or os.path.basename(urllib.parse.urlparse(url).path) or "download.bin"
-        self.status = "pending"
-        self.progress = 0
-        self.speed = 0.0
-        self.file_path = ""
-        self.error_message = ""
-        self.pause_event = threading.Event()
-        self.pause_event.set()
-        self.cancel_event = threading.Event()
-    
-    def speed_mbps(self):
-        return self.speed / (1024 * 1024) if self.speed else 0.0
-    
-    def pause(self):
-        self.pause_event.clear()
-        self.status = "paused"
-    
-    def resume(self):
-        self.pause_event.set()
-        if self.status == "paused":
-            self.status = "downloading"
-    
-    def cancel(self):
-        self.cancel_event.set()
-        self.pause_event.set()
-        self.status = "cancelled"
-
 class SocialMediaDownloader:
+    FILE_ROW_HEIGHT = 110
+    
     def __init__(self):
-        self.config = Config()
-        self.download_queue = queue.Queue()
-        self.file_download_queue = queue.Queue()
-        self.active_downloads = {}
-        self.active_file_downloads = {}
-        self.download_items = []
-        self.file_items = []
+        # All downloading happens in the core; this window only displays and controls it
+        self.core = DownloadCore()
+        self.config = self.core.config
+        self.download_items = self.core.download_items
+        self.file_items = self.core.file_items
+        self.progress_bus = ProgressBus()
+        self.core.add_listener(self.on_core_event)
+        self.control_server = None
+        if self.config.config.get('api_enabled'):
+            try:
+                self.control_server = ControlServer(self.core, port=self.config.config['api_port']).start()
+            except OSError as e:
+                print(f"Control API not started: {e}")
+        self.last_stats_update = 0.0
         self.item_widgets = {}  # Track widgets for each download item
         self.file_item_widgets = {}
         
@@ -161,12 +58,7 @@ class SocialMediaDownloader:
         ctk.set_appearance_mode(self.config.config["theme"])
         
         self.setup_ui()
-        
-        self.worker_thread = threading.Thread(target=self.download_worker, daemon=True)
-        self.worker_thread.start()
-        
-        self.file_worker_thread = threading.Thread(target=self.file_download_worker, daemon=True)
-        self.file_worker_thread.start()
+        self.core.restore_queue()
         
         # Periodic UI updates
         self.update_ui_periodically()
@@ -174,6 +66,19 @@ class SocialMediaDownloader:
         self.root.bind('<Control-v>', self.paste_url)
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
     
+    def on_core_event(self, event, payload):
+        """Route core notifications (from worker threads) to the UI thread via the progress bus"""
+        if event in ('item', 'file') and payload is not None and payload.status in FINISHED_STATUSES:
+            self.progress_bus.publish('history', self.history_view.refresh)
+        if event == 'item':
+            self.progress_bus.publish(payload, self.update_item_widget, payload)
+        elif event == 'items':
+            self.progress_bus.publish('queue', self.update_queue_display)
+        elif event == 'file':
+            self.progress_bus.publish('files', self.update_file_display)
+        elif event == 'status':
+            self.progress_bus.publish('status', self.set_status, payload)
+    
     def setup_ui(self):
         self.root.grid_columnconfigure(0, weight=1)
         self.root.grid_rowconfigure(1, weight=1)
@@ -218,6 +123,13 @@ class SocialMediaDownloader:
         # File Downloader Tab
         self.setup_file_tab()
         
+        # History Tab, paged from the job store
+        history_tab = self.notebook.add("📋 History")
+        history_tab.grid_columnconfigure(0, weight=1)
+        history_tab.grid_rowconfigure(0, weight=1)
+        self.history_view = HistoryView(history_tab, self.core.job_store, open_path=self.open_path_location)
+        self.history_view.grid(row=0, column=0, sticky="nsew")
+        
         # Enhanced status bar
         status_frame = ctk.CTkFrame(self.root, height=40, corner_radius=10)
         status_frame.grid(row=2, column=0, sticky="ew", padx=15, pady=(0, 15))
@@ -256,6 +168,14 @@ class SocialMediaDownloader:
         ctk.CTkButton(button_frame, text="📋 Paste", width=80, height=35,
                      command=self.paste_url, corner_radius=6).pack(side="left", padx=(0, 5))
         
+        ctk.CTkButton(button_frame, text="📄 Import", width=80, height=35,
+                     command=self.import_url_file, corner_radius=6).pack(side="left", padx=(0, 5))
+        
+        # mp4 downloads video; the audio types fetch only the audio stream
+        self.format_var = ctk.StringVar(value=self.config.config['default_format'])
+        ctk.CTkOptionMenu(button_frame, variable=self.format_var, values=list(FORMAT_CHOICES), width=90, height=35,
+                          command=self.on_format_change).pack(side="left", padx=(0, 5))
+        
         ctk.CTkButton(button_frame, text="⬇️ Download", width=100, height=35,
                      command=self.handle_url, corner_radius=6,
                      fg_color=("green", "darkgreen"), hover_color=("darkgreen", "green")).pack(side="left")
@@ -315,9 +235,14 @@ class SocialMediaDownloader:
         ctk.CTkLabel(file_header, text="📂 File Downloads", 
                     font=ctk.CTkFont(size=16, weight="bold")).grid(row=0, column=0, sticky="w", padx=15, pady=15)
         
-        # File downloads list
-        self.file_scroll = ctk.CTkScrollableFrame(self.file_tab, corner_radius=12)
-        self.file_scroll.pack(fill="both", expand=True, padx=20, pady=10)
+        # File downloads list; only the rows in view exist as widgets
+        self.file_list = VirtualListView(self.file_tab, row_height=self.FILE_ROW_HEIGHT,
+                                         create_row=self.create_file_row,
+                                         bind_row=self.bind_file_row,
+                                         create_empty=self.create_file_empty_state,
+                                         corner_radius=12)
+        self.file_list.pack(fill="both", expand=True, padx=20, pady=10)
+        self.file_list.set_items(self.file_items)
     
     def create_download_item_widget(self, item: DownloadItem):
         """Create an enhanced widget for a download item"""
@@ -381,7 +306,11 @@ class SocialMediaDownloader:
             'title_label': title_label,
             'progress_bar': progress_bar,
             'status_label': status_label,
-            'button_frame': button_frame
+            'button_frame': button_frame,
+            'status': item.status,
+            'status_text': status_text,
+            'progress': item.progress,
+            'title': item.title
         }
         
         return frame
@@ -401,6 +330,10 @@ class SocialMediaDownloader:
             ctk.CTkButton(parent_frame, text="❌ Cancel", width=120, height=30,
                          command=lambda: self.cancel_download(item), corner_radius=6,
                          fg_color=("red", "darkred"), hover_color=("darkred", "red")).pack(pady=2)
+        elif item.status == "processing":
+            ctk.CTkButton(parent_frame, text="❌ Cancel", width=120, height=30,
+                         command=lambda: self.cancel_download(item), corner_radius=6,
+                         fg_color=("red", "darkred"), hover_color=("darkred", "red")).pack(pady=2)
         elif item.status == "paused":
             ctk.CTkButton(parent_frame, text="▶️ Resume", width=120, height=30,
                          command=lambda: self.resume_download(item), corner_radius=6,
@@ -431,59 +364,53 @@ class SocialMediaDownloader:
     
     def get_status_text(self, item):
         """Get status text for an item"""
+        details = " + ".join([f"{item.format_type.upper()} {item.quality}"] +
+                             [output['format_type'].upper() + (" clip" if output.get('start') or output.get('end') else "")
+                              for output in item.outputs])
+        if item.estimated_bytes:
+            details += f" • ~{format_size(item.estimated_bytes)}"
         if item.status == "pending":
-            return f"⏳ Queued • {item.format_type.upper()} {item.quality}"
+            return f"⏳ Queued • {details}"
         elif item.status == "downloading":
-            return f"⬇️ {item.progress:.1f}% • {item.speed_mbps():.2f} MB/s • {item.format_type.upper()} {item.quality}"
+            return f"⬇️ {item.progress:.1f}% • {item.speed_mbps():.2f} MB/s • {details}"
+        elif item.status == "processing":
+            return f"⚙️ Processing • {details}"
         elif item.status == "paused":
-            return f"⏸️ Paused at {item.progress:.1f}% • {item.format_type.upper()} {item.quality}"
+            return f"⏸️ Paused at {item.progress:.1f}% • {details}"
         elif item.status == "completed":
-            return f"✅ Completed • {item.format_type.upper()} {item.quality}"
+            return f"✅ Completed • {details}"
         elif item.status == "error":
             return f"❌ Error: {item.error_message[:50]}..."
         elif item.status == "cancelled":
-            return f"⭕ Cancelled • {item.format_type.upper()} {item.quality}"
+            return f"⭕ Cancelled • {details}"
         return "Unknown status"
     
     def pause_download(self, item):
         """Pause a specific download"""
-        item.pause()
+        self.core.pause(item)
         self.update_item_widget(item)
     
     def resume_download(self, item):
         """Resume a specific download"""
-        item.resume()
-        if item not in self.active_downloads and item.status != "completed":
-            self.download_queue.put(item)
+        self.core.resume(item)
         self.update_item_widget(item)
     
     def cancel_download(self, item):
         """Cancel a specific download"""
-        item.cancel()
-        if item in self.active_downloads:
-            del self.active_downloads[item]
+        self.core.cancel(item)
         self.update_item_widget(item)
     
     def retry_download(self, item):
         """Retry a failed/cancelled download"""
-        item.status = "pending"
-        item.progress = 0
-        item.error_message = ""
-        item.cancel_event.clear()
-        item.pause_event.set()
-        self.download_queue.put(item)
+        self.core.retry(item)
         self.update_item_widget(item)
     
     def remove_download(self, item):
         """Remove download from list"""
-        if item in self.download_items:
-            self.download_items.remove(item)
+        self.core.remove(item)
         if item in self.item_widgets:
             self.item_widgets[item]['frame'].destroy()
             del self.item_widgets[item]
-        if item in self.active_downloads:
-            item.cancel()
-            del self.active_downloads[item]
         self.update_empty_state()
     
     def pause_all_downloads(self):
@@ -506,17 +433,21 @@ class SocialMediaDownloader:
     
     def open_file_location(self, item):
         """Open file location in file explorer"""
-        if item.file_path and os.path.exists(item.file_path):
+        self.open_path_location(item.file_path)
+    
+    def open_path_location(self, file_path):
+        """Show `file_path` in the file explorer"""
+        if file_path and os.path.exists(file_path):
             import subprocess
             import platform
             
             try:
                 if platform.system() == "Windows":
-                    subprocess.run(["explorer", "/select,", item.file_path])
+                    subprocess.run(["explorer", "/select,", file_path])
                 elif platform.system() == "Darwin":  # macOS
-                    subprocess.run(["open", "-R", item.file_path])
+                    subprocess.run(["open", "-R", file_path])
                 else:  # Linux
-                    subprocess.run(["xdg-open", os.path.dirname(item.file_path)])
+                    subprocess.run(["xdg-open", os.path.dirname(file_path)])
             except Exception as e:
                 messagebox.showerror("Error", f"Could not open file location: {e}")
         else:
@@ -542,30 +473,38 @@ class SocialMediaDownloader:
             messagebox.showwarning("Warning", "Download folder does not exist")
     
     def update_item_widget(self, item):
-        """Update the widget for a specific item"""
+        """Update the widget for a specific item, touching only what changed"""
         if item in self.item_widgets:
             widgets = self.item_widgets[item]
             
             # Update progress bar
-            widgets['progress_bar'].set(item.progress / 100)
+            if widgets['progress'] != item.progress:
+                widgets['progress'] = item.progress
+                widgets['progress_bar'].set(item.progress / 100)
             
             # Update status text
             status_text = self.get_status_text(item)
-            widgets['status_label'].configure(text=status_text)
+            if widgets['status_text'] != status_text:
+                widgets['status_text'] = status_text
+                widgets['status_label'].configure(text=status_text)
             
             # Update title if it changed
-            if item.title and item.title != item.url:
+            if item.title and item.title != item.url and widgets['title'] != item.title:
+                widgets['title'] = item.title
                 title_text = item.title[:60] + ("..." if len(item.title) > 60 else "")
                 widgets['title_label'].configure(text=title_text)
             
-            # Update control buttons
-            self.create_control_buttons(widgets['button_frame'], item)
+            # Control buttons depend only on the status
+            if widgets['status'] != item.status:
+                widgets['status'] = item.status
+                self.create_control_buttons(widgets['button_frame'], item)
     
     def update_queue_display(self):
         """Update the entire queue display"""
         # Remove widgets for items that are no longer in the list
+        current = set(self.download_items)
         for item in list(self.item_widgets.keys()):
-            if item not in self.download_items:
+            if item not in current:
                 self.item_widgets[item]['frame'].destroy()
                 del self.item_widgets[item]
         
@@ -596,145 +535,171 @@ class SocialMediaDownloader:
             ctk.CTkLabel(empty_frame, text="Paste a URL above to start downloading", 
                         font=ctk.CTkFont(size=12), text_color=("gray60", "gray40")).pack()
     
-    def update_file_display(self):
-        """Update file downloads display with enhanced UI"""
-        for widget in self.file_scroll.winfo_children():
-            widget.destroy()
+    FILE_ICONS = {
+        '.pdf': '📄', '.doc': '📝', '.docx': '📝', '.txt': '📝',
+        '.jpg': '🖼️', '.jpeg': '🖼️', '.png': '🖼️', '.gif': '🖼️',
+        '.mp4': '🎬', '.avi': '🎬', '.mov': '🎬', '.mkv': '🎬',
+        '.mp3': '🎵', '.wav': '🎵', '.flac': '🎵',
+        '.zip': '🗜️', '.rar': '🗜️', '.7z': '🗜️',
+        '.exe': '⚙️', '.msi': '⚙️'
+    }
+    
+    # Button layout per file status: (text, handler name, fg_color, hover_color)
+    FILE_ROW_BUTTONS = {
+        "downloading": [("⏸️ Pause", "pause_file_download", None, None),
+                        ("❌ Cancel", "cancel_file_download", ("red", "darkred"), ("darkred", "red"))],
+        "paused": [("▶️ Resume", "resume_file_download", ("green", "darkgreen"), ("darkgreen", "green"))],
+        "completed": [("📂 Open", "open_file_location_file", None, None),
+                      ("🗑️ Remove", "remove_file_download", ("gray", "gray30"), ("gray30", "gray"))],
+        "error": [("🔄 Retry", "retry_file_download", ("orange", "darkorange"), ("darkorange", "orange"))],
+        "cancelled": [("🔄 Retry", "retry_file_download", ("orange", "darkorange"), ("darkorange", "orange"))],
+    }
+    
+    def create_file_empty_state(self, parent):
+        """Placeholder shown when there are no file downloads"""
+        empty_frame = ctk.CTkFrame(parent, corner_radius=15, height=200)
+        empty_frame.pack_propagate(False)
+        
+        ctk.CTkLabel(empty_frame, text="📁", font=ctk.CTkFont(size=48)).pack(pady=(40, 10))
+        ctk.CTkLabel(empty_frame, text="No file downloads yet", 
+                    font=ctk.CTkFont(size=18, weight="bold")).pack(pady=(0, 5))
+        ctk.CTkLabel(empty_frame, text="Enter a direct file URL above to start downloading", 
+                    font=ctk.CTkFont(size=12), text_color=("gray60", "gray40")).pack()
+        return empty_frame
+    
+    def create_file_row(self, parent):
+        """Build one reusable file row; bind_file_row fills it in for a given item"""
+        container = ctk.CTkFrame(parent, fg_color="transparent", height=self.FILE_ROW_HEIGHT)
+        container.pack_propagate(False)
         
-        if not self.file_items:
-            empty_frame = ctk.CTkFrame(self.file_scroll, corner_radius=15, height=200)
-            empty_frame.pack(fill="x", padx=20, pady=50)
-            empty_frame.pack_propagate(False)
-            
-            ctk.CTkLabel(empty_frame, text="📁", font=ctk.CTkFont(size=48)).pack(pady=(40, 10))
-            ctk.CTkLabel(empty_frame, text="No file downloads yet", 
-                        font=ctk.CTkFont(size=18, weight="bold")).pack(pady=(0, 5))
-            ctk.CTkLabel(empty_frame, text="Enter a direct file URL above to start downloading", 
-                        font=ctk.CTkFont(size=12), text_color=("gray60", "gray40")).pack()
-            return
+        frame = ctk.CTkFrame(container, corner_radius=10, border_width=1)
+        frame.pack(fill="both", expand=True, padx=5, pady=5)
+        frame.grid_columnconfigure(1, weight=1)
         
-        for item in self.file_items:
-            frame = ctk.CTkFrame(self.file_scroll, corner_radius=10, border_width=1)
-            frame.pack(fill="x", padx=5, pady=5)
-            frame.grid_columnconfigure(1, weight=1)
-            
-            # File icon
-            icon_frame = ctk.CTkFrame(frame, width=60, corner_radius=8)
-            icon_frame.grid(row=0, column=0, rowspan=2, sticky="ns", padx=10, pady=10)
-            icon_frame.grid_propagate(False)
-            
-            # Get file extension for appropriate icon
+        # File icon
+        icon_frame = ctk.CTkFrame(frame, width=60, corner_radius=8)
+        icon_frame.grid(row=0, column=0, rowspan=2, sticky="ns", padx=10, pady=10)
+        icon_frame.grid_propagate(False)
+        
+        icon_label = ctk.CTkLabel(icon_frame, text="📎", font=ctk.CTkFont(size=24))
+        icon_label.pack(pady=(15, 5))
+        ext_label = ctk.CTkLabel(icon_frame, text="FILE", font=ctk.CTkFont(size=9, weight="bold"),
+                                 text_color=("gray60", "gray40"))
+        ext_label.pack()
+        
+        # Content
+        content_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        content_frame.grid(row=0, column=1, sticky="ew", padx=(0, 10), pady=10)
+        content_frame.grid_columnconfigure(0, weight=1)
+        
+        filename_label = ctk.CTkLabel(content_frame, text="", font=ctk.CTkFont(size=13, weight="bold"),
+                                      anchor="w")
+        filename_label.grid(row=0, column=0, sticky="ew", pady=(0, 5))
+        
+        progress_frame = ctk.CTkFrame(content_frame, fg_color="transparent")
+        progress_frame.grid(row=1, column=0, sticky="ew")
+        progress_frame.grid_columnconfigure(0, weight=1)
+        
+        progress_bar = ctk.CTkProgressBar(progress_frame, height=8, corner_radius=4)
+        progress_bar.grid(row=0, column=0, sticky="ew", pady=(0, 5))
+        
+        status_label = ctk.CTkLabel(progress_frame, text="", font=ctk.CTkFont(size=11),
+                                    text_color=("gray60", "gray40"), anchor="w")
+        status_label.grid(row=1, column=0, sticky="w")
+        
+        # Control buttons; which ones are shown depends on the bound item's status
+        button_frame = ctk.CTkFrame(frame, fg_color="transparent", width=120)
+        button_frame.grid(row=0, column=2, rowspan=2, sticky="ns", padx=(0, 10), pady=10)
+        buttons = [ctk.CTkButton(button_frame, text="", width=100, height=30, corner_radius=6)
+                   for _ in range(2)]
+        
+        return {
+            'frame': container,
+            'icon_label': icon_label,
+            'ext_label': ext_label,
+            'filename_label': filename_label,
+            'progress_bar': progress_bar,
+            'status_label': status_label,
+            'buttons': buttons,
+            'shown': {},
+        }
+    
+    def bind_file_row(self, row, item):
+        """Show `item` in a recycled file row, touching only what changed"""
+        shown = row['shown']
+        
+        if shown.get('filename') != item.filename:
             file_ext = os.path.splitext(item.filename)[1].lower()
-            file_icons = {
-                '.pdf': '📄', '.doc': '📝', '.docx': '📝', '.txt': '📝',
-                '.jpg': '🖼️', '.jpeg': '🖼️', '.png': '🖼️', '.gif': '🖼️',
-                '.mp4': '🎬', '.avi': '🎬', '.mov': '🎬', '.mkv': '🎬',
-                '.mp3': '🎵', '.wav': '🎵', '.flac': '🎵',
-                '.zip': '🗜️', '.rar': '🗜️', '.7z': '🗜️',
-                '.exe': '⚙️', '.msi': '⚙️'
-            }
-            icon = file_icons.get(file_ext, '📎')
-            
-            ctk.CTkLabel(icon_frame, text=icon, font=ctk.CTkFont(size=24)).pack(pady=(15, 5))
-            ctk.CTkLabel(icon_frame, text=file_ext.upper() or 'FILE', 
-                        font=ctk.CTkFont(size=9, weight="bold"),
-                        text_color=("gray60", "gray40")).pack()
-            
-            # Content
-            content_frame = ctk.CTkFrame(frame, fg_color="transparent")
-            content_frame.grid(row=0, column=1, sticky="ew", padx=(0, 10), pady=10)
-            content_frame.grid_columnconfigure(0, weight=1)
-            
-            # Filename
+            row['icon_label'].configure(text=self.FILE_ICONS.get(file_ext, '📎'))
+            row['ext_label'].configure(text=file_ext.upper() or 'FILE')
             filename_text = item.filename if len(item.filename) <= 50 else item.filename[:47] + "..."
-            ctk.CTkLabel(content_frame, text=filename_text, font=ctk.CTkFont(size=13, weight="bold"),
-                        anchor="w").grid(row=0, column=0, sticky="ew", pady=(0, 5))
-            
-            # Progress
-            progress_frame = ctk.CTkFrame(content_frame, fg_color="transparent")
-            progress_frame.grid(row=1, column=0, sticky="ew")
-            progress_frame.grid_columnconfigure(0, weight=1)
-            
-            if item.status == "downloading" or item.progress > 0:
-                progress_bar = ctk.CTkProgressBar(progress_frame, height=8, corner_radius=4)
-                progress_bar.grid(row=0, column=0, sticky="ew", pady=(0, 5))
-                progress_bar.set(item.progress / 100)
-            
-            # Status
-            status_text = f"{item.status.title()}"
-            if item.status == "downloading":
-                status_text = f"⬇️ {item.progress:.1f}% • {item.speed_mbps():.2f} MB/s"
-            elif item.status == "completed":
-                status_text = "✅ Download completed"
-            elif item.status == "error":
-                status_text = f"❌ Error: {item.error_message[:30]}..."
-            elif item.status == "paused":
-                status_text = f"⏸️ Paused at {item.progress:.1f}%"
-            
-            ctk.CTkLabel(progress_frame, text=status_text, font=ctk.CTkFont(size=11),
-                        text_color=("gray60", "gray40"), anchor="w").grid(row=1, column=0, sticky="w")
-            
-            # Control buttons for file downloads
-            button_frame = ctk.CTkFrame(frame, fg_color="transparent", width=120)
-            button_frame.grid(row=0, column=2, rowspan=2, sticky="ns", padx=(0, 10), pady=10)
-            
-            if item.status == "downloading":
-                ctk.CTkButton(button_frame, text="⏸️ Pause", width=100, height=30,
-                             command=lambda i=item: self.pause_file_download(i), corner_radius=6).pack(pady=2)
-                ctk.CTkButton(button_frame, text="❌ Cancel", width=100, height=30,
-                             command=lambda i=item: self.cancel_file_download(i), corner_radius=6,
-                             fg_color=("red", "darkred"), hover_color=("darkred", "red")).pack(pady=2)
-            elif item.status == "paused":
-                ctk.CTkButton(button_frame, text="▶️ Resume", width=100, height=30,
-                             command=lambda i=item: self.resume_file_download(i), corner_radius=6,
-                             fg_color=("green", "darkgreen"), hover_color=("darkgreen", "green")).pack(pady=2)
-            elif item.status == "completed":
-                ctk.CTkButton(button_frame, text="📂 Open", width=100, height=30,
-                             command=lambda i=item: self.open_file_location_file(i), corner_radius=6).pack(pady=2)
-                ctk.CTkButton(button_frame, text="🗑️ Remove", width=100, height=30,
-                             command=lambda i=item: self.remove_file_download(i), corner_radius=6,
-                             fg_color=("gray", "gray30"), hover_color=("gray30", "gray")).pack(pady=2)
-            elif item.status == "error":
-                ctk.CTkButton(button_frame, text="🔄 Retry", width=100, height=30,
-                             command=lambda i=item: self.retry_file_download(i), corner_radius=6,
-                             fg_color=("orange", "darkorange"), hover_color=("darkorange", "orange")).pack(pady=2)
+            row['filename_label'].configure(text=filename_text)
+            shown['filename'] = item.filename
+        
+        has_progress = item.status == "downloading" or item.progress > 0
+        if shown.get('has_progress') != has_progress:
+            if has_progress:
+                row['progress_bar'].grid()
+            else:
+                row['progress_bar'].grid_remove()
+            shown['has_progress'] = has_progress
+        if has_progress and shown.get('progress') != item.progress:
+            row['progress_bar'].set(item.progress / 100)
+            shown['progress'] = item.progress
+        
+        status_text = f"{item.status.title()}"
+        if item.status == "downloading":
+            status_text = f"⬇️ {item.progress:.1f}% • {item.speed_mbps():.2f} MB/s"
+        elif item.status == "completed":
+            status_text = "✅ Download completed"
+        elif item.status == "error":
+            status_text = f"❌ Error: {item.error_message[:30]}..."
+        elif item.status == "paused":
+            status_text = f"⏸️ Paused at {item.progress:.1f}%"
+        if shown.get('status_text') != status_text:
+            row['status_label'].configure(text=status_text)
+            shown['status_text'] = status_text
+        
+        # Buttons capture the item, so rebind them when either changes
+        if shown.get('item') is not item or shown.get('status') != item.status:
+            layout = self.FILE_ROW_BUTTONS.get(item.status, [])
+            for button in row['buttons']:
+                button.pack_forget()
+            for button, (text, handler, fg_color, hover_color) in zip(row['buttons'], layout):
+                button.configure(text=text, command=lambda h=getattr(self, handler), i=item: h(i),
+                                 fg_color=fg_color or ctk.ThemeManager.theme["CTkButton"]["fg_color"],
+                                 hover_color=hover_color or ctk.ThemeManager.theme["CTkButton"]["hover_color"])
+                button.pack(pady=2)
+            shown['item'] = item
+            shown['status'] = item.status
+    
+    def update_file_display(self):
+        """Redraw the visible part of the file downloads list"""
+        self.file_list.refresh()
     
     def pause_file_download(self, item):
         """Pause a file download"""
-        item.pause()
+        self.core.pause_file(item)
         self.update_file_display()
     
     def resume_file_download(self, item):
         """Resume a file download"""
-        item.resume()
-        if item not in self.active_file_downloads:
-            self.file_download_queue.put(item)
+        self.core.resume_file(item)
         self.update_file_display()
     
     def cancel_file_download(self, item):
         """Cancel a file download"""
-        item.cancel()
-        if item in self.active_file_downloads:
-            del self.active_file_downloads[item]
+        self.core.cancel_file(item)
         self.update_file_display()
     
     def retry_file_download(self, item):
-        """Retry a failed file download"""
-        item.status = "pending"
-        item.progress = 0
-        item.error_message = ""
-        item.cancel_event.clear()
-        item.pause_event.set()
-        self.file_download_queue.put(item)
+        """Retry a failed file download, resuming from its journal if one exists"""
+        self.core.retry_file(item)
         self.update_file_display()
     
     def remove_file_download(self, item):
         """Remove file download from list"""
-        if item in self.file_items:
-            self.file_items.remove(item)
-        if item in self.active_file_downloads:
-            item.cancel()
-            del self.active_file_downloads[item]
+        self.core.remove_file(item)
         self.update_file_display()
     
     def open_file_location_file(self, item):
@@ -744,6 +709,12 @@ class SocialMediaDownloader:
     def paste_url(self, event=None):
         try:
             clipboard_text = self.root.clipboard_get()
+            # Several URLs at once go through bulk import
+            if clipboard_text and "Video" in self.notebook.get():
+                urls = parse_urls(clipboard_text)
+                if len(urls) > 1:
+                    self.start_bulk_import(urls)
+                    return "break"
             if clipboard_text and self.is_valid_url(clipboard_text):
                 current_tab = self.notebook.get()
                 if "Video" in current_tab:
@@ -762,6 +733,29 @@ class SocialMediaDownloader:
         except Exception:
             self.set_status("❌ Clipboard error")
     
+    def import_url_file(self):
+        """Bulk import URLs from a text or CSV file"""
+        path = filedialog.askopenfilename(
+            title="Import URLs",
+            filetypes=[("URL lists", "*.txt *.csv"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            urls = read_url_file(path)
+        except OSError as e:
+            messagebox.showerror("Import failed", str(e))
+            return
+        self.start_bulk_import(urls)
+    
+    def start_bulk_import(self, urls):
+        """Analyze new URLs in the background, then queue them all at once"""
+        count = self.core.start_bulk_import(urls)
+        if not count:
+            self.set_status("ℹ️ No new URLs to import")
+            return
+        self.set_status(f"🔍 Analyzing {count} URLs...")
+    
     def is_valid_url(self, url):
         try:
             result = urllib.parse.urlparse(url)
@@ -778,17 +772,14 @@ class SocialMediaDownloader:
         # Clear the URL entry
         self.url_entry.delete(0, 'end')
         
-        item = DownloadItem(
-            url=url, 
-            title=url, 
-            platform="Generic", 
-            quality=self.config.config['default_video_quality'], 
-            format_type="mp4"
-        )
-        self.download_items.append(item)
-        self.update_queue_display()
-        self.download_queue.put(item)
-        self.set_status(f"✅ Added to download queue")
+        # Playlists and channels are listed in the background, one item per entry
+        self.core.add_url(url)
+        self.set_status(f"🔍 Reading {url}")
+    
+    def on_format_change(self, format_type):
+        """Use the chosen format for URLs added from now on"""
+        self.config.config['default_format'] = format_type
+        self.config.save_config()
     
     def handle_file_url(self):
         url = self.file_url_entry.get().strip()
@@ -799,209 +790,26 @@ class SocialMediaDownloader:
         # Clear the URL entry
         self.file_url_entry.delete(0, 'end')
         
-        item = FileDownloadItem(url=url)
-        self.file_items.append(item)
+        item = self.core.add_file(url)
         self.update_file_display()
-        self.file_download_queue.put(item)
         self.set_status(f"✅ Added file download: {item.filename}")
     
-    def download_worker(self):
-        while True:
-            try:
-                item = self.download_queue.get(timeout=1)
-                if item.status in ('downloading', 'completed') or item.cancel_event.is_set():
-                    continue
-                
-                if len(self.active_downloads) >= self.config.config['max_concurrent']:
-                    self.download_queue.put(item)
-                    time.sleep(1)
-                    continue
-                
-                thread = threading.Thread(target=self.download_item, args=(item,), daemon=True)
-                self.active_downloads[item] = thread
-                thread.start()
-            except queue.Empty:
-                continue
-    
-    def file_download_worker(self):
-        while True:
-            try:
-                item = self.file_download_queue.get(timeout=1)
-                if item.status in ('downloading', 'completed') or item.cancel_event.is_set():
-                    continue
-                
-                thread = threading.Thread(target=self.file_download_item, args=(item,), daemon=True)
-                self.active_file_downloads[item] = thread
-                thread.start()
-            except queue.Empty:
-                continue
-    
-    def download_item(self, item: DownloadItem):
-        try:
-            if item.cancel_event.is_set():
-                return
-                
-            item.status = 'downloading'
-            self.root.after(0, lambda: self.update_item_widget(item))
-            
-            download_path = Path(self.config.config['download_path'])
-            if self.config.config['create_subfolders']:
-                download_path = download_path / item.platform.lower()
-            download_path.mkdir(parents=True, exist_ok=True)
-            
-            # Get video info first
-            with YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
-                try:
-                    info = ydl.extract_info(item.url, download=False)
-                    item.title = info.get('title', 'Unknown')[:100]
-                    item.platform = info.get('extractor_key', 'Generic')
-                    self.root.after(0, lambda: self.update_item_widget(item))
-                except Exception as e:
-                    if item.cancel_event.is_set():
-                        return
-            
-            safe_title = re.sub(r'[<>:"/\\|?*]', '', item.title)
-            if not safe_title:
-                safe_title = "download"
-            
-            def hook(d):
-                if item.cancel_event.is_set():
-                    return
-                
-                if d['status'] == 'downloading':
-                    # Handle pause/resume
-                    if not item.pause_event.is_set():
-                        item.status = "paused"
-                        self.root.after(0, lambda: self.update_item_widget(item))
-                        item.pause_event.wait()  # Block until resumed
-                        if item.cancel_event.is_set():
-                            return
-                        item.status = "downloading"
-                        self.root.after(0, lambda: self.update_item_widget(item))
-                    
-                    pct = d.get('_percent_str', '0%').replace('%', '')
-                    try:
-                        item.progress = float(pct)
-                    except:
-                        item.progress = 0
-                    item.speed = d.get('speed', 0) or 0
-                    self.root.after(0, lambda: self.update_item_widget(item))
-                elif d['status'] == 'finished':
-                    item.status = 'completed'
-                    item.progress = 100
-                    item.file_path = d.get('filename', '')
-                    self.root.after(0, lambda: self.update_item_widget(item))
-            
-            ydl_opts = {
-                "outtmpl": str(download_path / f"{safe_title}.%(ext)s"),
-                "progress_hooks": [hook],
-                "quiet": True,
-                "no_warnings": True,
-                "concurrent_fragment_downloads": 4,
-            }
-            
-            # Check for cancellation before starting download
-            if item.cancel_event.is_set():
-                return
-            
-            with YoutubeDL(ydl_opts) as ydl:
-                item.ydl_instance = ydl
-                ydl.download([item.url])
-                
-            if not item.cancel_event.is_set() and item.status != 'completed':
-                item.status = 'completed'
-                item.progress = 100
-                self.root.after(0, lambda: self.update_item_widget(item))
-                
-        except Exception as e:
-            if not item.cancel_event.is_set():
-                item.status = 'error'
-                item.error_message = str(e)
-                self.root.after(0, lambda: self.update_item_widget(item))
-        finally:
-            if item in self.active_downloads:
-                del self.active_downloads[item]
-    
-    def file_download_item(self, item: FileDownloadItem):
-        try:
-            if item.cancel_event.is_set():
-                return
-                
-            item.status = "downloading"
-            self.root.after(0, self.update_file_display)
-            
-            download_path = Path(self.config.config['download_path']) / "Files"
-            download_path.mkdir(parents=True, exist_ok=True)
-            target = download_path / item.filename
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            
-            with requests.get(item.url, stream=True, timeout=30, headers=headers) as r:
-                if item.cancel_event.is_set():
-                    return
-                    
-                r.raise_for_status()
-                total = int(r.headers.get('content-length', 0))
-                downloaded = 0
-                start = time.time()
-                
-                with open(target, "wb") as f:
-                    for chunk in r.iter_content(chunk_size=1024*64):
-                        if item.cancel_event.is_set():
-                            f.close()
-                            if target.exists():
-                                target.unlink()  # Delete partial file
-                            return
-                        
-                        # Handle pause
-                        if not item.pause_event.is_set():
-                            item.status = "paused"
-                            self.root.after(0, self.update_file_display)
-                            item.pause_event.wait()
-                            if item.cancel_event.is_set():
-                                f.close()
-                                if target.exists():
-                                    target.unlink()
-                                return
-                            item.status = "downloading"
-                            self.root.after(0, self.update_file_display)
-                        
-                        if not chunk:
-                            continue
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        if total > 0:
-                            item.progress = (downloaded / total) * 100
-                        elapsed = max(time.time() - start, 1e-3)
-                        item.speed = downloaded / elapsed
-                        self.root.after(0, self.update_file_display)
-            
-            if not item.cancel_event.is_set():
-                item.status = "completed"
-                item.file_path = str(target)
-                item.progress = 100
-                self.root.after(0, self.update_file_display)
-            
-        except Exception as e:
-            if not item.cancel_event.is_set():
-                item.status = "error"
-                item.error_message = str(e)
-                self.root.after(0, self.update_file_display)
-        finally:
-            if item in self.active_file_downloads:
-                del self.active_file_downloads[item]
-    
     def update_ui_periodically(self):
-        """Update UI elements periodically"""
-        # Update download statistics
-        active_count = len(self.active_downloads) + len(self.active_file_downloads)
-        total_count = len(self.download_items) + len(self.file_items)
-        self.stats_label.configure(text=f"Downloads: {total_count} • Active: {active_count}")
+        """Apply batched progress updates and refresh statistics"""
+        # Redraw each item that changed since the last tick, once
+        self.progress_bus.drain()
+        
+        # Update download statistics about once a second
+        now = time.time()
+        if now - self.last_stats_update >= 1.0:
+            self.last_stats_update = now
+            active_count = self.core.active_count()
+            total_count = len(self.download_items) + len(self.file_items)
+            self.stats_label.configure(text=f"Downloads: {total_count} • Active: {active_count}")
         
         # Schedule next update
-        self.root.after(1000, self.update_ui_periodically)
+        interval = int(1000 / max(1, self.config.config['ui_refresh_hz']))
+        self.root.after(interval, self.update_ui_periodically)
     
     def open_settings(self):
         settings = ctk.CTkToplevel(self.root)
@@ -1024,21 +832,42 @@ class SocialMediaDownloader:
                 ("download_path", "Download Path", "path"),
                 ("create_subfolders", "Create platform subfolders", "checkbox"),
                 ("max_concurrent", "Max concurrent downloads (1-5)", "slider"),
+                ("max_concurrent_files", "Max concurrent file downloads (1-10)", "slider", (1, 10)),
+                ("file_segments", "Connections per file download (1-8)", "slider", (1, 8)),
+                ("concurrent_fragments", "Connections per video download (1-8)", "slider", (1, 8)),
+                ("adaptive_concurrency", "Adapt downloads and connections to measured throughput", "checkbox"),
+                ("adaptive_max_concurrent", "Most concurrent downloads when adapting (1-16)", "slider", (1, 16)),
+                ("separate_postprocessing", "Merge and convert outside the download slots", "checkbox"),
+                ("streaming_merge", "Stream video and audio straight into the merged file", "checkbox"),
+                ("postprocess_workers", "Post-processing jobs at once (0 = one per CPU core)", "slider", (0, 16)),
+                ("file_engine", "File download engine (asyncio needs aiohttp)", "dropdown", ["threads", "asyncio"]),
+                ("max_download_rate_kbps", "Total download limit in KiB/s (0 = unlimited)", "number"),
+                ("max_item_rate_kbps", "Per-download limit in KiB/s (0 = unlimited)", "number"),
             ]),
             ("🎬 Video Settings", [
                 ("default_video_quality", "Default video quality", "dropdown", 
                  ["144p", "240p", "360p", "480p", "720p", "1080p", "1440p", "2160p"]),
+                ("default_format", "Default format (audio types skip the video stream)", "dropdown",
+                 list(FORMAT_CHOICES)),
                 ("default_audio_quality", "Default audio quality", "dropdown",
                  ["96kbps", "128kbps", "192kbps", "256kbps", "320kbps"]),
             ]),
             ("⚡ Behavior", [
                 ("instant_download", "Enable instant download (auto-download on paste)", "checkbox"),
+                ("skip_duplicates", "Skip items that were already downloaded", "checkbox"),
+                ("duplicate_action", "For already downloaded items", "dropdown", ["skip", "link"]),
+                ("use_download_archive", "Keep a yt-dlp download archive in the download folder", "checkbox"),
+                ("api_enabled", "Enable local control API (applies after restart)", "checkbox"),
             ]),
             ("🎨 Appearance", [
                 ("theme", "Theme", "dropdown", ["system", "light", "dark"]),
             ])
         ]
         
+        if not STREAMING_SUPPORTED:
+            sections = [(title, [setting for setting in settings_list if setting[0] != "streaming_merge"])
+                        for title, settings_list in sections]
+        
         settings_vars = {}
         
         for section_title, settings_list in sections:
@@ -1087,8 +916,9 @@ class SocialMediaDownloader:
                     slider_frame = ctk.CTkFrame(setting_frame, fg_color="transparent")
                     slider_frame.grid(row=0, column=1, sticky="ew")
                     
+                    low, high = setting[3] if len(setting) > 3 else (1, 5)
                     settings_vars[setting_key] = tk.IntVar(value=self.config.config[setting_key])
-                    slider = ctk.CTkSlider(slider_frame, from_=1, to=5, number_of_steps=4, 
+                    slider = ctk.CTkSlider(slider_frame, from_=low, to=high, number_of_steps=high - low, 
                                           variable=settings_vars[setting_key])
                     slider.pack(fill="x", pady=(0, 5))
                     
@@ -1100,6 +930,11 @@ class SocialMediaDownloader:
                     
                     slider.configure(command=update_slider_label)
                 
+                elif setting_type == "number":
+                    settings_vars[setting_key] = tk.IntVar(value=self.config.config[setting_key])
+                    ctk.CTkEntry(setting_frame, textvariable=settings_vars[setting_key],
+                                width=150).grid(row=0, column=1, sticky="e")
+                
                 elif setting_type == "dropdown":
                     options = setting[3]
                     settings_vars[setting_key] = tk.StringVar(value=self.config.config[setting_key])
@@ -1113,10 +948,17 @@ class SocialMediaDownloader:
         
         def save_settings():
             for key, var in settings_vars.items():
-                self.config.config[key] = var.get()
+                try:
+                    self.config.config[key] = var.get()
+                except tk.TclError:
+                    pass  # Not a number; keep the previous value
             
             # Apply theme change
             ctk.set_appearance_mode(self.config.config["theme"])
+            self.format_var.set(self.config.config["default_format"])
+            
+            # Start queued items right away if more slots are allowed now
+            self.core.apply_settings()
             
             self.config.save_config()
             self.set_status("✅ Settings saved successfully")
@@ -1140,6 +982,32 @@ class SocialMediaDownloader:
         ctk.CTkButton(button_frame, text="❌ Cancel", 
                      command=settings.destroy, height=40,
                      fg_color=("gray", "gray30"), hover_color=("gray30", "gray")).pack(side="right", padx=(15, 0), pady=15)
+        
+        ctk.CTkButton(button_frame, text="📥 Import Archive", width=130,
+                     command=self.import_archive_file, height=40).pack(side="left", padx=(15, 0), pady=15)
+        
+        ctk.CTkButton(button_frame, text="📤 Export Archive", width=130,
+                     command=self.export_archive_file, height=40).pack(side="left", padx=(10, 0), pady=15)
+    
+    def import_archive_file(self):
+        """Merge an existing yt-dlp download archive into the current folder's archive"""
+        path = filedialog.askopenfilename(title="Import download archive",
+                                          filetypes=[("Archive files", "*.txt"), ("All files", "*.*")])
+        if path:
+            try:
+                self.core.import_archive(path)
+            except OSError as e:
+                messagebox.showerror("Error", f"Could not import archive: {e}")
+    
+    def export_archive_file(self):
+        """Save the current folder's archive for use with yt-dlp --download-archive"""
+        path = filedialog.asksaveasfilename(title="Export download archive", defaultextension=".txt",
+                                            initialfile="archive.txt")
+        if path:
+            try:
+                self.core.export_archive(path)
+            except OSError as e:
+                messagebox.showerror("Error", f"Could not export archive: {e}")
     
     def set_status(self, message):
         self.status_label.configure(text=message)
@@ -1148,10 +1016,9 @@ class SocialMediaDownloader:
     def on_closing(self):
         """Handle application closing"""
         # Cancel all active downloads
-        for item in list(self.active_downloads.keys()):
-            item.cancel()
-        for item in list(self.active_file_downloads.keys()):
-            item.cancel()
+        if self.control_server:
+            self.control_server.stop()
+        self.core.close()
         
         self.root.destroy()
     
@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    """A scratch home directory, so settings and databases never touch the real ones"""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("USERPROFILE", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def core(home):
+    from downloader_core import DownloadCore
+
+    core = DownloadCore()
+    core.config.config.update(download_path=str(home / "out"), create_subfolders=False,
+                              use_download_archive=False)
+    yield core
+    core.close()
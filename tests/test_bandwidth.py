@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from bandwidth import BandwidthLimiter, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_spends_its_burst_then_paces_at_the_rate():
+    clock = Clock()
+    bucket = TokenBucket(1000, burst_seconds=0.5, clock=clock)
+    clock.now += 10  # Idle time only saves up the burst
+    assert bucket.reserve(500) == 0.0
+    assert bucket.reserve(1000) == 1.0
+    assert bucket.reserve(1000) == 2.0  # Debt accumulates across callers
+
+    clock.now += 3  # Pays off the debt, but saves up no more than the burst
+    assert bucket.reserve(1000) == 0.5
+
+
+def test_rate_change_applies_to_the_next_chunk():
+    clock = Clock()
+    bucket = TokenBucket(1000, burst_seconds=0, clock=clock)
+    assert bucket.reserve(1000) == 1.0
+    clock.now += 1
+    bucket.set_rate(4000)
+    assert bucket.reserve(2000) == 0.5
+    bucket.set_rate(0)
+    assert bucket.reserve(10 ** 9) == 0.0
+
+
+def test_limiter_uses_the_tighter_of_global_and_item_caps():
+    limiter = BandwidthLimiter(global_rate=10_000, item_rate=1000)
+    fast = SimpleNamespace(rate_limit=None)
+    capped = SimpleNamespace(rate_limit=500)
+    assert limiter.effective_rate(fast) == 1000
+    assert limiter.effective_rate(capped) == 500
+    assert limiter.effective_rate() == 10_000
@@ -0,0 +1,61 @@
+import threading
+
+import downloader_cli
+from benchmark import RangeServer
+from downloader_core import DownloadCore, DownloadItem, FileDownloadItem
+
+
+def store_paused_job(owner):
+    core = DownloadCore(owner=owner)
+    item = FileDownloadItem("http://127.0.0.1:9/never.bin", filename="never.bin")
+    item.pause()
+    core.job_store.save(item)
+    core.close()
+
+
+def test_one_shot_run_exits_with_a_paused_job_in_the_store(home):
+    store_paused_job("cli")
+    with RangeServer(b"x" * 4096) as server:
+        result = {}
+        run = threading.Thread(target=lambda: result.setdefault(
+            'code', downloader_cli.main(["--files", "--quiet", "-o", str(home / "out"), server.url])), daemon=True)
+        run.start()
+        run.join(timeout=15)
+    assert not run.is_alive()
+    assert result['code'] == 0
+    assert (home / "out" / "Files" / "file.bin").read_bytes() == b"x" * 4096
+
+
+def test_paused_items_do_not_block_wait_idle(core):
+    item = DownloadItem("https://example.com/v")
+    item.pause()
+    core.download_items.append(item)
+    assert core.is_idle()
+
+
+def test_front_ends_only_restore_their_own_jobs(home):
+    store_paused_job("core")
+    cli = DownloadCore(owner="cli")
+    assert cli.restore_queue() == 0
+    cli.close()
+    desktop = DownloadCore(owner="core")
+    assert desktop.restore_queue() == 1
+    desktop.close()
+
+
+def test_api_port_zero_is_honoured(home, monkeypatch):
+    ports = []
+
+    class FakeServer:
+        url = "http://127.0.0.1:0"
+
+        def __init__(self, core, port):
+            ports.append(port)
+
+        def start(self):
+            return self
+    monkeypatch.setattr(downloader_cli, "ControlServer", FakeServer)
+    monkeypatch.setattr(downloader_cli, "serve_forever", lambda core: None)
+
+    assert downloader_cli.main(["--daemon", "--api", "0", "-o", str(home / "out")]) == 0
+    assert ports == [0]
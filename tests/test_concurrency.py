@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+from concurrency import AdaptiveConcurrency, is_throttle_error
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def controller(clock, **kwargs):
+    options = dict(slots=2, fragments=2, max_slots=8, max_fragments=4, interval=2.0, hold_intervals=1)
+    options.update(kwargs)
+    return AdaptiveConcurrency(clock=clock, **options)
+
+
+def test_slots_double_while_throughput_grows_then_step_back():
+    control = controller(Clock())
+    assert control.update(1000, active=2) == (4, 2)
+    assert control.update(2000, active=4) == (8, 2)
+    assert control.update(2010, active=8) == (4, 2)  # No gain: undo the last step and hold
+    assert control.update(2000, active=4) == (4, 2)
+    assert control.update(2000, active=4) == (5, 2)  # Past slow start, probe one at a time
+
+
+def test_idle_slots_do_not_count_as_a_saturated_link():
+    control = controller(Clock())
+    assert control.update(1000, active=1) == (2, 2)
+
+
+def test_throttling_halves_once_per_interval():
+    clock = Clock()
+    control = controller(clock, slots=8, fragments=4)
+    control.report_throttled()
+    assert control.update(5000, active=8) == (4, 2)
+    assert control.connection_cap() == 31
+
+    control.report_throttled()  # Refused before the decrease took effect
+    clock.now += 1
+    assert control.update(5000, active=4) == (4, 2)
+
+    control.report_throttled()
+    clock.now += 2
+    assert control.update(5000, active=4) == (2, 1)
+
+
+def test_increase_stops_below_the_last_refusal():
+    clock = Clock()
+    control = controller(clock, slots=4, fragments=2, hold_intervals=0)
+    control.report_throttled()
+    assert control.update(1000, active=4) == (2, 1)  # Refused at 8 connections
+    for step in range(10):
+        clock.now += 2
+        slots, fragments = control.update(1000 * (step + 2), active=8)
+        assert slots * fragments < 8
+
+
+def test_throttle_errors_are_recognised():
+    assert is_throttle_error(SimpleNamespace(response=SimpleNamespace(status_code=429)))
+    assert is_throttle_error(SimpleNamespace(status=403))
+    assert is_throttle_error(Exception("ERROR: HTTP Error 429: Too Many Requests"))
+    assert not is_throttle_error(Exception("HTTP Error 404: Not Found"))
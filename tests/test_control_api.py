@@ -0,0 +1,19 @@
+import pytest
+import requests
+
+from control_api import ControlServer
+
+
+@pytest.fixture
+def api(core):
+    server = ControlServer(core, port=0, token="secret").start()
+    yield server
+    server.stop()
+
+
+@pytest.mark.parametrize("body", ['[]', '"https://example.com/v"', '42', 'null', '{"urls": "https://example.com/v"}'])
+def test_enqueue_rejects_bodies_that_are_not_url_objects(api, body):
+    response = requests.post(f"{api.url}/api/jobs", data=body, timeout=5,
+                             headers={"Authorization": "Bearer secret", "Content-Type": "application/json"})
+    assert response.status_code == 400
+    assert "error" in response.json()
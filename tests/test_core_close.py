@@ -0,0 +1,21 @@
+from benchmark import RangeServer
+from downloader_core import DownloadCore
+from test_file_cancel import wait_for
+
+
+def test_close_stops_transfers_before_closing_the_stores(home):
+    core = DownloadCore()
+    core.config.config.update(download_path=str(home / "out"), file_engine="threads")
+    with RangeServer(b"x" * 256 * 1024, rate_per_connection=32 * 1024) as server:
+        item = core.add_file(server.url)
+        wait_for(lambda: item.progress > 0)
+        core.close()
+        assert not core.active_file_downloads  # The transfer returned before close() did
+
+    # Recorded as it was running, not as the shutdown cancel left it
+    restarted = DownloadCore()
+    try:
+        assert [(job['id'], job['status']) for job in restarted.job_store.unfinished()] == [(item.id, 'downloading')]
+        assert list((home / "out" / "Files").glob("*.part.json"))  # Kept for the resume
+    finally:
+        restarted.close()
@@ -0,0 +1,38 @@
+from download_archive import DownloadArchive, archive_id
+
+
+def test_entries_survive_a_reopen_and_are_written_once(tmp_path):
+    path = tmp_path / "download-archive.txt"
+    archive = DownloadArchive(path, flush_interval=60)
+    archive.add("youtube abc")
+    archive.add("youtube abc")
+    archive.add_info({'extractor_key': 'Vimeo', 'id': '42'})
+    assert "youtube abc" in archive and archive.contains_info({'ie_key': 'Vimeo', 'id': '42'})
+    archive.close()
+
+    assert path.read_text().splitlines() == ["youtube abc", "vimeo 42"]
+    reopened = DownloadArchive(path, flush_interval=60)
+    try:
+        assert "youtube abc" in reopened and "vimeo 42" in reopened
+        assert "youtube other" not in reopened
+    finally:
+        reopened.close()
+
+
+def test_import_and_export_use_the_yt_dlp_format(tmp_path):
+    source = tmp_path / "yt-dlp-archive.txt"
+    source.write_text("youtube abc\n\nyoutube def\n")
+    archive = DownloadArchive(tmp_path / "download-archive.txt", flush_interval=60)
+    try:
+        archive.add("youtube abc")
+        assert archive.import_file(source) == 1
+        assert archive.export(tmp_path / "export.txt") == 2
+        assert (tmp_path / "export.txt").read_text() == "youtube abc\nyoutube def\n"
+    finally:
+        archive.close()
+
+
+def test_archive_id_needs_extractor_and_id():
+    assert archive_id({'extractor_key': 'Youtube', 'id': 'abc'}) == "youtube abc"
+    assert archive_id({'id': 'abc'}) is None
+    assert archive_id(None) is None
@@ -0,0 +1,37 @@
+from downloader_core import DownloadItem
+from duplicate_index import DuplicateIndex
+
+INFO = {'id': 'abc', 'extractor_key': 'Generic', 'webpage_url': 'https://example.com/abc'}
+
+
+def test_formats_of_one_video_are_kept_apart(tmp_path):
+    index = DuplicateIndex(tmp_path / "downloads.db")
+    audio = tmp_path / "clip.mp3"
+    audio.write_bytes(b"mp3")
+    index.add_video(INFO['webpage_url'], INFO, str(audio), 'mp3')
+
+    assert index.find_video(INFO['webpage_url'], INFO, 'mp3') == str(audio)
+    assert index.find_video(INFO['webpage_url'], INFO, 'mp4') is None
+    index.close()
+
+
+def test_video_request_after_audio_download_is_not_skipped(core, home):
+    audio = home / "clip.mp3"
+    audio.write_bytes(b"mp3")
+    core.duplicate_index.add_video(INFO['webpage_url'], INFO, str(audio), 'mp3')
+
+    item = DownloadItem(INFO['webpage_url'], format_type='mp4')
+    assert not core.skip_downloaded_video(item, INFO, home)
+    assert item.status == 'pending'
+    assert item.file_path == ''
+
+
+def test_audio_request_after_audio_download_is_skipped(core, home):
+    audio = home / "clip.mp3"
+    audio.write_bytes(b"mp3")
+    core.duplicate_index.add_video(INFO['webpage_url'], INFO, str(audio), 'mp3')
+
+    item = DownloadItem(INFO['webpage_url'], quality='192kbps', format_type='mp3')
+    assert core.skip_downloaded_video(item, INFO, home)
+    assert item.status == 'completed'
+    assert item.file_path.endswith('.mp3')
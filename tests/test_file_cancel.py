@@ -0,0 +1,35 @@
+import time
+
+import pytest
+
+from benchmark import RangeServer
+from downloader_core import DownloadCore
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.05)
+
+
+@pytest.mark.parametrize("engine", ["threads", "asyncio"])
+def test_cancelled_file_download_is_not_resumed_on_next_start(core, home, engine):
+    if engine == "asyncio":
+        pytest.importorskip("aiohttp")
+    core.config.config['file_engine'] = engine
+    with RangeServer(b"x" * 256 * 1024, rate_per_connection=32 * 1024) as server:
+        item = core.add_file(server.url)
+        wait_for(lambda: item.progress > 0)
+        core.cancel_file(item)
+        wait_for(lambda: not core.active_file_downloads)
+        time.sleep(0.2)  # Anything the stopped transfer still wrote would show up by now
+
+    files = home / "out" / "Files"
+    assert not list(files.glob("*.part")) and not list(files.glob("*.part.json"))
+    restarted = DownloadCore()
+    restarted.config.config.update(download_path=str(home / "out"))
+    try:
+        assert restarted.resume_unfinished_file_downloads() == 0
+    finally:
+        restarted.close()
@@ -0,0 +1,106 @@
+import os
+import threading
+from types import SimpleNamespace
+
+from benchmark import RangeServer
+from file_engine import RangeJournal, SegmentedDownloader, journal_path, part_path, split_missing
+
+SIZE = 512 * 1024
+
+
+def make_item():
+    item = SimpleNamespace(pause_event=threading.Event(), cancel_event=threading.Event())
+    item.pause_event.set()
+    return item
+
+
+def interrupt(server, target, after=128 * 1024):
+    """Start a segmented download and cancel it once `after` bytes arrived"""
+    item = make_item()
+
+    def progress(downloaded, total):
+        if downloaded >= after:
+            item.cancel_event.set()
+
+    engine = SegmentedDownloader(segments=2, min_segment_size=64 * 1024)
+    assert engine.download(server.url, target, item=item, progress_callback=progress) is False
+
+
+def resume(server, target):
+    """Finish the download; returns the byte count it started from"""
+    calls = []
+    engine = SegmentedDownloader(segments=2, min_segment_size=64 * 1024)
+    assert engine.download(server.url, target, progress_callback=lambda done, total: calls.append(done))
+    return calls[0]
+
+
+def test_split_missing_covers_exactly_the_gaps():
+    missing = [(0, 99), (200, 499)]
+    ranges = split_missing(missing, 4, min_segment_size=10)
+
+    assert len(ranges) == 4
+    covered = sorted(b for start, end in ranges for b in range(start, end + 1))
+    assert covered == list(range(0, 100)) + list(range(200, 500))
+
+
+def test_journal_round_trip(tmp_path):
+    target = tmp_path / "file.bin"
+    journal = RangeJournal(target)
+    journal.url, journal.size, journal.etag = "http://example.com/file.bin", 1000, '"a"'
+    journal.add(0, 99)
+    journal.add(300, 399)
+    journal.add(100, 199)
+    journal.save()
+
+    loaded = RangeJournal.load(target)
+    assert loaded.ranges == [(0, 199), (300, 399)]
+    assert loaded.missing() == [(200, 299), (400, 999)]
+    assert loaded.completed_bytes() == 300
+
+
+def test_interrupted_download_resumes_from_the_journal(tmp_path):
+    payload = os.urandom(SIZE)
+    target = tmp_path / "file.bin"
+    with RangeServer(payload, rate_per_connection=128 * 1024) as server:
+        interrupt(server, target)
+        saved = RangeJournal.load(target).completed_bytes()
+        assert 0 < saved < SIZE and part_path(target).exists()
+
+        server.rate = 0
+        assert resume(server, target) == saved
+
+    assert target.read_bytes() == payload
+    assert not part_path(target).exists() and not journal_path(target).exists()
+
+
+def test_changed_etag_restarts_from_zero(tmp_path):
+    target = tmp_path / "file.bin"
+    with RangeServer(os.urandom(SIZE), rate_per_connection=128 * 1024) as server:
+        interrupt(server, target)
+        assert RangeJournal.load(target).completed_bytes() > 0
+
+        server.rate = 0
+        server.payload = os.urandom(SIZE)
+        server.etag = '"changed"'
+        assert resume(server, target) == 0
+
+    assert target.read_bytes() == server.payload
+
+
+def test_server_without_ranges_falls_back_to_one_stream(tmp_path):
+    payload = os.urandom(SIZE)
+    target = tmp_path / "file.bin"
+    # Leftovers of an earlier ranged attempt must not be trusted
+    part_path(target).write_bytes(b"\0" * SIZE)
+    journal = RangeJournal(target)
+    journal.size, journal.etag = SIZE, '"bench"'
+    journal.add(0, SIZE // 2)
+    journal.save()
+
+    with RangeServer(payload, accept_ranges=False) as server:
+        engine = SegmentedDownloader(segments=4, min_segment_size=64 * 1024)
+        assert not engine.probe(server.url).accepts_ranges
+        assert resume(server, target) == 0
+
+    assert target.read_bytes() == payload
+    assert not part_path(target).exists() and not journal_path(target).exists()
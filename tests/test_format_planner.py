@@ -0,0 +1,61 @@
+import pytest
+
+from format_planner import FormatPlan, plan_download, result_audio_codec, ydl_format_options
+
+INFO = {'duration': 60, 'formats': [
+    {'format_id': 'v', 'vcodec': 'vp09.00.40.08', 'acodec': 'none', 'height': 720, 'filesize': 5_000_000},
+    {'format_id': 'a', 'vcodec': 'none', 'acodec': 'opus', 'abr': 130, 'filesize': 900_000},
+]}
+MUXED = {'duration': 60, 'formats': [
+    {'format_id': 'm', 'vcodec': 'avc1.4d401f', 'acodec': 'mp4a.40.2', 'height': 360, 'filesize': 3_000_000},
+]}
+
+
+@pytest.mark.parametrize("format_type, codec", [
+    ('mp3', 'mp3'),  # Always converted to mp3
+    ('m4a', 'mp4a'),  # Converted to AAC unless it already was
+    ('opus', 'opus'),
+    ('audio', 'opus'),  # Kept as the site serves it
+    ('mp4', 'opus'),  # The audio stream of the video + audio pair
+])
+def test_result_audio_codec_of_each_output_kind(format_type, codec):
+    plan = plan_download(INFO, '720p' if format_type == 'mp4' else '192kbps', format_type)
+    assert result_audio_codec(format_type, plan) == codec
+
+
+def test_result_audio_codec_of_a_muxed_video():
+    assert result_audio_codec('mp4', plan_download(MUXED, '720p', 'mp4')) == 'mp4a'
+
+
+def test_result_audio_codec_without_a_concrete_plan():
+    assert result_audio_codec('mp4', FormatPlan("bv*+ba/b")) is None
+    assert result_audio_codec('audio', FormatPlan("ba/b")) is None
+
+
+def test_lower_frame_rate_wins_when_sizes_are_unknown():
+    info = {'formats': [
+        {'format_id': 'v60', 'vcodec': 'avc1', 'acodec': 'none', 'height': 720, 'fps': 60},
+        {'format_id': 'v30', 'vcodec': 'avc1', 'acodec': 'none', 'height': 720, 'fps': 30},
+        {'format_id': 'a', 'vcodec': 'none', 'acodec': 'mp4a.40.2', 'abr': 128},
+    ]}
+    plan = plan_download(info, '720p')
+    assert [stream.format_id for stream in plan.streams] == ['v30', 'a']
+
+
+def test_size_still_decides_before_frame_rate():
+    info = {'formats': [
+        {'format_id': 'v60', 'vcodec': 'av01', 'acodec': 'none', 'height': 720, 'fps': 60, 'filesize': 4_000_000},
+        {'format_id': 'v30', 'vcodec': 'avc1', 'acodec': 'none', 'height': 720, 'fps': 30, 'filesize': 6_000_000},
+        {'format_id': 'a', 'vcodec': 'none', 'acodec': 'opus', 'abr': 128, 'filesize': 1_000_000},
+    ]}
+    plan = plan_download(info, '720p')
+    assert [stream.format_id for stream in plan.streams] == ['v60', 'a']
+
+
+def test_ydl_format_options_merge_video_and_convert_audio():
+    plan = plan_download(INFO, '720p', 'mkv')
+    assert ydl_format_options(plan, 'mkv', '720p') == {'format': plan.format_spec, 'merge_output_format': 'mkv'}
+
+    audio = ydl_format_options(plan_download(INFO, '192kbps', 'mp3'), 'mp3', '192kbps')
+    assert 'merge_output_format' not in audio
+    assert audio['postprocessors'][0]['preferredcodec'] == 'mp3'
@@ -0,0 +1,48 @@
+from downloader_core import DownloadCore, DownloadItem
+from job_store import JobStore
+
+
+def test_unfinished_jobs_are_restored_by_their_owner_only(tmp_path):
+    path = tmp_path / "jobs.db"
+    gui, cli = JobStore(path, owner="main"), JobStore(path, owner="cli")
+    try:
+        mine, theirs, done = (DownloadItem(f"https://example.com/{n}") for n in range(3))
+        done.status = "completed"
+        gui.save_many([mine, done])
+        cli.save(theirs)
+
+        assert [job['id'] for job in gui.unfinished()] == [mine.id]
+        assert [job['id'] for job in cli.unfinished()] == [theirs.id]
+        assert [job['id'] for job in cli.history()] == [done.id]  # History is shared
+    finally:
+        gui.close()
+        cli.close()
+
+
+def test_core_restores_its_own_queue_with_paused_items_kept_paused(home):
+    first = DownloadCore(owner="cli")
+    try:
+        first.config.config.update(download_path=str(home / "out"), max_concurrent=1)
+        running, paused = DownloadItem("https://example.com/a", title="a"), DownloadItem("https://example.com/b")
+        paused.priority = 3
+        paused.pause()
+        first.job_store.save_many([running, paused])
+    finally:
+        first.close()
+
+    other = DownloadCore(owner="main")
+    try:
+        assert other.job_store.unfinished() == []
+    finally:
+        other.close()
+
+    restored = DownloadCore(owner="cli")
+    restored.scheduler.run = lambda item: None
+    try:
+        restored.restore_queue()
+        items = {item.id: item for item in restored.download_items}
+        assert set(items) == {running.id, paused.id}
+        assert items[paused.id].status == "paused" and items[paused.id].priority == 3
+        assert items[running.id].title == "a"
+    finally:
+        restored.close()
@@ -0,0 +1,31 @@
+from yt_dlp.extractor.generic import GenericIE
+
+from benchmark import RangeServer
+from metadata_cache import MetadataCache
+from playlist_expander import PlaylistExpander
+
+
+def test_single_video_url_is_extracted_once(home, monkeypatch):
+    calls = []
+    real_extract = GenericIE._real_extract
+
+    def counting_extract(self, url):
+        calls.append(url)
+        return real_extract(self, url)
+    monkeypatch.setattr(GenericIE, "_real_extract", counting_extract)
+
+    cache = MetadataCache(path=home / "metadata.db")
+    expander = PlaylistExpander(cache)
+    entries, resolved = [], []
+    with RangeServer(b"\0" * 4096, content_type="video/mp4", path="/clip.mp4") as server:
+        count = expander.expand(server.url,
+                                lambda url, title, info: entries.append((url, info)) or url,
+                                lambda item, info: resolved.append((item, info)))
+    expander.close()
+
+    assert count == 1
+    assert len(calls) == 1
+    [(url, info)] = entries
+    assert url == server.url and info is not None
+    assert resolved == [(server.url, info)]
+    assert cache.get(server.url) is not None
@@ -0,0 +1,63 @@
+import sys
+import threading
+import pytest
+
+from postprocess import PostProcessError, PostProcessPool
+
+
+class Item:
+    def __init__(self):
+        self.cancel_event = threading.Event()
+
+
+def python(code):
+    """A stand-in for an ffmpeg command"""
+    return [sys.executable, "-c", code]
+
+
+def run(pool, item, args, outputs, sources=()):
+    """Submit a job and return the future its done callback was called with"""
+    called = []
+    done = threading.Event()
+
+    def callback(future):
+        called.append(future)
+        done.set()
+    pool.submit(item, args, outputs, sources).add_done_callback(callback)
+    assert done.wait(30)
+    return called[0]
+
+
+@pytest.fixture
+def pool():
+    pool = PostProcessPool(2)
+    yield pool
+    pool.close()
+
+
+def test_completion_moves_parts_into_place_and_removes_sources(pool, tmp_path):
+    source, part, target = tmp_path / "video.f137.mp4", tmp_path / "clip.part.mp4", tmp_path / "clip.mp4"
+    source.write_bytes(b"stream")
+    future = run(pool, Item(), python(f"open({str(part)!r}, 'w').write('done')"),
+                 [(str(part), str(target))], [str(source)])
+
+    assert future.result() == [str(target)]
+    assert target.read_text() == "done" and not part.exists() and not source.exists()
+
+
+def test_failure_reports_the_last_error_line_and_keeps_sources(pool, tmp_path):
+    source, part, target = tmp_path / "video.f137.mp4", tmp_path / "clip.part.mp4", tmp_path / "clip.mp4"
+    source.write_bytes(b"stream")
+    code = f"import sys; open({str(part)!r}, 'w'); sys.exit('first\\nInvalid data found')"
+    future = run(pool, Item(), python(code), [(str(part), str(target))], [str(source)])
+
+    with pytest.raises(PostProcessError, match="Invalid data found"):
+        future.result()
+    assert source.exists() and not part.exists() and not target.exists()
+
+
+def test_cancelled_item_resolves_to_none(pool, tmp_path):
+    item = Item()
+    item.cancel_event.set()
+    future = run(pool, item, python("raise SystemExit(1)"), [])
+    assert future.result() is None
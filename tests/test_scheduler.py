@@ -0,0 +1,70 @@
+import threading
+import time
+
+from downloader_core import DownloadItem
+from scheduler import DownloadScheduler
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+class Recorder:
+    """run() callback that logs each item and blocks until released"""
+    def __init__(self):
+        self.started = []
+        self.release = threading.Event()
+
+    def __call__(self, item):
+        self.started.append(item)
+        self.release.wait(10)
+
+
+def test_higher_priority_starts_first_and_equal_priorities_keep_fifo():
+    run = Recorder()
+    scheduler = DownloadScheduler(run, 1)
+    scheduler.submit("blocker")
+    wait_for(lambda: run.started)
+    for name, priority in [("low", 0), ("high", 5), ("low2", 0), ("mid", 1)]:
+        scheduler.submit(name, priority)
+
+    run.release.set()
+    assert scheduler.wait_idle(10)
+    assert run.started == ["blocker", "high", "mid", "low", "low2"]
+
+
+def test_reprioritize_moves_a_waiting_item_ahead():
+    run = Recorder()
+    scheduler = DownloadScheduler(run, 1)
+    scheduler.submit("blocker")
+    wait_for(lambda: run.started)
+    scheduler.submit_many(["a", "b"])
+    assert scheduler.reprioritize("b", 10)
+
+    run.release.set()
+    assert scheduler.wait_idle(10)
+    assert run.started == ["blocker", "b", "a"]
+
+
+def test_item_paused_while_queued_waits_for_resume(core):
+    run = Recorder()
+    core.scheduler.run = run
+    core.scheduler.max_concurrent = 1
+    blocker, queued, other = (DownloadItem(f"https://example.com/{n}") for n in range(3))
+    core.scheduler.submit(blocker)
+    wait_for(lambda: run.started)
+    core.scheduler.submit_many([queued, other])
+    core.pause(queued)
+
+    run.release.set()
+    wait_for(lambda: other in run.started)
+    time.sleep(0.1)
+    assert queued not in run.started and core.scheduler.is_queued(queued)
+
+    core.resume(queued)
+    assert queued.status in ("pending", "downloading")
+    wait_for(lambda: queued in run.started)
+    assert run.started == [blocker, other, queued]
@@ -0,0 +1,34 @@
+import pytest
+
+import stream_merge
+from downloader_core import DownloadItem
+from format_planner import plan_download
+
+FORMATS = [
+    {'format_id': 'v', 'url': 'http://127.0.0.1:9/v.mp4', 'protocol': 'http', 'ext': 'mp4',
+     'vcodec': 'avc1', 'acodec': 'none', 'height': 360, 'filesize': 1000},
+    {'format_id': 'a', 'url': 'http://127.0.0.1:9/a.m4a', 'protocol': 'http', 'ext': 'm4a',
+     'vcodec': 'none', 'acodec': 'mp4a.40.2', 'abr': 128, 'filesize': 500},
+]
+
+
+@pytest.fixture
+def no_fd_passing(monkeypatch):
+    monkeypatch.setattr(stream_merge, "STREAMING_SUPPORTED", False)
+
+
+def test_nothing_is_streamed_without_fd_passing(no_fd_passing):
+    assert not stream_merge.can_stream(FORMATS)
+    with pytest.raises(stream_merge.StreamMergeError):
+        stream_merge.StreamMerger().merge(FORMATS[0], FORMATS[1], "out.mp4", DownloadItem("u"))
+
+
+def test_core_downloads_the_usual_way_without_fd_passing(no_fd_passing, core, home, monkeypatch):
+    monkeypatch.setattr(core.postprocess, "available", lambda: True)
+    core.config.config['streaming_merge'] = True
+    info = {'id': 'x', 'formats': FORMATS}
+    item = DownloadItem("https://example.com/x")
+    plan = plan_download(info, "720p", "mp4")
+    assert len(plan.streams) == 2
+    assert not core.streaming_merge(item, info, plan, home / "x", None)
+    assert item.status == 'pending'
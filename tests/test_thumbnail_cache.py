@@ -0,0 +1,40 @@
+import json
+import threading
+from io import BytesIO
+
+from PIL import Image
+
+from benchmark import RangeServer
+from thumbnail_cache import ThumbnailCache
+
+
+def png(color):
+    buffer = BytesIO()
+    Image.new("RGB", (320, 180), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def load(cache, url):
+    loaded = {}
+    done = threading.Event()
+    cache.get_thumbnail(url, lambda url, image: (loaded.setdefault('image', image), done.set()))
+    assert done.wait(10)
+    return loaded['image']
+
+
+def test_index_is_written_in_batches_and_on_close(tmp_path):
+    cache = ThumbnailCache(tmp_path, flush_interval=60)
+    with RangeServer(png("red"), content_type="image/png", path="/a.png") as server:
+        urls = [f"{server.url}?n={n}" for n in range(3)]
+        for url in urls:
+            assert load(cache, url) is not None
+        assert not (tmp_path / "index.json").exists()  # Nothing written per fetch
+    cache.close()
+
+    assert set(json.loads((tmp_path / "index.json").read_text())) == set(urls)
+    reopened = ThumbnailCache(tmp_path, flush_interval=60)
+    try:
+        assert load(reopened, urls[0]).size == (120, 68)  # From disk; the server is gone
+        assert reopened.flush() is False
+    finally:
+        reopened.close()
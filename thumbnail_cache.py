@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Thumbnail cache
+Fetches and resizes thumbnails on a small worker pool, keeps recently used
+decoded images in a bounded LRU, and stores the resized files on disk by
+content hash so a relaunch never refetches them. The index of those files
+is written by a background thread in batches, not once per fetch.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+import requests
+from PIL import Image, features
+
+DEFAULT_SIZE = (120, 90)
+
+# Decoded images kept in memory; each is at most DEFAULT_SIZE pixels
+MAX_MEMORY_IMAGES = 128
+
+FETCH_WORKERS = 3
+FETCH_TIMEOUT = 10
+FLUSH_INTERVAL = 2.0
+
+# WebP is smaller at equal quality; fall back to JPEG if Pillow lacks it
+DISK_FORMAT, DISK_EXT = ("WEBP", ".webp") if features.check("webp") else ("JPEG", ".jpg")
+
+
+class ThumbnailCache:
+    """Non-blocking thumbnail loader with memory and disk caches"""
+    def __init__(self, cache_dir=None, size=DEFAULT_SIZE, max_images=MAX_MEMORY_IMAGES,
+                 workers=FETCH_WORKERS, flush_interval=FLUSH_INTERVAL):
+        self.cache_dir = Path(cache_dir) if cache_dir else Path.home() / ".social_downloader" / "thumbnails"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.cache_dir / "index.json"
+        self.size = size
+        self.max_images = max(1, max_images)
+        self.lock = threading.Lock()
+        self.images = OrderedDict()  # url -> PIL image, most recently used last
+        self.waiting = {}  # url -> callbacks of requests in flight
+        self.index = self._load_index()  # url -> content hash of the file on disk
+        self.dirty = False  # The index has entries index.json lacks
+        self.session = requests.Session()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self.flush_interval = flush_interval
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self._writer, name="thumbnail-index", daemon=True)
+        self.thread.start()
+
+    def _load_index(self):
+        try:
+            with open(self.index_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        """Write the index atomically; caller holds the lock"""
+        tmp = self.index_file.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp, self.index_file)
+
+    def flush(self):
+        """Write the index if it changed since the last write; True if it did"""
+        with self.lock:
+            if not self.dirty:
+                return False
+            self._save_index()
+            self.dirty = False
+        return True
+
+    def _writer(self):
+        while not self.closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Error saving thumbnail index: {e}")
+
+    def object_path(self, digest):
+        return self.cache_dir / digest[:2] / (digest + DISK_EXT)
+
+    def get_thumbnail(self, url, callback):
+        """
+        Return the decoded image for `url` if it is in memory. Otherwise
+        return None and load it in the background, then call
+        `callback(url, image)` from a worker thread; `image` is None if the
+        thumbnail could not be loaded.
+        """
+        with self.lock:
+            if url in self.images:
+                self.images.move_to_end(url)
+                return self.images[url]
+            if url in self.waiting:
+                self.waiting[url].append(callback)
+                return None
+            self.waiting[url] = [callback]
+        self.executor.submit(self._load, url)
+        return None
+
+    def _load(self, url):
+        try:
+            image = self._load_from_disk(url) or self._fetch(url)
+        except Exception as e:
+            print(f"Error loading thumbnail: {e}")
+            image = None
+
+        with self.lock:
+            if image is not None:
+                self.images[url] = image
+                self.images.move_to_end(url)
+                while len(self.images) > self.max_images:
+                    self.images.popitem(last=False)
+            callbacks = self.waiting.pop(url, [])
+        for callback in callbacks:
+            callback(url, image)
+
+    def _load_from_disk(self, url):
+        with self.lock:
+            digest = self.index.get(url)
+        if not digest:
+            return None
+        try:
+            image = Image.open(self.object_path(digest))
+            image.load()
+            return image
+        except OSError:
+            return None
+
+    def _fetch(self, url):
+        response = self.session.get(url, timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+
+        image = Image.open(BytesIO(response.content))
+        image.thumbnail(self.size, Image.Resampling.LANCZOS)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        buffer = BytesIO()
+        image.save(buffer, DISK_FORMAT, quality=85)
+        data = buffer.getvalue()
+        digest = hashlib.sha256(data).hexdigest()
+
+        path = self.object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        with self.lock:
+            self.index[url] = digest
+            self.dirty = True
+        return image
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+        self.closed.set()
+        self.thread.join(timeout=5)
+        self.flush()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Virtualized list widget
+Only the rows inside the viewport exist as widgets; they are recycled and
+rebound to other items while scrolling, so memory and redraw cost stay
+constant no matter how many items the list holds.
+"""
+
+import sys
+
+import customtkinter as ctk
+
+
+class VirtualListView(ctk.CTkFrame):
+    """Fixed-row-height list that materializes widgets for visible rows only"""
+    def __init__(self, master, row_height, create_row, bind_row, create_empty=None, **kwargs):
+        """
+        `create_row(parent)` builds one reusable row and returns a dict whose
+        'frame' entry is the row's container (created with height=row_height).
+        `bind_row(row, item)` shows `item` in an existing row.
+        `create_empty(parent)` optionally builds the widget shown when empty.
+        """
+        super().__init__(master, **kwargs)
+        self.row_height = row_height
+        self.create_row = create_row
+        self.bind_row = bind_row
+        self.items = []
+        self.rows = []
+        self.offset = 0
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(0, weight=1)
+
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.grid(row=0, column=0, sticky="nsew", padx=(5, 0), pady=5)
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.grid(row=0, column=1, sticky="ns", padx=(0, 3), pady=5)
+
+        self.empty_widget = create_empty(self.body) if create_empty else None
+
+        self.body.bind("<Configure>", lambda e: self.refresh())
+        # The wheel is bound on a tag of this list's own widgets, never with bind_all, so the
+        # global handlers of other scrollable frames stay in place
+        self.wheel_tag = f"VirtualListWheel{id(self)}"
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.bind_class(self.wheel_tag, sequence, self._on_wheel)
+        self._tag_wheel(self)
+
+    def set_items(self, items):
+        """Show `items` (kept by reference, so appends/removes appear on refresh)"""
+        self.items = items
+        self.refresh()
+
+    def _viewport_height(self):
+        """Viewport height in unscaled units, the same units as row_height and place()"""
+        return max(self.body.winfo_height() / self._get_widget_scaling(), 1)
+
+    def refresh(self):
+        """Rebind the visible rows to the items currently scrolled into view"""
+        total = len(self.items)
+        view = self._viewport_height()
+        content = total * self.row_height
+        self.offset = int(min(max(self.offset, 0), max(content - view, 0)))
+
+        first = self.offset // self.row_height
+        visible = min(total - first, int(view // self.row_height) + 2)
+
+        # Grow the pool up to what the viewport needs; it never exceeds that
+        while len(self.rows) < visible:
+            row = self.create_row(self.body)
+            row['item'] = None
+            self._tag_wheel(row['frame'])
+            self.rows.append(row)
+
+        for position, row in enumerate(self.rows):
+            index = first + position
+            if position < visible:
+                item = self.items[index]
+                row['item'] = item
+                self.bind_row(row, item)
+                row['frame'].place(x=0, y=index * self.row_height - self.offset, relwidth=1)
+            elif row['item'] is not None:
+                row['item'] = None
+                row['frame'].place_forget()
+
+        if self.empty_widget is not None:
+            if total:
+                self.empty_widget.place_forget()
+            else:
+                self.empty_widget.place(relx=0.5, rely=0.4, anchor="center", relwidth=0.9)
+
+        if content > 0:
+            self.scrollbar.set(self.offset / content, min((self.offset + view) / content, 1.0))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def refresh_item(self, item):
+        """Redraw `item` if it is currently visible"""
+        for row in self.rows:
+            if row['item'] is item:
+                self.bind_row(row, item)
+
+    def scroll_to(self, offset):
+        self.offset = offset
+        self.refresh()
+
+    def yview(self, *args):
+        """Scrollbar protocol: ('moveto', fraction) or ('scroll', n, 'units'|'pages')"""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * len(self.items) * self.row_height)
+        elif args[0] == "scroll":
+            step = self.row_height if args[2] == "units" else self._viewport_height()
+            self.scroll_to(self.offset + int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4:
+            units = -1
+        elif getattr(event, "num", None) == 5:
+            units = 1
+        elif sys.platform == "darwin":
+            units = -event.delta
+        else:
+            units = -int(event.delta / 120)
+        self.yview("scroll", units, "units")
+        return "break"  # An enclosing scrollable frame must not scroll as well
+
+    def _tag_wheel(self, widget):
+        """Route wheel events over `widget` and everything inside it to this list"""
+        tags = widget.bindtags()
+        if self.wheel_tag not in tags:
+            widget.bindtags((self.wheel_tag,) + tags)
+        for child in widget.winfo_children():
+            self._tag_wheel(child)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+In-process yt-dlp engine
+Keeps a pool of long-lived yt_dlp.YoutubeDL instances so extraction and
+downloads do not pay interpreter start-up and extractor import per call.
+"""
+
+import json
+import threading
+from contextlib import contextmanager
+
+try:
+    from yt_dlp import YoutubeDL
+    from yt_dlp.networking.exceptions import TransportError
+    from yt_dlp.utils import DownloadCancelled, DownloadError
+except ImportError:
+    YoutubeDL = TransportError = DownloadCancelled = DownloadError = None
+
+BASE_OPTIONS = {
+    'quiet': True,
+    'no_warnings': True,
+    'noprogress': True,
+    'noplaylist': True,
+}
+
+# Options read from YoutubeDL.params at use time, so they can change per call
+PER_CALL_OPTIONS = ('outtmpl', 'ratelimit', 'throttledratelimit', 'concurrent_fragment_downloads')
+
+# Failures worth another attempt: yt-dlp download errors and network trouble, never a cancel
+RETRYABLE_ERRORS = tuple(error for error in (DownloadError, TransportError) if error) + (ConnectionError, TimeoutError)
+
+
+def is_available():
+    """True if yt-dlp can be imported in this process"""
+    return YoutubeDL is not None
+
+
+class PooledYoutubeDL:
+    """A YoutubeDL instance plus the hooks of whoever has it checked out"""
+    def __init__(self, options):
+        self.progress_hook = None
+        self.postprocessor_hook = None
+        opts = dict(BASE_OPTIONS, **options)
+        opts['progress_hooks'] = [self._on_progress]
+        opts['postprocessor_hooks'] = [self._on_postprocess]
+        self.ydl = YoutubeDL(opts)
+        self.defaults = {key: self.ydl.params.get(key) for key in PER_CALL_OPTIONS}
+
+    def _on_progress(self, d):
+        if self.progress_hook:
+            self.progress_hook(d)
+
+    def _on_postprocess(self, d):
+        if self.postprocessor_hook:
+            self.postprocessor_hook(d)
+
+    def checkout(self, per_call, progress_hook, postprocessor_hook):
+        for key, value in per_call.items():
+            if key == 'outtmpl' and not isinstance(value, dict):
+                value = dict(self.defaults['outtmpl'], default=value)
+            self.ydl.params[key] = value
+        self.progress_hook = progress_hook
+        self.postprocessor_hook = postprocessor_hook
+
+    def checkin(self):
+        for key, value in self.defaults.items():
+            if value is None:
+                self.ydl.params.pop(key, None)
+            else:
+                self.ydl.params[key] = value
+        self.progress_hook = None
+        self.postprocessor_hook = None
+
+    def close(self):
+        try:
+            self.ydl.close()
+        except Exception:
+            pass
+
+
+class YoutubeDLPool:
+    """
+    Thread-safe pool of YoutubeDL instances.
+
+    Instances are grouped by their structural options (format,
+    postprocessors, ...), which yt-dlp only reads at construction; options
+    in PER_CALL_OPTIONS and the progress hooks are swapped in per checkout.
+    """
+    def __init__(self, max_size=4):
+        self.max_size = max(1, max_size)
+        self.idle = {}
+        self.created = 0
+        self.condition = threading.Condition()
+
+    @staticmethod
+    def profile_key(options):
+        return json.dumps(options, sort_keys=True, default=str)
+
+    def _take(self, key):
+        """Check out an idle instance for `key`, or reserve room to build one"""
+        with self.condition:
+            while True:
+                if self.idle.get(key):
+                    return self.idle[key].pop()
+                if self.created < self.max_size:
+                    self.created += 1
+                    return None
+                # Full: retire an idle instance built for another profile
+                for other, entries in self.idle.items():
+                    if entries:
+                        entries.pop().close()
+                        return None
+                self.condition.wait()
+
+    @contextmanager
+    def acquire(self, options=None, progress_hook=None, postprocessor_hook=None):
+        """Check out a YoutubeDL configured with `options` for the duration of the block"""
+        if YoutubeDL is None:
+            raise Exception("yt-dlp not found. Please install yt-dlp.")
+        options = dict(options or {})
+        per_call = {key: options.pop(key) for key in PER_CALL_OPTIONS if key in options}
+        key = self.profile_key(options)
+
+        entry = self._take(key)
+        if entry is None:
+            try:
+                entry = PooledYoutubeDL(options)
+            except Exception:
+                with self.condition:
+                    self.created -= 1
+                    self.condition.notify()
+                raise
+
+        entry.checkout(per_call, progress_hook, postprocessor_hook)
+        try:
+            yield entry.ydl
+        finally:
+            entry.checkin()
+            with self.condition:
+                self.idle.setdefault(key, []).append(entry)
+                self.condition.notify()
+
+    def extract_info(self, url):
+        """Extract the full, JSON-serializable info dict for `url`"""
+        with self.acquire() as ydl:
+            return YoutubeDL.sanitize_info(ydl.extract_info(url, download=False))
+
+    def download(self, url, options, info=None, progress_hook=None, postprocessor_hook=None):
+        """
+        Download `url` with `options`. When `info` (a previously extracted
+        info dict) is given it is processed directly without re-extraction.
+        Returns the final info dict.
+        """
+        with self.acquire(options, progress_hook, postprocessor_hook) as ydl:
+            if info is not None:
+                return ydl.process_ie_result(dict(info), download=True)
+            return ydl.extract_info(url, download=True)
+
+    def close(self):
+        with self.condition:
+            for entries in self.idle.values():
+                for entry in entries:
+                    entry.close()
+            self.idle.clear()
+            self.created = 0
+
+
+def downloaded_filepath(info):
+    """Path of the final file yt-dlp produced for `info`, if known"""
+    for download in info.get('requested_downloads') or []:
+        if download.get('filepath'):
+            return download['filepath']
+    return info.get('filepath') or info.get('_filename') or ""